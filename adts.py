@@ -0,0 +1,169 @@
+"""AAC (ADTS) frame 解析與串接工具 (只讀取 frame 標頭，不解碼也不重新編碼音訊)"""
+from mp3_frames import id3v2_size, GAP_MARKER
+
+_SAMPLE_RATES = [96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350]
+# AAC-LC 的靜音 raw data block (單聲道 SCE / 雙聲道 CPE，全部頻譜為 0，以 END 結尾)
+SILENT_BLOCKS = {
+    1: bytes([0x00, 0xC8, 0x00, 0x80, 0x23, 0x80]),
+    2: bytes([0x21, 0x00, 0x49, 0x90, 0x02, 0x19, 0x00, 0x23, 0x80]),
+}
+
+class AdtsFormatError(ValueError):
+    """ADTS 資料無法辨識，或多個片段的格式 (取樣率、聲道) 不一致"""
+
+class AdtsHeader:
+    """單一 ADTS frame 的標頭資訊"""
+
+    __slots__ = ("profile", "sample_rate", "channels", "size", "header_size", "samples")
+
+    def __init__(self, profile, sample_rate, channels, size, header_size, samples):
+        self.profile = profile
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.size = size
+        self.header_size = header_size
+        self.samples = samples
+
+    @property
+    def seconds(self):
+        return self.samples / self.sample_rate
+
+def parse_header(data, offset=0):
+    """解析 offset 位置的 ADTS 標頭；不是合法標頭時回傳 None"""
+    if offset + 7 > len(data):
+        return None
+    b = data[offset:offset + 7]
+    if b[0] != 0xFF or (b[1] & 0xF6) != 0xF0:
+        return None
+    rate_index = (b[2] >> 2) & 0x0F
+    if rate_index >= len(_SAMPLE_RATES):
+        return None
+    channels = ((b[2] & 0x01) << 2) | (b[3] >> 6)
+    size = ((b[3] & 0x03) << 11) | (b[4] << 3) | (b[5] >> 5)
+    header_size = 7 if b[1] & 0x01 else 9
+    if size <= header_size:
+        return None
+    blocks = (b[6] & 0x03) + 1
+    return AdtsHeader((b[2] >> 6) + 1, _SAMPLE_RATES[rate_index], channels, size, header_size, 1024 * blocks)
+
+def iter_frames(data, offset=0, end=None):
+    """依序產生 (offset, AdtsHeader)；略過 ID3v2 標籤與無法辨識的位元組 (連續兩個合法標頭才視為同步成功)"""
+    end = len(data) if end is None else end
+    while offset < end:
+        tag = id3v2_size(data, offset)
+        if tag:
+            offset += tag
+            continue
+        header = parse_header(data, offset)
+        if header is not None and offset + header.size <= end:
+            following = offset + header.size
+            if following == end or parse_header(data, following) is not None:
+                yield offset, header
+                offset = following
+                continue
+        offset += 1
+
+def fill_block(channels, payload):
+    """
+    AAC-LC 靜音 raw data block，前面加上一個攜帶 payload 的 FIL 元素 (解碼器會略過填充內容)
+    FIL 元素佔 7 + 8 * (len(payload) + 1) bits，之後的 SCE / CPE 以位元為單位接上
+    """
+    block = SILENT_BLOCKS.get(channels)
+    if block is None or len(payload) > 14:
+        raise AdtsFormatError(f"不支援的 AAC 聲道數: {channels}")
+    # ID_FIL (110)、count、extension_type = EXT_FILL (0000)、fill_nibble (0000)、填充內容
+    bits = "110" + format(len(payload) + 1, "04b") + "00000000" + "".join(format(b, "08b") for b in payload)
+    # 靜音元素到 END 的最後一個位元為止 (原本結尾的對齊補位會重新計算)
+    bits += "".join(format(b, "08b") for b in block).rstrip("0")
+    bits += "0" * (-len(bits) % 8)
+    return int(bits, 2).to_bytes(len(bits) // 8, "big")
+
+def frame(raw, block):
+    """以樣板 (第一個 frame 的標頭) 為準，產生包含 block 的 ADTS frame (不含 CRC、1 個 raw data block)"""
+    size = 7 + len(block)
+    out = bytearray(raw[:7])
+    out[1] |= 0x01
+    out[3] = (out[3] & 0xFC) | (size >> 11)
+    out[4] = (size >> 3) & 0xFF
+    out[5] = ((size & 0x07) << 5) | 0x1F
+    out[6] = 0xFC                     # buffer fullness = 0x7FF (VBR)
+    return bytes(out) + block
+
+def silence_frame(raw):
+    """
+    與樣板相同格式的靜音 frame (僅支援 AAC-LC 單聲道 / 雙聲道)
+    FIL 元素中放入 GAP_MARKER，讓 probe 能分辨片段間隔與音訊本身的靜音
+    """
+    header = parse_header(raw)
+    if header.profile != 2:
+        raise AdtsFormatError(f"不支援的 AAC profile: {header.profile}")
+    return frame(raw, fill_block(header.channels, GAP_MARKER))
+
+def concat(segments, out, gap_seconds=0.0):
+    """
+    把多段 ADTS 串接寫入 out (檔案物件)，回傳寫入的位元組數
+    只保留 ADTS frame (去除 ID3 標籤)，段與段之間插入靜音 frame；全程以 memoryview 切片寫出，不重新編碼
+    各段的取樣率與聲道必須一致，否則拋出 AdtsFormatError
+    """
+    scanned = [list(iter_frames(data)) for data in segments]
+    found = [(data, frames) for data, frames in zip(segments, scanned) if frames]
+    if not found:
+        raise AdtsFormatError("找不到 ADTS frame")
+    first_data, first_frames = found[0]
+    first = first_frames[0][1]
+    for _, frames in found:
+        for _, header in frames:
+            if (header.sample_rate, header.channels) != (first.sample_rate, first.channels):
+                raise AdtsFormatError(
+                    f"片段格式不一致: {first.sample_rate} Hz / {first.channels} ch 與 "
+                    f"{header.sample_rate} Hz / {header.channels} ch")
+    gap = round(gap_seconds / first.seconds) if gap_seconds > 0 else 0
+    gap_bytes = silence_frame(bytes(first_data[first_frames[0][0]:first_frames[0][0] + 7])) * gap if gap else b""
+
+    written = 0
+    for n, (data, frames) in enumerate(found):
+        if n:
+            written += out.write(gap_bytes)
+        with memoryview(data) as view:
+            start = stop = frames[0][0]
+            for offset, header in frames:
+                if offset != stop:
+                    written += out.write(view[start:stop])
+                    start = offset
+                stop = offset + header.size
+            written += out.write(view[start:stop])
+    return written
+
+def probe(data, min_gap_frames=2):
+    """
+    逐一走訪 frame 標頭取得音檔長度與各段 (單字 / 中文 / 例句) 的時間範圍，不解碼音訊
+    段落以 concat 插入的靜音 frame (含 GAP_MARKER) 為界 (連續 min_gap_frames 個以上，頭尾的不算)
+    回傳 (秒數, [(開始秒數, 結束秒數), ...])；找不到 frame 時回傳 (0.0, [])
+    """
+    gap_blocks = {channels: fill_block(channels, GAP_MARKER) for channels in SILENT_BLOCKS}
+    elapsed = 0.0
+    runs, run_start, run = [], 0.0, 0
+    for offset, header in iter_frames(data):
+        block = gap_blocks.get(header.channels)
+        if block is not None and bytes(data[offset + header.header_size:offset + header.size]) == block:
+            if not run:
+                run_start = elapsed
+            run += 1
+        else:
+            if run >= min_gap_frames:
+                runs.append((run_start, elapsed))
+            run = 0
+        elapsed += header.seconds
+    if run >= min_gap_frames:
+        runs.append((run_start, elapsed))
+    if not elapsed:
+        return 0.0, []
+
+    segments, cursor = [], 0.0
+    for gap_start, gap_stop in runs:
+        if gap_start > cursor:
+            segments.append((cursor, gap_start))
+        cursor = gap_stop
+    if cursor < elapsed:
+        segments.append((cursor, elapsed))
+    return elapsed, segments
@@ -0,0 +1,257 @@
+import bisect
+import json
+import mmap
+import os
+import mp3_frames
+
+ALBUM_DIR_NAME = "album"
+ALBUM_FILE = "album.mp3"
+ALBUM_INDEX = "album.json"
+TAG_RESERVE = 64 * 1024    # ID3 標籤預留空間 (bytes)；章節增加超出時加倍並搬移音訊
+SHIFT_CHUNK = 1024 * 1024  # 搬移音訊時每次讀寫的大小
+
+def _syncsafe(n):
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+def _id3_frame(frame_id, body):
+    """ID3v2.3 frame (大小為一般 32 位元整數)"""
+    return frame_id.encode("latin-1") + len(body).to_bytes(4, "big") + b"\x00\x00" + body
+
+def _text_frame(frame_id, text):
+    return _id3_frame(frame_id, b"\x01" + text.encode("utf-16"))  # UTF-16 (含 BOM)
+
+def _ctoc(element_id, children, top_level, title=None):
+    flags = 0x03 if top_level else 0x01  # 0x02 = 頂層，0x01 = 子項目有順序
+    body = element_id.encode("latin-1") + b"\x00" + bytes([flags, len(children)])
+    body += b"".join(child.encode("latin-1") + b"\x00" for child in children)
+    if title:
+        body += _text_frame("TIT2", title)
+    return _id3_frame("CTOC", body)
+
+def chapter_frames(entries, title):
+    """
+    產生 ID3 章節 (每一列一個 CHAP) 與目錄 (CTOC)
+    CTOC 每層最多 255 個項目，超過時以第二層目錄分組
+    """
+    frames = [_text_frame("TIT2", title)]
+    ids = []
+    for n, entry in enumerate(entries):
+        element_id = f"ch{n}"
+        ids.append(element_id)
+        body = element_id.encode("latin-1") + b"\x00"
+        body += round(entry["start"] * 1000).to_bytes(4, "big") + round(entry["end"] * 1000).to_bytes(4, "big")
+        body += entry["offset"].to_bytes(4, "big") + (entry["offset"] + entry["length"]).to_bytes(4, "big")
+        body += _text_frame("TIT2", entry["title"])
+        frames.append(_id3_frame("CHAP", body))
+    if len(ids) <= 255:
+        frames.append(_ctoc("toc", ids, True, title))
+    else:
+        groups = [ids[i:i + 255] for i in range(0, len(ids), 255)]
+        frames.append(_ctoc("toc", [f"toc{n}" for n in range(len(groups))], True, title))
+        frames += [_ctoc(f"toc{n}", group, False) for n, group in enumerate(groups)]
+    return b"".join(frames)
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+class Album:
+    """
+    整合音檔：把所有列的音訊依序串成單一 MP3，並寫入 ID3 章節 (CHAP / CTOC) 與 JSON 索引
+    (每一列的開始 / 結束時間與位元組位置)，播放器只需載入一個檔案並在其中跳轉
+
+    檔案結構: [ID3 標籤 (含預留空間)] [Info 標頭] [第 1 列音訊] [第 2 列音訊] ...
+    只在表格尾端新增列時直接附加音訊並就地更新標籤；中間的列有變動時才整個重建
+    """
+
+    def __init__(self, output_dir, title="Vocabulary"):
+        self.output_dir = output_dir
+        self.dir = os.path.join(output_dir, ALBUM_DIR_NAME)
+        self.path = os.path.join(self.dir, ALBUM_FILE)
+        self.index_path = os.path.join(self.dir, ALBUM_INDEX)
+        self.title = title
+        self._reset()
+        if os.path.exists(self.index_path) and os.path.exists(self.path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                self.header = bytes.fromhex(index["header"])
+                self.tag_size = index["tag_size"]
+                self.info_size = index["info_size"]
+                self.cbr = index["cbr"]
+                self.entries = index["entries"]
+                self.skipped = index.get("skipped", {})
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ 無法讀取 {self.index_path}，將重建整合音檔: {e}")
+                self._reset()
+            if os.path.getsize(self.path) != self._end():
+                self._reset()  # 上次寫入中斷，檔案與索引不一致
+
+    def _reset(self):
+        self.header = None
+        self.tag_size = TAG_RESERVE
+        self.info_size = 0
+        self.cbr = True
+        self.entries = []
+        self.skipped = {}  # 略過的列：雜湊 -> 當時的檔案大小 (檔案沒變時下次也略過，不影響比對)
+
+    @property
+    def audio_start(self):
+        return self.tag_size + self.info_size
+
+    def _end(self):
+        if self.entries:
+            last = self.entries[-1]
+            return last["offset"] + last["length"]
+        return self.audio_start if self.header else 0
+
+    def update(self, rows):
+        """
+        依目前表格順序更新整合音檔
+        rows: 含 filename / hash / word 的 dict 列表 (只傳入音檔已完成的列)
+        """
+        # 先前因格式無法使用而略過的列不在整合音檔中，比對時一併略過 (否則之後的列全部錯位)
+        current = [row for row in rows if not self._was_skipped(row)]
+        keep = 0
+        for entry, row in zip(self.entries, current):
+            if entry["hash"] != row["hash"]:
+                break
+            entry["filename"] = row["filename"]  # 只改序號時不影響音訊
+            keep += 1
+        if keep < len(self.entries):
+            print("🔄 表格中段有變動，重建整合音檔 ...")
+            self._reset()
+            current, keep = rows, 0
+        added = current[keep:]
+        if not added and os.path.exists(self.path):
+            self._save_index()
+            return
+
+        os.makedirs(self.dir, exist_ok=True)
+        if not self.entries:
+            with open(self.path, "wb"):
+                pass
+        before = len(self.entries)
+        with open(self.path, "r+b") as f:
+            f.seek(self._end())
+            for row in added:
+                self._append(f, row)
+            if self.header is not None:
+                self._write_header(f)
+        if self.header is None:
+            os.remove(self.path)  # 沒有任何可用的音檔
+            return
+        self._save_index()
+        print(f"💿 整合音檔: 新增 {len(self.entries) - before} 筆，共 {len(self.entries)} 筆 ({self.path})")
+
+    def _was_skipped(self, row):
+        size = self.skipped.get(row["hash"])
+        return size is not None and size == _file_size(os.path.join(self.output_dir, row["filename"]))
+
+    def _skip(self, row, path, reason):
+        print(f"   ⚠️ 略過{reason}: {row['filename']}")
+        self.skipped[row["hash"]] = _file_size(path)
+
+    def _append(self, f, row):
+        """把單列音檔的音訊 frame (不含標籤與 Info 標頭) 附加到檔尾；無法使用的音檔記錄在 skipped"""
+        path = os.path.join(self.output_dir, row["filename"])
+        if not _file_size(path):
+            self._skip(row, path, "空的音檔")
+            return
+        with open(path, "rb") as src, mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            ranges, headers, raw = mp3_frames.scan(data)
+            if not headers:
+                self._skip(row, path, "無法辨識的音檔")
+                return
+            if self.header is None:
+                self.header = raw
+                self.info_size = len(mp3_frames.info_frame(raw, 0, 0, [0] * 100, True))
+                f.seek(0)
+                f.write(bytes(self.audio_start))
+            else:
+                album = mp3_frames.parse_header(self.header)
+                first = headers[0]
+                if (first.version, first.layer, first.sample_rate, first.channels) != \
+                        (album.version, album.layer, album.sample_rate, album.channels):
+                    self._skip(row, path, f"格式不同的音檔 ({first.sample_rate} Hz)")
+                    return
+            offset = f.tell()
+            with memoryview(data) as view:
+                for start, stop in ranges:
+                    f.write(view[start:stop])
+        bitrate = mp3_frames.parse_header(self.header).bitrate
+        self.cbr = self.cbr and all(header.bitrate == bitrate for header in headers)
+        start = self.entries[-1]["end"] if self.entries else 0.0
+        self.entries.append({
+            "filename": row["filename"],
+            "hash": row["hash"],
+            "title": row["word"],
+            "start": round(start, 4),
+            "end": round(start + sum(header.seconds for header in headers), 4),
+            "offset": offset,
+            "length": f.tell() - offset,
+            "frames": len(headers),
+        })
+
+    def _write_header(self, f):
+        """就地改寫 ID3 標籤與 Info 標頭；標籤超出預留空間時先把音訊往後搬"""
+        frames = chapter_frames(self.entries, self.title)
+        if 10 + len(frames) > self.tag_size:
+            new_size = max(2 * self.tag_size, 2 * (10 + len(frames)))
+            self._shift(f, new_size - self.tag_size)
+            self.tag_size = new_size
+            frames = chapter_frames(self.entries, self.title)
+        tag = b"ID3\x03\x00\x00" + _syncsafe(self.tag_size - 10) + frames
+        f.seek(0)
+        f.write(tag + bytes(self.tag_size - len(tag)))
+        f.write(self._info())
+
+    def _shift(self, f, delta):
+        """把 ID3 標籤之後的內容 (Info 標頭與音訊) 往後搬 delta bytes，由尾端開始搬以免覆蓋"""
+        start = self.tag_size
+        pos = f.seek(0, os.SEEK_END)
+        while pos > start:
+            n = min(SHIFT_CHUNK, pos - start)
+            pos -= n
+            f.seek(pos)
+            chunk = f.read(n)
+            f.seek(pos + delta)
+            f.write(chunk)
+        for entry in self.entries:
+            entry["offset"] += delta
+
+    def _info(self):
+        """由各列的時間與位元組位置內插出 TOC (不需重新掃描整個檔案)"""
+        frame_count = sum(entry["frames"] for entry in self.entries)
+        audio_bytes = self._end() - self.audio_start
+        duration = self.entries[-1]["end"] if self.entries else 0.0
+        starts = [entry["start"] for entry in self.entries]
+        points = []
+        for i in range(100):
+            t = duration * i / 100
+            entry = self.entries[max(0, bisect.bisect_right(starts, t) - 1)] if self.entries else None
+            if entry is None:
+                points.append(0)
+                continue
+            span = entry["end"] - entry["start"]
+            within = (t - entry["start"]) / span if span > 0 else 0.0
+            points.append(entry["offset"] - self.audio_start + int(entry["length"] * within))
+        return mp3_frames.info_frame(self.header, frame_count, audio_bytes, points, self.cbr)
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": 1,
+                "file": ALBUM_FILE,
+                "header": self.header.hex() if self.header else "",
+                "tag_size": self.tag_size,
+                "info_size": self.info_size,
+                "cbr": self.cbr,
+                "duration": self.entries[-1]["end"] if self.entries else 0.0,
+                "entries": self.entries,
+                "skipped": self.skipped,
+            }, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
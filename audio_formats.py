@@ -0,0 +1,55 @@
+"""
+輸出音訊格式：副檔名、MIME 類型與對應的串接 / 掃描工具
+各格式都是語音引擎直接回傳的壓縮音訊，串接時只重組 frame / 頁面，不重新編碼
+"""
+import mmap
+import os
+import adts
+import mp3_frames
+import ogg_opus
+
+class AudioFormat:
+    """單一輸出格式 (模組需提供 concat(segments, out, gap_seconds) 與 probe(data))"""
+
+    __slots__ = ("name", "ext", "mime", "module", "error")
+
+    def __init__(self, name, ext, mime, module, error):
+        self.name = name
+        self.ext = ext
+        self.mime = mime
+        self.module = module
+        self.error = error
+
+    def concat(self, segments, out, gap_seconds=0.0):
+        return self.module.concat(segments, out, gap_seconds)
+
+    def probe(self, data):
+        return self.module.probe(data)
+
+FORMATS = {
+    "mp3": AudioFormat("mp3", ".mp3", "audio/mpeg", mp3_frames, mp3_frames.Mp3FormatError),
+    "opus": AudioFormat("opus", ".opus", "audio/ogg", ogg_opus, ogg_opus.OggFormatError),  # Ogg Opus
+    "aac": AudioFormat("aac", ".aac", "audio/aac", adts, adts.AdtsFormatError),            # ADTS AAC
+}
+EXTENSIONS = {fmt.ext: fmt for fmt in FORMATS.values()}
+
+def get(name):
+    """依名稱取得格式；未知的格式拋出 ValueError"""
+    if name not in FORMATS:
+        raise ValueError(f"未知的音訊格式: {name} (可用: {', '.join(FORMATS)})")
+    return FORMATS[name]
+
+def for_path(path):
+    """依副檔名判斷格式；不是支援的音檔時回傳 None"""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+def probe_file(path):
+    """依副檔名以 mmap 讀取音檔並取得 (秒數, 段落)；空檔案或不支援的格式回傳 (0.0, [])"""
+    fmt = for_path(path)
+    if fmt is None:
+        return 0.0, []
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0.0, []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return fmt.probe(data)
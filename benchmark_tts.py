@@ -0,0 +1,344 @@
+"""
+吞吐量基準測試：以本機模擬伺服器取代 OpenAI /v1/audio/speech 與 Edge TTS websocket，
+用真正的 tts_engine.main 流程處理合成的單字表，量測每秒列數與片段延遲 (p50 / p99)。
+不會呼叫真正的服務，也不會產生費用。
+
+範例:
+    python benchmark_tts.py --backend openai --rows 100 1000 --concurrency 4 8 16
+    python benchmark_tts.py --backend edge-tts --rows 1000 --rate-429 0.02 --disconnect 0.01
+結果以 JSON Lines 附加到 --output (預設 benchmark_results.jsonl)，方便比較不同版本。
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import struct
+import subprocess
+import tempfile
+import time
+
+import audio_formats
+import tts_engine
+from tts_backends import fake_mp3_chunks, fake_audio_chunks, fake_word_boundaries
+from metrics import percentile
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+class Faults:
+    """模擬伺服器的延遲與錯誤設定"""
+
+    def __init__(self, latency=0.2, jitter=0.05, rate_429=0.0, disconnect=0.0, retry_after=1.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.disconnect = disconnect
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+
+    def delay(self):
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def roll(self):
+        """決定這次請求的結果: ok / 429 / disconnect"""
+        r = self.rng.random()
+        if r < self.rate_429:
+            return "429"
+        if r < self.rate_429 + self.disconnect:
+            return "disconnect"
+        return "ok"
+
+class StandInServer:
+    """模擬伺服器共用部分：啟動 / 關閉與請求統計"""
+
+    def __init__(self, faults):
+        self.faults = faults
+        self.stats = {"requests": 0, "ok": 0, "429": 0, "disconnect": 0}
+        self._server = None
+        self.port = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            await self.handle(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def read_http_head(reader):
+    """讀取 HTTP 請求列與標頭，連線結束時回傳 None"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    method, path, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return method, path, headers
+
+class OpenAIStandIn(StandInServer):
+    """模擬 OpenAI POST /v1/audio/speech (HTTP/1.1 keep-alive，chunked 串流回應)"""
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def handle(self, reader, writer):
+        while True:
+            request = await read_http_head(reader)
+            if request is None:
+                return
+            method, path, headers = request
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            if method != "POST" or not path.startswith("/v1/audio/speech"):
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+                continue
+
+            payload = json.loads(body)
+            self.stats["requests"] += 1
+            await asyncio.sleep(self.faults.delay())
+            outcome = self.faults.roll()
+            self.stats[outcome] += 1
+            if outcome == "429":
+                error = b'{"error":{"message":"Rate limit reached","type":"requests","code":"rate_limit_exceeded"}}'
+                writer.write(b"HTTP/1.1 429 Too Many Requests\r\nContent-Type: application/json\r\n"
+                             + f"Retry-After: {self.faults.retry_after}\r\nContent-Length: {len(error)}\r\n\r\n".encode()
+                             + error)
+                await writer.drain()
+                continue
+
+            fmt = audio_formats.get(payload.get("response_format", "mp3"))
+            chunks = fake_audio_chunks(payload["input"], payload["voice"], fmt.name)
+            writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {fmt.mime}\r\nTransfer-Encoding: chunked\r\n\r\n".encode())
+            for i, chunk in enumerate(chunks):
+                if outcome == "disconnect" and i >= len(chunks) // 2:
+                    writer.transport.abort()  # 串流到一半斷線
+                    return
+                writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+def ws_frame(opcode, payload):
+    """組成伺服器端 websocket frame (不加遮罩)"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+async def ws_read(reader):
+    """讀取一個用戶端 websocket frame，回傳 (opcode, payload)"""
+    b1, b2 = await reader.readexactly(2)
+    length = b2 & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if b2 & 0x80 else b"\0\0\0\0"
+    data = await reader.readexactly(length)
+    return b1 & 0x0F, bytes(c ^ mask[i % 4] for i, c in enumerate(data))
+
+class EdgeStandIn(StandInServer):
+    """
+    模擬 Edge TTS 的 websocket 服務
+    收到 speech.config 與 ssml 後依序回傳 turn.start、音訊、WordBoundary metadata 與 turn.end
+    """
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}/consumer/speech/synthesize/readaloud/edge/v1?TrustedClientToken=bench"
+
+    async def handle(self, reader, writer):
+        request = await read_http_head(reader)
+        if request is None:
+            return
+        _, _, headers = request
+        self.stats["requests"] += 1
+        await asyncio.sleep(self.faults.delay())
+        outcome = self.faults.roll()
+        self.stats[outcome] += 1
+        if outcome == "429":
+            writer.write(b"HTTP/1.1 429 Too Many Requests\r\n"
+                         + f"Retry-After: {self.faults.retry_after}\r\nContent-Length: 0\r\n\r\n".encode())
+            await writer.drain()
+            return
+
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        await writer.drain()
+
+        text, voice = None, ""
+        while text is None:
+            opcode, payload = await ws_read(reader)
+            if opcode == 8:
+                return
+            message = payload.decode("utf-8", "replace")
+            if "Path:ssml" in message:
+                match = re.search(r"<voice name='([^']*)'>.*?<prosody[^>]*>(.*?)</prosody>", message, re.S)
+                voice, text = (match.group(1), match.group(2)) if match else ("", message)
+
+        request_id = hashlib.md5(text.encode("utf-8")).hexdigest()
+        prefix = f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n"
+        writer.write(ws_frame(1, (prefix + "Path:turn.start\r\n\r\n{}").encode()))
+        if outcome == "disconnect":
+            writer.transport.abort()  # 開始後、尚未送出音訊前斷線
+            return
+
+        audio_headers = f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\nX-StreamId:bench\r\nPath:audio\r\n".encode()
+        # WordBoundary 的時間位置與假音訊長度一致 (單位 100 奈秒)，合併請求才切得準
+        for offset, duration, word in fake_word_boundaries(text):
+            metadata = {"Metadata": [{"Type": "WordBoundary", "Data": {
+                "Offset": round(offset * 1e7), "Duration": round(duration * 1e7),
+                "text": {"Text": word, "Length": len(word), "BoundaryType": "WordBoundary"}}}]}
+            writer.write(ws_frame(1, (prefix + "Path:audio.metadata\r\n\r\n" + json.dumps(metadata)).encode()))
+        for chunk in fake_mp3_chunks(text, voice):
+            writer.write(ws_frame(2, struct.pack("!H", len(audio_headers)) + audio_headers + chunk))
+            await writer.drain()
+        writer.write(ws_frame(1, (prefix + "Path:turn.end\r\n\r\n{}").encode()))
+        await writer.drain()
+
+        # 等待用戶端的 close frame 並回應，否則 aiohttp 會等到逾時才關閉連線
+        while True:
+            opcode, _ = await ws_read(reader)
+            if opcode == 8:
+                writer.write(ws_frame(8, b"\x03\xe8"))
+                await writer.drain()
+                return
+
+def write_deck(path, rows):
+    """產生合成的單字表 (每列內容都不同，避免命中快取)"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("| (序號) English | 中文 | 常用搭配句 / 例句 | 中譯 |\n| :--- | :--- | :--- | :--- |\n")
+        for i in range(1, rows + 1):
+            f.write(f"| {i}. benchmark word {i} | 基準測試 {i} | This is benchmark sentence number {i}. | 第 {i} 句 |\n")
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+async def bench_once(backend, rows, concurrency, faults, workdir, word_batch=0):
+    """以指定設定執行一次完整的生成流程並回傳量測結果"""
+    server = None
+    settings = tts_engine.Settings(
+        backend=backend,
+        input_file=os.path.join(workdir, "mp3.md"),
+        output_dir=os.path.join(workdir, "out"),
+        cache_dir=os.path.join(workdir, "cache"),
+        table_cache=False,  # 合成的單字表每次都不同，不留下解析結果快取
+        concurrency_start=concurrency,
+        concurrency_max=concurrency,
+        workers=concurrency,
+        fake_latency=faults.latency,
+        fake_failure_rate=faults.rate_429,
+        word_batch_size=word_batch,
+    )
+    if backend == "openai":
+        server = OpenAIStandIn(faults)
+        await server.start()
+        settings.model = "tts-1"
+        settings.base_url = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+        settings.voice_en_word, settings.voice_en_sent, settings.voice_zh = "onyx", "nova", "shimmer"
+    elif backend == "edge-tts":
+        import edge_tts.communicate
+        server = EdgeStandIn(faults)
+        await server.start()
+        edge_tts.communicate.WSS_URL = server.url  # 將 edge-tts 的連線目標改為本機模擬伺服器
+
+    write_deck(settings.input_file, rows)
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await tts_engine.main(settings)
+    wall = time.monotonic() - start
+    if server:
+        await server.stop()
+
+    seconds, failed_rows, done_rows = [], 0, 0
+    journal_path = sorted(glob.glob(os.path.join(settings.output_dir, "journal", "run-*.jsonl")))[-1]
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["event"] == "segment" and record.get("seconds") is not None:
+                seconds.append(record["seconds"])
+            elif record["event"] == "row_done":
+                done_rows += 1
+            elif record["event"] == "row_failed":
+                failed_rows += 1
+
+    result = {
+        "version": git_version(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": backend,
+        "rows": rows,
+        "concurrency": concurrency,
+        "latency": faults.latency,
+        "jitter": faults.jitter,
+        "rate_429": faults.rate_429,
+        "disconnect": faults.disconnect,
+        "word_batch": word_batch,
+        "wall_s": round(wall, 3),
+        "rows_per_s": round(done_rows / wall, 2) if wall else None,
+        "rows_done": done_rows,
+        "rows_failed": failed_rows,
+        "segment_p50_ms": round(percentile(seconds, 50) * 1000, 1) if seconds else None,
+        "segment_p99_ms": round(percentile(seconds, 99) * 1000, 1) if seconds else None,
+    }
+    if server:
+        result["server"] = server.stats
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="語音生成流程的吞吐量基準測試 (本機模擬伺服器)")
+    parser.add_argument("--backend", choices=["openai", "edge-tts", "fake"], default="openai")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000], help="單字表列數 (可多個)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16], help="並發數 (可多個)")
+    parser.add_argument("--latency", type=float, default=0.2, help="模擬伺服器的回應延遲 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="延遲抖動 (秒)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="回應 429 的機率")
+    parser.add_argument("--disconnect", type=float, default=0.0, help="中途斷線的機率")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 回應的 Retry-After 秒數")
+    parser.add_argument("--word-batch", type=int, default=0, help="每次合併請求的單字數 (0 = 關閉)")
+    parser.add_argument("--output", default="benchmark_results.jsonl", help="結果輸出檔 (JSON Lines，附加寫入)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'conc':>5} {'wall(s)':>8} {'rows/s':>8} {'p50(ms)':>8} {'p99(ms)':>8} {'failed':>6}")
+    for rows in args.rows:
+        for concurrency in args.concurrency:
+            faults = Faults(args.latency, args.jitter, args.rate_429, args.disconnect, args.retry_after)
+            with tempfile.TemporaryDirectory(prefix="tts_bench_") as workdir:
+                result = asyncio.run(bench_once(args.backend, rows, concurrency, faults, workdir, args.word_batch))
+            print(f"{rows:>7} {concurrency:>5} {result['wall_s']:>8} {str(result['rows_per_s']):>8} "
+                  f"{str(result['segment_p50_ms']):>8} {str(result['segment_p99_ms']):>8} {result['rows_failed']:>6}")
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(f"\n✅ 結果已附加至 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,217 @@
+import argparse
+import asyncio
+import hashlib
 import os
 import json
-import re
+import md_table
+from search_index import build_index
+from audio_formats import probe_file, for_path
 
 # =================設定區=================
 MP3_DIR = "MP3_Output"       # MP3 音檔資料夾
-INPUT_FILE = "mp3.md"        # 來源 Markdown 檔案
+INPUT_FILE = "mp3.md"        # 來源 Markdown 檔案 (可用萬用字元或列表指定多個檔案)
 HTML_FILE = "player_v6_fixed.html" # 產出的網頁檔名
+USE_ALBUM = True             # 有整合音檔 (album/album.json) 時，改為在單一 MP3 中跳轉播放
+CHUNK_SIZE = 500             # 播放清單每個區塊的筆數 (區塊存放於 DATA_DIR，播放時才載入)
+DATA_DIR = os.path.splitext(HTML_FILE)[0] + "_data"
+PREFETCH_COUNT = 3           # 預先載入接下來幾首 (0 = 關閉)；已播過的會立即釋放
 # ========================================
 
-def parse_md_file(filepath):
+TEXT_FIELDS = ("word", "meaning", "sentence", "sentence_trans")
+BUILD_STATE = "build.json"   # DATA_DIR 內記錄各檔案內容摘要，重新產生時只重寫有變動的檔案
+
+def parse_md_file(spec):
     """
-    解析 mp3.md (Markdown 表格格式)
-    格式: | 1. word | 中文 | 例句 | 例句中譯 |
+    讀取來源 Markdown (單一檔案、萬用字元或檔案列表) 的文字欄位，依表格順序回傳 dict 列表
+    表格解析與快取由 md_table 負責 (與生成程式相同的規則，檔案沒有變動時不重新解析)
     """
-    word_data = []
-    
-    if not os.path.exists(filepath):
-        print(f"⚠️ 警告：找不到 {filepath}，網頁將只顯示檔名。")
+    paths = md_table.input_files(spec)
+    missing = [path for path in paths if not os.path.exists(path)]
+    if not paths or missing:
+        print(f"⚠️ 警告：找不到 {', '.join(missing) or spec}，網頁將只顯示檔名。")
         return []
+    return [{field: getattr(row, field) for field in TEXT_FIELDS} for row in md_table.iter_rows(paths)]
 
-    with open(filepath, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            
-            if not line.startswith("|") or "---" in line or "(序號) English" in line:
-                continue
-
-            parts = [p.strip() for p in line.split('|') if p.strip()]
-
-            if len(parts) >= 2:
-                raw_word = parts[0]
-                clean_word = re.sub(r'^\d+\.\s*', '', raw_word)
-                meaning = parts[1]
-                sentence = parts[2] if len(parts) >= 3 else ""
-                sentence_trans = parts[3] if len(parts) >= 4 else ""
-
-                word_data.append({
-                    "word": clean_word,
-                    "meaning": meaning,
-                    "sentence": sentence,
-                    "sentence_trans": sentence_trans
-                })
-    return word_data
+def load_album(mp3_dir):
+    """讀取整合音檔的索引，回傳 (音檔路徑, 各列 [開始, 結束] 秒數)；沒有整合音檔時回傳 None"""
+    index_path = os.path.join(mp3_dir, "album", "album.json")
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    entries = index.get("entries", [])
+    if not entries:
+        return None
+    return f"{mp3_dir}/album/{index['file']}", entries
 
-def generate_html():
-    if not os.path.exists(MP3_DIR):
-        print(f"❌ 找不到 {MP3_DIR} 資料夾")
-        return
+def album_version(entries):
+    """整合音檔的內容版本：所有列的雜湊與起訖時間的摘要 (中間任一列改變都會得到不同的版本)"""
+    source = "\n".join(f"{entry['hash']}:{entry['start']}:{entry['end']}" for entry in entries)
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
 
-    mp3_files = [f for f in os.listdir(MP3_DIR) if f.lower().endswith('.mp3')]
-    mp3_files.sort() 
+def write_sidecar(data_dir, name, payload, callback, state):
+    """
+    把資料同時寫成 name.json 與 name.js (以 <script> 載入，直接開啟本機 HTML 時 fetch 無法讀取檔案)
+    callback: .js 載入時呼叫的函式與前置參數，例如 "playlistChunkLoaded(3, "
+    state: 上次產生時各檔案的內容摘要；內容相同且檔案仍在時不重寫，回傳是否有寫入
+    """
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    digest = hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+    paths = [os.path.join(data_dir, f"{name}.json"), os.path.join(data_dir, f"{name}.js")]
+    if state.get(name) == digest and all(os.path.exists(path) for path in paths):
+        return False
+    with open(paths[0], "w", encoding="utf-8") as f:
+        f.write(data)
+    with open(paths[1], "w", encoding="utf-8") as f:
+        f.write(f"{callback}{data});\n")
+    state[name] = digest
+    return True
+
+def load_build_state(data_dir):
+    """讀取上次產生播放清單時記錄的內容摘要 (檔名 -> 摘要)"""
+    try:
+        with open(os.path.join(data_dir, BUILD_STATE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-    if not mp3_files:
-        print("⚠️ 資料夾內沒有 MP3 檔案")
+def save_build_state(data_dir, state):
+    with open(os.path.join(data_dir, BUILD_STATE), "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+
+def write_playlist_chunks(playlist, data_dir, chunk_size, state):
+    """
+    把播放清單切成固定大小的區塊寫入 data_dir，回傳索引 (總筆數、區塊大小、資料夾)
+    只重寫內容有變動的區塊
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    names = set()
+    written = 0
+    for n, start in enumerate(range(0, len(playlist), chunk_size)):
+        name = f"chunk-{n:04d}"
+        names.add(name)
+        written += write_sidecar(data_dir, name, playlist[start:start + chunk_size],
+                                 f"playlistChunkLoaded({n}, ", state)
+    for filename in os.listdir(data_dir):
+        name = filename.split(".")[0]
+        if name.startswith("chunk-") and name not in names:
+            os.remove(os.path.join(data_dir, filename))  # 清除舊的區塊 (表格變短時)
+            state.pop(name, None)
+    print(f"📦 播放清單 {len(names)} 個區塊，更新 {written} 個")
+    return {
+        "count": len(playlist),
+        "chunk_size": chunk_size,
+        "dir": os.path.basename(data_dir),
+    }
+
+def write_search_index(playlist, data_dir, state):
+    """搜尋索引：所有區塊都沒有變動時沿用上次的索引 (不重新斷詞)"""
+    source = hashlib.sha1("".join(state[name] for name in sorted(state) if name.startswith("chunk-"))
+                          .encode("ascii")).hexdigest()[:16]
+    exists = all(os.path.exists(os.path.join(data_dir, f"search.{ext}")) for ext in ("json", "js"))
+    if state.get("search-source") == source and exists:
         return
+    write_sidecar(data_dir, "search", build_index(playlist), "searchIndexLoaded(", state)
+    state["search-source"] = source
+
+def load_manifest(mp3_dir):
+    """
+    讀取生成程式寫入的 manifest.json，回傳 (檔名 -> 內容雜湊, 已完成的資料列)
+    資料列依表格順序記錄序號、檔名、雜湊與文字欄位；舊版 manifest 沒有資料列時回傳 None
+    """
+    path = os.path.join(mp3_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {}, None
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("files", {}), data.get("rows")
 
+def legacy_rows(mp3_dir, versions):
+    """舊版輸出 (manifest 沒有資料列)：掃描資料夾，並依位置對應 Markdown 的文字"""
+    audio_files = sorted(f for f in os.listdir(mp3_dir) if for_path(f) is not None)
     text_data = parse_md_file(INPUT_FILE)
-    playlist = []
-    
-    for i, filename in enumerate(mp3_files):
-        item = {
-            "file": f"{MP3_DIR}/{filename}",
-            "word": filename.replace(".mp3", ""),
+    rows = []
+    for i, filename in enumerate(audio_files):
+        row = {
+            "filename": filename,
+            "hash": versions.get(filename),
+            "word": os.path.splitext(filename)[0],
             "meaning": "",
             "sentence": "",
             "sentence_trans": ""
         }
-        
         if i < len(text_data):
-            item["word"] = text_data[i]["word"]
-            item["meaning"] = text_data[i]["meaning"]
-            item["sentence"] = text_data[i]["sentence"]
-            item["sentence_trans"] = text_data[i]["sentence_trans"]
-            
+            row.update(text_data[i])
+        rows.append(row)
+    return rows
+
+def track_timing(mp3_dir, row):
+    """
+    各列的長度與段落 (單字 / 中文 / 例句) 時間範圍：manifest 已記錄時直接使用，
+    否則以 mmap 讀取 frame / 頁面標頭計算 (MP3 / Opus / AAC，不解碼，上萬個檔案也只需數秒)
+    """
+    if "duration" in row:
+        return row["duration"], row["segments"]
+    duration, segments = probe_file(os.path.join(mp3_dir, row["filename"]))
+    return round(duration, 3), [[round(start, 3), round(end, 3)] for start, end in segments]
+
+def generate_html():
+    if not os.path.exists(MP3_DIR):
+        print(f"❌ 找不到 {MP3_DIR} 資料夾")
+        return
+
+    # 各列的文字與音檔由生成程式寫入 manifest，不必掃描資料夾、也不會因為某列失敗而錯位
+    versions, rows = load_manifest(MP3_DIR)
+    if rows is None:
+        print("⚠️ manifest.json 沒有資料列 (舊版輸出)，改為掃描資料夾並依順序對應文字；"
+              "重新執行生成程式後即可改用 manifest。")
+        rows = legacy_rows(MP3_DIR, versions)
+
+    album = load_album(MP3_DIR) if USE_ALBUM else None
+    if album:
+        album_file, entries = album
+        by_name = {row["filename"]: row for row in rows}
+        rows = [by_name.get(entry["filename"]) or
+                {"filename": entry["filename"], "word": entry["title"],
+                 "duration": round(entry["end"] - entry["start"], 3), "segments": []}
+                for entry in entries]
+        print(f"💿 使用整合音檔 {album_file} ({len(entries)} 筆)")
+        # 音檔網址加上內容版本 (?v=)，任何一列或時間位置改變時網址也會改變，瀏覽器可長期快取
+        album_file += f"?v={album_version(entries)}"
+
+    if not rows:
+        print("⚠️ 資料夾內沒有音檔")
+        return
+
+    playlist = []
+    for row in rows:
+        item = {}
+        if not album:
+            # 整合音檔模式下所有列共用同一個檔案，時間區段記錄在索引中
+            item["file"] = f"{MP3_DIR}/{row['filename']}"
+            if row.get("hash"):
+                item["file"] += f"?v={row['hash']}"
+        item.update((field, row.get(field, "")) for field in TEXT_FIELDS)
+        item["duration"], item["segments"] = track_timing(MP3_DIR, row)
         playlist.append(item)
 
-    js_playlist = json.dumps(playlist, ensure_ascii=False)
+    state = load_build_state(DATA_DIR)
+    index = write_playlist_chunks(playlist, DATA_DIR, CHUNK_SIZE, state)
+    # 搜尋索引：第一次使用搜尋框時才載入
+    write_search_index(playlist, DATA_DIR, state)
+    save_build_state(DATA_DIR, state)
+    # 各區塊的總長度：播放器不必載入所有區塊就能算出剩餘時間
+    index["chunk_durations"] = [round(sum(item["duration"] for item in playlist[start:start + CHUNK_SIZE]), 3)
+                                for start in range(0, len(playlist), CHUNK_SIZE)]
+    if album:
+        index["album"] = {
+            "file": album_file,
+            "starts": [entry["start"] for entry in entries],
+            "ends": [entry["end"] for entry in entries],
+        }
+    # 只內嵌索引與第一個區塊，其餘區塊在捲動或播放到時才載入
+    js_index = json.dumps(index, ensure_ascii=False)
+    js_first_chunk = json.dumps(playlist[:CHUNK_SIZE], ensure_ascii=False)
 
     html_content = f"""
 <!DOCTYPE html>
@@ -113,20 +249,37 @@ def generate_html():
         .controls-panel {{ display: flex; justify-content: center; gap: 15px; font-size: 0.9em; color: #666; background: #f8f9fa; padding: 10px; border-radius: 8px; }}
         /* 讓輸入框適合顯示數字 */
         .control-item input {{ padding: 5px; text-align: center; border: 1px solid #ddd; border-radius: 4px; width: 60px; }}
+        #timeInfo {{ align-self: center; white-space: nowrap; }}
+        /* 正在朗讀的欄位 (依各段的時間範圍) */
+        .speaking {{ background: #fff3cd; border-radius: 4px; }}
         
+        .search-box {{ position: relative; margin-bottom: 10px; }}
+        #searchInput {{ width: 100%; box-sizing: border-box; padding: 8px 12px; border: 1px solid #ddd; border-radius: 8px; font-size: 1rem; }}
+        .search-panel {{ display: none; position: absolute; left: 0; right: 0; top: 100%; margin-top: 4px; background: #fff; border-radius: 8px; box-shadow: 0 4px 16px rgba(0,0,0,0.15); z-index: 200; text-align: left; }}
+        .search-box.open .search-panel {{ display: block; }}
+        #searchStatus {{ font-size: 0.8em; color: #999; padding: 6px 12px; border-bottom: 1px solid #eee; }}
+        #searchResults {{ list-style: none; margin: 0; padding: 0; max-height: 50vh; overflow-y: auto; }}
+        #searchResults li {{ display: flex; gap: 10px; padding: 8px 12px; cursor: pointer; border-bottom: 1px solid #f4f4f4; }}
+        #searchResults li.selected {{ background: #e7f1ff; }}
+        .search-num {{ color: #999; min-width: 40px; }}
+        .search-word {{ font-weight: bold; color: #222; white-space: nowrap; }}
+        .search-meaning {{ color: #666; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
+
         .playlist-container {{ padding: 20px; padding-bottom: 350px; }}
-        .playlist {{ list-style: none; padding: 0; margin: 0; }}
+        /* 虛擬化清單：每列固定高度 64px + 間距 10px (與 ROW_HEIGHT 一致)，只繪製可視範圍內的列 */
+        .playlist {{ list-style: none; padding: 0; margin: 0; position: relative; }}
         .playlist li {{ 
-            padding: 15px; margin-bottom: 10px; background: #fff; border-radius: 10px; 
+            position: absolute; left: 0; right: 0; height: 64px; box-sizing: border-box;
+            padding: 0 15px; background: #fff; border-radius: 10px; 
             cursor: pointer; display: flex; align-items: center; transition: 0.2s; border: 1px solid transparent;
         }}
         .playlist li:hover {{ transform: translateY(-2px); box-shadow: 0 2px 8px rgba(0,0,0,0.05); }}
         .playlist li.active {{ background-color: #e7f1ff; border-color: #007bff; box-shadow: 0 4px 12px rgba(0,123,255,0.15); }}
 
         .track-num {{ font-size: 0.9em; color: #999; width: 40px; text-align: center; flex-shrink: 0; }}
-        .track-content {{ flex-grow: 1; margin-left: 10px; }}
-        .track-word {{ font-weight: bold; font-size: 1.1em; color: #222; display: block; }}
-        .track-meaning {{ font-size: 0.95em; color: #666; }}
+        .track-content {{ flex-grow: 1; margin-left: 10px; min-width: 0; }}
+        .track-word {{ font-weight: bold; font-size: 1.1em; color: #222; display: block; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
+        .track-meaning {{ font-size: 0.95em; color: #666; display: block; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
         .active .track-word {{ color: #007bff; }}
     </style>
 </head>
@@ -153,6 +306,14 @@ def generate_html():
             <button onclick="playNext(true)">⏭</button>
         </div>
 
+        <div class="search-box" id="searchBox">
+            <input type="search" id="searchInput" placeholder="🔍 搜尋英文、中文或例句 (按 / )" autocomplete="off">
+            <div class="search-panel">
+                <div id="searchStatus"></div>
+                <ul id="searchResults"></ul>
+            </div>
+        </div>
+
         <div class="controls-panel">
             <div class="control-item">
                 <label>間隔(秒)</label>
@@ -163,6 +324,7 @@ def generate_html():
                 <input type="number" id="jumpInput" placeholder="No." min="1">
                 <button onclick="jumpToTrack()" style="padding: 4px 10px; background: #ddd; color: #333;">Go</button>
             </div>
+            <div class="control-item" id="timeInfo"></div>
         </div>
     </div>
 
@@ -171,15 +333,34 @@ def generate_html():
     </div>
 
     <script>
-        const playlistData = {js_playlist};
+        const playlistIndex = {js_index};
+        const ROW_HEIGHT = 74;      // 每列高度 (含間距)，需與 CSS 的 .playlist li 一致
+        const OVERSCAN = 8;         // 可視範圍上下多繪製的列數
+        const total = playlistIndex.count;
+        const chunkSize = playlistIndex.chunk_size;
+        const album = playlistIndex.album || null;
+        const PREFETCH_COUNT = {PREFETCH_COUNT};
+        const chunkDurations = playlistIndex.chunk_durations || [];   // 各區塊的音訊總長 (秒)
+        const totalDuration = chunkDurations.reduce((a, b) => a + b, 0);
+
+        // 播放清單區塊：第一個區塊內嵌於網頁，其餘在捲動或播放到時才載入
+        const chunks = new Map([[0, {js_first_chunk}]]);
+        const pendingChunks = new Map();
+        const sidecarResolvers = new Map();
 
         let currentIndex = 0;
         let gapTimer = null;
         let gapRemaining = 0;
         let gapStartTime = 0;
         let isGapPaused = false;
+        let currentSrc = null;
+        let trackEnd = null;      // 整合音檔模式：目前這一列的結束時間 (秒)
+        let trackDone = false;
+        let loadToken = 0;
 
-        const audio = document.getElementById('audioPlayer');
+        let audio = document.getElementById('audioPlayer');
+        let audioEvents = null;     // 目前播放器元素的事件綁定 (換元素時一併解除)
+        const standby = new Map();  // 列索引 -> 預先載入中的 Audio 元素
         const displayWord = document.getElementById('current-word');
         const displayMeaning = document.getElementById('current-meaning');
         const displaySentence = document.getElementById('current-sentence');
@@ -188,28 +369,169 @@ def generate_html():
         const delayInput = document.getElementById('delayInput');
         const playPauseBtn = document.getElementById('playPauseBtn');
         const jumpInput = document.getElementById('jumpInput');
+        const timeInfo = document.getElementById('timeInfo');
+
+        function getItem(index) {{
+            const chunk = chunks.get(Math.floor(index / chunkSize));
+            return chunk ? chunk[index % chunkSize] : null;
+        }}
+
+        // 讀取資料夾內的 name.json；file:// 不允許 fetch 讀取本機檔案，改以 <script> 載入 name.js
+        // (.js 載入後呼叫 playlistChunkLoaded / searchIndexLoaded，再由 sidecarLoaded 交回資料)
+        function loadSidecar(name) {{
+            const url = `${{playlistIndex.dir}}/${{name}}`;
+            if (location.protocol !== 'file:') {{
+                return fetch(url + '.json').then(r => {{ if (!r.ok) throw new Error(r.status); return r.json(); }});
+            }}
+            return new Promise((resolve, reject) => {{
+                sidecarResolvers.set(name, resolve);
+                const script = document.createElement('script');
+                script.src = url + '.js';
+                script.onerror = () => {{
+                    sidecarResolvers.delete(name);
+                    reject(new Error(url));
+                }};
+                document.head.appendChild(script);
+            }});
+        }}
+
+        function sidecarLoaded(name, data) {{
+            const resolve = sidecarResolvers.get(name);
+            if (resolve) {{
+                sidecarResolvers.delete(name);
+                resolve(data);
+            }}
+        }}
+
+        function chunkName(n) {{
+            return `chunk-${{String(n).padStart(4, '0')}}`;
+        }}
+
+        // 由 chunk-XXXX.js 呼叫
+        function playlistChunkLoaded(n, items) {{
+            sidecarLoaded(chunkName(n), items);
+        }}
+
+        function loadChunk(n) {{
+            if (chunks.has(n)) return Promise.resolve(chunks.get(n));
+            if (pendingChunks.has(n)) return pendingChunks.get(n);
+            let promise = loadSidecar(chunkName(n))
+                .then(items => {{ chunks.set(n, items); return items; }})
+                .finally(() => pendingChunks.delete(n));
+            pendingChunks.set(n, promise);
+            promise.then(() => renderWindow(true), () => {{}});
+            return promise;
+        }}
+
+        // ===== 虛擬化清單：只繪製可視範圍內的列，與清單總長度無關 =====
+        const renderedRows = new Map();   // 列索引 -> li
+        let renderedFirst = -1;
+        let renderedLast = -1;
+        let activeEl = null;
+        let renderQueued = false;
+
+        function listTop() {{
+            return playlistUi.getBoundingClientRect().top + window.pageYOffset;
+        }}
+
+        function fillRow(li, index) {{
+            const item = getItem(index);
+            li.querySelector('.track-word').textContent = item ? item.word : '…';
+            li.querySelector('.track-meaning').textContent = item ? item.meaning : '';
+            li.dataset.loaded = item ? '1' : '0';
+        }}
+
+        function createRow(index) {{
+            const li = document.createElement('li');
+            li.dataset.index = index;
+            li.style.top = (index * ROW_HEIGHT) + 'px';
+            li.innerHTML = `
+                <span class="track-num"></span>
+                <div class="track-content">
+                    <span class="track-word"></span>
+                    <span class="track-meaning"></span>
+                </div>
+            `;
+            li.querySelector('.track-num').textContent = index + 1;
+            if (index === currentIndex) {{
+                li.classList.add('active');
+                activeEl = li;
+            }}
+            return li;
+        }}
+
+        function renderWindow(force = false) {{
+            const offset = window.pageYOffset - listTop();
+            const first = Math.max(0, Math.floor(offset / ROW_HEIGHT) - OVERSCAN);
+            const last = Math.min(total, Math.ceil((offset + window.innerHeight) / ROW_HEIGHT) + OVERSCAN);
+            if (!force && first === renderedFirst && last === renderedLast) return;
+
+            for (const [index, li] of renderedRows) {{
+                if (index < first || index >= last) {{
+                    if (li === activeEl) activeEl = null;
+                    li.remove();
+                    renderedRows.delete(index);
+                }}
+            }}
+            for (let index = first; index < last; index++) {{
+                let li = renderedRows.get(index);
+                if (!li) {{
+                    li = createRow(index);
+                    renderedRows.set(index, li);
+                    playlistUi.appendChild(li);
+                    fillRow(li, index);
+                }} else if (li.dataset.loaded === '0') {{
+                    fillRow(li, index);
+                }}
+            }}
+            renderedFirst = first;
+            renderedLast = last;
+
+            if (last > first) {{
+                for (let n = Math.floor(first / chunkSize); n <= Math.floor((last - 1) / chunkSize); n++) {{
+                    if (!chunks.has(n)) loadChunk(n);
+                }}
+            }}
+        }}
+
+        function scheduleRender() {{
+            if (renderQueued) return;
+            renderQueued = true;
+            requestAnimationFrame(() => {{
+                renderQueued = false;
+                renderWindow();
+            }});
+        }}
+
+        // 目前播放列的標示：只更新前一個與新的元素 (O(1))
+        function setActive(index) {{
+            if (activeEl) activeEl.classList.remove('active');
+            activeEl = renderedRows.get(index) || null;
+            if (activeEl) activeEl.classList.add('active');
+        }}
+
+        function scrollToTrack(index) {{
+            // 維持 V6 設定：目前的列捲動到畫面下方 1/4 處
+            const absoluteElementTop = listTop() + index * ROW_HEIGHT;
+            window.scrollTo({{
+                top: absoluteElementTop - (window.innerHeight * 0.75),
+                behavior: 'smooth'
+            }});
+        }}
 
         function initPlaylist() {{
-            playlistUi.innerHTML = '';
-            
             // 修正：動態設定輸入框最大值
-            jumpInput.max = playlistData.length;
-            jumpInput.placeholder = `1-${{playlistData.length}}`;
+            jumpInput.max = total;
+            jumpInput.placeholder = `1-${{total}}`;
 
-            playlistData.forEach((item, index) => {{
-                const li = document.createElement('li');
-                li.id = 'track-' + index;
-                li.onclick = () => loadTrack(index);
-                
-                li.innerHTML = `
-                    <span class="track-num">${{index + 1}}</span>
-                    <div class="track-content">
-                        <span class="track-word">${{item.word}}</span>
-                        <span class="track-meaning">${{item.meaning}}</span>
-                    </div>
-                `;
-                playlistUi.appendChild(li);
+            playlistUi.style.height = (total * ROW_HEIGHT) + 'px';
+            playlistUi.addEventListener('click', (e) => {{
+                const li = e.target.closest('li');
+                if (li) loadTrack(Number(li.dataset.index));
             }});
+            window.addEventListener('scroll', scheduleRender, {{ passive: true }});
+            window.addEventListener('resize', scheduleRender);
+            renderWindow(true);
         }}
         
         function clearGapState() {{
@@ -218,37 +540,217 @@ def generate_html():
             gapRemaining = 0;
         }}
 
-        function loadTrack(index) {{
-            clearGapState();
-            if (index < 0 || index >= playlistData.length) return;
-            
-            currentIndex = index;
-            const item = playlistData[currentIndex];
-
-            audio.src = item.file;
+        function showItem(item) {{
             displayWord.innerText = item.word;
             displayMeaning.innerText = item.meaning;
             displaySentence.innerText = item.sentence || ""; 
             displaySentenceTrans.innerText = item.sentence_trans || "";
+        }}
 
-            // 清單捲動邏輯 (維持 V6 設定：下方 1/4 處)
-            document.querySelectorAll('.playlist li').forEach(el => el.classList.remove('active'));
-            const activeItem = document.getElementById('track-' + currentIndex);
+        function loadTrack(index) {{
+            clearGapState();
+            if (index < 0 || index >= total) return;
             
-            if(activeItem) {{
-                activeItem.classList.add('active');
-                
-                const elementRect = activeItem.getBoundingClientRect();
-                const absoluteElementTop = elementRect.top + window.pageYOffset;
-                const targetScrollTop = absoluteElementTop - (window.innerHeight * 0.75);
-
-                window.scrollTo({{
-                    top: targetScrollTop,
-                    behavior: 'smooth'
-                }});
+            currentIndex = index;
+            const token = ++loadToken;
+            setActive(index);
+            scrollToTrack(index);
+
+            const item = getItem(index);
+            if (item) {{
+                startTrack(index, item);
+                return;
             }}
-            
+            displayWord.innerText = "Loading...";
+            loadChunk(Math.floor(index / chunkSize)).then(() => {{
+                if (token === loadToken) startTrack(index, getItem(index));
+            }}, () => {{
+                displayWord.innerText = "⚠️ 無法載入播放清單";
+            }});
+        }}
+
+        // ===== 長度資訊：產生網頁時已由 frame 標頭算出每列的長度與各段時間範圍 =====
+        let remainingAfter = 0;   // 目前這列 (含) 到清單結尾的音訊總長，換列時計算
+        let speakingEl = null;
+
+        function formatTime(seconds) {{
+            seconds = Math.max(0, Math.round(seconds));
+            const h = Math.floor(seconds / 3600), m = Math.floor(seconds / 60) % 60, s = seconds % 60;
+            const mmss = `${{String(m).padStart(h ? 2 : 1, '0')}}:${{String(s).padStart(2, '0')}}`;
+            return h ? `${{h}}:${{mmss}}` : mmss;
+        }}
+
+        // 同一區塊逐列相加，之後的區塊使用預先算好的總長 (不必載入)
+        function computeRemaining(index) {{
+            const n = Math.floor(index / chunkSize);
+            const items = chunks.get(n) || [];
+            let sum = 0;
+            for (let i = index % chunkSize; i < items.length; i++) sum += items[i].duration || 0;
+            for (let k = n + 1; k < chunkDurations.length; k++) sum += chunkDurations[k];
+            return sum;
+        }}
+
+        // 目前這列已播放的秒數
+        function trackPosition() {{
+            return album ? audio.currentTime - album.starts[currentIndex] : audio.currentTime;
+        }}
+
+        function updateTimeInfo() {{
+            if (!totalDuration) return;
+            const gap = parseFloat(delayInput.value) || 0;
+            const left = remainingAfter - Math.max(0, trackPosition()) + gap * (total - currentIndex - 1);
+            timeInfo.textContent = `⏱ 剩餘 ${{formatTime(left)}} / 共 ${{formatTime(totalDuration + gap * (total - 1))}}`;
+        }}
+
+        // 標示正在朗讀的欄位：各段依序為單字、中文、例句 (空白的欄位沒有語音)
+        function updateSpeaking() {{
+            const item = getItem(currentIndex);
+            let el = null;
+            if (item && item.segments) {{
+                const fields = [[item.word, displayWord], [item.meaning, displayMeaning], [item.sentence, displaySentence]];
+                const els = fields.filter(([text]) => text).map(([, field]) => field);
+                const t = trackPosition();
+                const k = item.segments.findIndex(([start, end]) => t >= start && t < end);
+                if (k >= 0 && k < els.length) el = els[k];
+            }}
+            if (el === speakingEl) return;
+            if (speakingEl) speakingEl.classList.remove('speaking');
+            if (el) el.classList.add('speaking');
+            speakingEl = el;
+        }}
+
+        function onTimeUpdate() {{
+            checkTrackEnd();
+            updateSpeaking();
+            updateTimeInfo();
+        }}
+
+        function startTrack(index, item) {{
+            setSource(index, item);
+            showItem(item);
+            remainingAfter = computeRemaining(index);
+            updateTimeInfo();
             audio.play().catch(e => {{}});
+            prefetchAround(index);
+            // 接近區塊尾端時先載入下一個區塊
+            const next = Math.floor(index / chunkSize) + 1;
+            if (index % chunkSize >= chunkSize - 20 && next * chunkSize < total) loadChunk(next);
+        }}
+
+        function setSource(index, item) {{
+            // 同一個檔案 (整合音檔) 不重新載入，只跳到該列的開始時間
+            const file = album ? album.file : item.file;
+            const ready = standby.get(index);
+            if (ready && currentSrc !== file) {{
+                // 已預先載入：直接換上該元素，不必等待下載與解碼
+                standby.delete(index);
+                swapAudio(ready);
+                currentSrc = file;
+            }} else if (currentSrc !== file) {{
+                audio.src = file;
+                currentSrc = file;
+            }}
+            trackDone = false;
+            if (album) {{
+                trackEnd = album.ends[index];
+                audio.currentTime = album.starts[index];
+            }} else {{
+                trackEnd = null;
+            }}
+        }}
+
+        // ===== 預先載入：以待命的 Audio 元素緩衝接下來 PREFETCH_COUNT 首 =====
+        function releaseAudio(el) {{
+            el.pause();
+            el.removeAttribute('src');
+            el.load();  // 釋放已緩衝的音訊
+        }}
+
+        function prefetchAround(index) {{
+            if (album || PREFETCH_COUNT <= 0) return;  // 整合音檔只有一個檔案，不需預先載入
+            const last = Math.min(total - 1, index + PREFETCH_COUNT);
+            for (const [i, el] of standby) {{
+                if (i <= index || i > last) {{
+                    releaseAudio(el);
+                    standby.delete(i);
+                }}
+            }}
+            for (let i = index + 1; i <= last; i++) {{
+                if (standby.has(i)) continue;
+                const item = getItem(i);
+                if (!item) {{
+                    loadChunk(Math.floor(i / chunkSize)).then(() => prefetchAround(currentIndex), () => {{}});
+                    break;
+                }}
+                const el = new Audio();
+                el.preload = 'auto';
+                el.src = item.file;
+                el.load();
+                standby.set(i, el);
+            }}
+        }}
+
+        function swapAudio(next) {{
+            const prev = audio;
+            next.controls = true;
+            next.id = prev.id;
+            next.volume = prev.volume;
+            next.muted = prev.muted;
+            next.playbackRate = prev.playbackRate;
+            prev.replaceWith(next);
+            audio = next;
+            bindAudio(next);
+            releaseAudio(prev);
+        }}
+
+        function finishTrack() {{
+            if (trackDone) return;
+            trackDone = true;
+            const delayVal = parseFloat(delayInput.value) || 0;
+            if (delayVal <= 0) {{
+                playNext();
+            }} else {{
+                startGap(delayVal);
+            }}
+        }}
+
+        // 整合音檔模式：播放到該列結束時間就暫停 (timeupdate 約 4 次/秒，播放中另以 requestAnimationFrame 補足精度)
+        function checkTrackEnd() {{
+            if (trackEnd === null || trackDone || audio.paused) return false;
+            if (audio.currentTime < trackEnd) return false;
+            audio.pause();
+            finishTrack();
+            return true;
+        }}
+
+        function watchTrackEnd() {{
+            if (trackEnd === null || audio.paused || checkTrackEnd()) return;
+            requestAnimationFrame(watchTrackEnd);
+        }}
+
+        // 使用者拖曳進度條到其他列時，同步目前的列
+        function onSeeked() {{
+            if (!album) return;
+            const t = audio.currentTime;
+            if (t >= album.starts[currentIndex] && t < album.ends[currentIndex]) return;
+            let lo = 0, hi = total - 1;
+            while (lo < hi) {{
+                const mid = (lo + hi + 1) >> 1;
+                if (album.starts[mid] <= t) lo = mid; else hi = mid - 1;
+            }}
+            currentIndex = lo;
+            remainingAfter = computeRemaining(lo);
+            trackEnd = album.ends[lo];
+            trackDone = false;
+            setActive(lo);
+            const item = getItem(lo);
+            if (item) {{
+                showItem(item);
+            }} else {{
+                loadChunk(Math.floor(lo / chunkSize)).then(() => {{
+                    if (currentIndex === lo) showItem(getItem(lo));
+                }}, () => {{}});
+            }}
         }}
 
         function togglePlay() {{
@@ -261,13 +763,26 @@ def generate_html():
             }}
         }}
 
-        audio.onplay = () => {{
+        function onPlay() {{
             clearGapState();
             playPauseBtn.innerText = "⏸ 暫停";
-        }};
-        audio.onpause = () => {{
-            if (!isGapPaused) playPauseBtn.innerText = "▶ 播放";
-        }};
+            watchTrackEnd();
+        }}
+
+        function onPause() {{
+            if (!isGapPaused && !gapTimer) playPauseBtn.innerText = "▶ 播放";
+        }}
+
+        function bindAudio(el) {{
+            if (audioEvents) audioEvents.abort();  // 解除舊元素的事件
+            audioEvents = new AbortController();
+            const options = {{ signal: audioEvents.signal }};
+            el.addEventListener('play', onPlay, options);
+            el.addEventListener('pause', onPause, options);
+            el.addEventListener('timeupdate', onTimeUpdate, options);
+            el.addEventListener('seeked', onSeeked, options);
+            el.addEventListener('ended', finishTrack, options);
+        }}
         
         function startGap(seconds) {{
             clearGapState(); 
@@ -299,8 +814,8 @@ def generate_html():
         function jumpToTrack() {{
             const val = parseInt(jumpInput.value);
             // 修正：增加範圍防呆機制
-            if (!val || val < 1 || val > playlistData.length) {{
-                alert("請輸入 1 到 " + playlistData.length + " 之間的數字");
+            if (!val || val < 1 || val > total) {{
+                alert("請輸入 1 到 " + total + " 之間的數字");
                 return;
             }}
             loadTrack(val - 1);
@@ -315,7 +830,7 @@ def generate_html():
         function playNext(force = false) {{
             if (force) clearGapState();
 
-            if (currentIndex < playlistData.length - 1) {{
+            if (currentIndex < total - 1) {{
                 loadTrack(currentIndex + 1);
             }} else {{
                 displayWord.innerText = "🎉 完成";
@@ -329,14 +844,240 @@ def generate_html():
             if (currentIndex > 0) loadTrack(currentIndex - 1);
         }}
 
-        audio.addEventListener('ended', () => {{
-            const delayVal = parseFloat(delayInput.value) || 0;
-            if (delayVal <= 0) {{
-                playNext();
+        // ===== 搜尋：產生網頁時預先建立的倒排索引 (search.json)，第一次使用搜尋框時才載入 =====
+        // 斷詞規則與 search_index.py 相同：NFKC + 小寫；英數字為詞 (最後一詞以前綴比對)；中日文取單字與相鄰兩字
+        const SEARCH_LIMIT = 50;
+        const LATIN_RE = /[a-z0-9]+/g;
+        const CJK_RE = /[\\u3040-\\u30ff\\u3400-\\u9fff\\uf900-\\ufaff]+/g;
+        const searchBox = document.getElementById('searchBox');
+        const searchInput = document.getElementById('searchInput');
+        const searchStatus = document.getElementById('searchStatus');
+        const searchList = document.getElementById('searchResults');
+        let searchIndex = null;
+        let searchLoading = null;
+        let searchResults = [];
+        let searchSelected = 0;
+
+        // 由 search.js 呼叫
+        function searchIndexLoaded(data) {{
+            sidecarLoaded('search', data);
+        }}
+
+        function loadSearchIndex() {{
+            if (!searchLoading) {{
+                searchStatus.textContent = '載入搜尋索引…';
+                searchLoading = loadSidecar('search').then(data => {{
+                    searchIndex = prepareSearchIndex(data);
+                    runSearch();  // 索引載入前已輸入的文字
+                }}, () => {{
+                    searchLoading = null;
+                    searchStatus.textContent = '無法載入搜尋索引';
+                }});
+            }}
+            return searchLoading;
+        }}
+
+        function prepareSearchIndex(data) {{
+            return {{
+                vocab: data.vocab.split('\\n'),
+                postings: data.postings.split(';'),
+                titles: data.titles,
+                keys: data.titles.map(title => title.normalize('NFKC').toLowerCase()),
+                decoded: new Map(),
+                mark: new Uint32Array(data.count),  // 交集用的標記 (每次比對遞增 stamp，不必清除)
+                stamp: 0,
+            }};
+        }}
+
+        // 差值編碼 (36 進位) 還原成列編號 (每個詞第一次用到時才解碼)
+        function postingsOf(idx, t) {{
+            let rows = idx.decoded.get(t);
+            if (!rows) {{
+                const deltas = idx.postings[t].split(',');
+                rows = new Int32Array(deltas.length);
+                let row = 0;
+                for (let i = 0; i < deltas.length; i++) {{
+                    row += parseInt(deltas[i], 36);
+                    rows[i] = row;
+                }}
+                idx.decoded.set(t, rows);
+            }}
+            return rows;
+        }}
+
+        function lowerBound(vocab, key) {{
+            let lo = 0, hi = vocab.length;
+            while (lo < hi) {{
+                const mid = (lo + hi) >>> 1;
+                if (vocab[mid] < key) lo = mid + 1; else hi = mid;
+            }}
+            return lo;
+        }}
+
+        // 查詢詞 -> 詞彙表範圍 [lo, hi)；前綴比對時包含所有以此開頭的詞
+        function termRange(idx, term, prefix) {{
+            const lo = lowerBound(idx.vocab, term);
+            if (prefix) return [lo, lowerBound(idx.vocab, term + '\\uffff')];
+            return idx.vocab[lo] === term ? [lo, lo + 1] : [lo, lo];
+        }}
+
+        function parseQuery(idx, query) {{
+            const text = query.normalize('NFKC').toLowerCase();
+            const groups = [];
+            for (const m of text.matchAll(LATIN_RE)) {{
+                // 最後一個英文詞後面沒有其他字元時視為仍在輸入，以前綴比對 (單一字母除外)
+                const prefix = m.index + m[0].length === text.length && m[0].length > 1;
+                groups.push(termRange(idx, m[0], prefix));
+            }}
+            for (const m of text.matchAll(CJK_RE)) {{
+                const run = m[0];
+                if (run.length === 1) groups.push(termRange(idx, run, false));
+                for (let i = 0; i + 1 < run.length; i++) groups.push(termRange(idx, run.slice(i, i + 2), false));
+            }}
+            return {{ text: text.trim(), groups }};
+        }}
+
+        // 回傳 {{ rows: 前 limit 筆列編號, count: 符合總數 }}；英文單字欄位符合的排在前面
+        function querySearchIndex(idx, query, limit) {{
+            const {{ text, groups }} = parseQuery(idx, query);
+            if (!groups.length) return {{ rows: [], count: 0 }};
+            // 由列數最少的詞開始交集，候選數量一開始就最小 (以編碼長度估計列數，不必先解碼)
+            const sized = groups.map(([lo, hi]) => {{
+                let size = 0;
+                for (let t = lo; t < hi; t++) size += idx.postings[t].length;
+                return {{ lo, hi, size }};
+            }}).sort((a, b) => a.size - b.size);
+
+            const mark = idx.mark;
+            let candidates = null;
+            for (const {{ lo, hi, size }} of sized) {{
+                if (size === 0) return {{ rows: [], count: 0 }};
+                const stamp = ++idx.stamp;
+                if (candidates === null) {{
+                    candidates = [];
+                    for (let t = lo; t < hi; t++) {{
+                        for (const row of postingsOf(idx, t)) {{
+                            if (mark[row] !== stamp) {{
+                                mark[row] = stamp;
+                                candidates.push(row);
+                            }}
+                        }}
+                    }}
+                }} else {{
+                    for (let t = lo; t < hi; t++) {{
+                        for (const row of postingsOf(idx, t)) mark[row] = stamp;
+                    }}
+                    candidates = candidates.filter(row => mark[row] === stamp);
+                    if (!candidates.length) return {{ rows: [], count: 0 }};
+                }}
+            }}
+
+            const sorted = Int32Array.from(candidates).sort();
+            const starts = [], contains = [], others = [];
+            for (const row of sorted) {{
+                const key = idx.keys[row];
+                if (key.startsWith(text)) {{
+                    starts.push(row);
+                    if (starts.length >= limit) break;
+                }} else if (key.includes(text)) {{
+                    if (contains.length < limit) contains.push(row);
+                }} else if (others.length < limit) {{
+                    others.push(row);
+                }}
+            }}
+            return {{ rows: starts.concat(contains, others).slice(0, limit), count: sorted.length }};
+        }}
+
+        function runSearch() {{
+            const query = searchInput.value;
+            if (!searchIndex || !query.trim()) {{
+                searchResults = [];
+                searchList.replaceChildren();
+                if (searchIndex) hideSearch();
+                return;
+            }}
+            const started = performance.now();
+            const {{ rows, count }} = querySearchIndex(searchIndex, query, SEARCH_LIMIT);
+            const elapsed = performance.now() - started;
+
+            searchResults = rows;
+            searchSelected = 0;
+            const fragment = document.createDocumentFragment();
+            rows.forEach((row, n) => {{
+                const li = document.createElement('li');
+                li.dataset.index = row;
+                if (n === 0) li.classList.add('selected');
+                const num = document.createElement('span');
+                num.className = 'search-num';
+                num.textContent = row + 1;
+                const word = document.createElement('span');
+                word.className = 'search-word';
+                word.textContent = searchIndex.titles[row];
+                li.append(num, word);
+                const item = getItem(row);
+                if (item && item.meaning) {{
+                    const meaning = document.createElement('span');
+                    meaning.className = 'search-meaning';
+                    meaning.textContent = item.meaning;
+                    li.appendChild(meaning);
+                }}
+                fragment.appendChild(li);
+            }});
+            searchList.replaceChildren(fragment);
+            searchStatus.textContent = count
+                ? `${{count}} 筆符合${{count > rows.length ? `，顯示前 ${{rows.length}} 筆` : ''}} (${{elapsed.toFixed(2)}} ms)`
+                : '沒有符合的項目';
+            searchBox.classList.add('open');
+        }}
+
+        function hideSearch() {{
+            searchBox.classList.remove('open');
+        }}
+
+        function moveSearchSelection(step) {{
+            if (!searchResults.length) return;
+            const items = searchList.children;
+            items[searchSelected].classList.remove('selected');
+            searchSelected = (searchSelected + step + searchResults.length) % searchResults.length;
+            items[searchSelected].classList.add('selected');
+            items[searchSelected].scrollIntoView({{ block: 'nearest' }});
+        }}
+
+        function pickSearchResult(index) {{
+            hideSearch();
+            searchInput.blur();
+            loadTrack(index);
+        }}
+
+        searchInput.addEventListener('focus', () => {{
+            if (searchIndex) {{
+                runSearch();
             }} else {{
-                startGap(delayVal);
+                searchBox.classList.add('open');  // 顯示載入狀態
+                loadSearchIndex();
             }}
         }});
+        searchInput.addEventListener('input', runSearch);
+        searchInput.addEventListener('blur', hideSearch);
+        searchInput.addEventListener('keydown', (e) => {{
+            if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {{
+                e.preventDefault();
+                moveSearchSelection(e.key === 'ArrowDown' ? 1 : -1);
+            }} else if (e.key === 'Enter') {{
+                if (searchResults.length) pickSearchResult(searchResults[searchSelected]);
+            }} else if (e.key === 'Escape') {{
+                searchInput.value = '';
+                runSearch();
+                searchInput.blur();
+            }}
+        }});
+        // mousedown 時先取消預設動作，避免搜尋框失去焦點而先關閉結果
+        searchList.addEventListener('mousedown', (e) => {{
+            const li = e.target.closest('li');
+            if (!li) return;
+            e.preventDefault();
+            pickSearchResult(Number(li.dataset.index));
+        }});
 
         document.addEventListener('keydown', (e) => {{
             if (document.activeElement.tagName === "INPUT") return;
@@ -348,17 +1089,22 @@ def generate_html():
                 playPrev();
             }} else if (e.code === "ArrowRight") {{
                 playNext(true);
+            }} else if (e.key === "/") {{
+                e.preventDefault();
+                searchInput.focus();
             }}
         }});
 
+        bindAudio(audio);
         initPlaylist();
         
-        const first = playlistData[0];
-        audio.src = first.file;
-        displayWord.innerText = first.word;
-        displayMeaning.innerText = first.meaning;
-        displaySentence.innerText = first.sentence || "";
-        displaySentenceTrans.innerText = first.sentence_trans || "";
+        const first = getItem(0);
+        setSource(0, first);
+        remainingAfter = computeRemaining(0);
+        updateTimeInfo();
+        delayInput.addEventListener('input', updateTimeInfo);
+        showItem(first);
+        prefetchAround(0);
 
     </script>
 </body>
@@ -370,5 +1116,22 @@ def generate_html():
     
     print(f"✅ V6 (修正版) 網頁已生成！請開啟 {HTML_FILE}")
 
+def serve_player(host, port):
+    """以本機 HTTP 伺服器提供播放器 (支援拖曳進度、快取，同一網路的裝置也能收聽)"""
+    from player_server import serve
+    root = os.path.dirname(os.path.abspath(HTML_FILE))
+    try:
+        asyncio.run(serve(root, os.path.basename(HTML_FILE), [DATA_DIR], [MP3_DIR], host, port, hidden=[BUILD_STATE]))
+    except KeyboardInterrupt:
+        print("\n伺服器已停止。")
+
 if __name__ == "__main__":
-    generate_html()
\ No newline at end of file
+    from player_server import HOST, PORT
+    parser = argparse.ArgumentParser(description="產生單字聽力訓練網頁播放器")
+    parser.add_argument("--serve", action="store_true", help="產生後啟動本機 HTTP 伺服器")
+    parser.add_argument("--host", default=HOST, help="伺服器位址 (0.0.0.0 = 開放同一網路的裝置連線)")
+    parser.add_argument("--port", type=int, default=PORT, help="伺服器連接埠")
+    args = parser.parse_args()
+    generate_html()
+    if args.serve:
+        serve_player(args.host, args.port)
\ No newline at end of file
@@ -0,0 +1,62 @@
+import time
+
+# =================設定區=================
+FALLBACK_AFTER = 3       # 主要引擎連續幾個片段失敗 (重試用盡) 後，改用備援引擎
+FALLBACK_PROBE = 60.0    # 改用備援引擎後，每隔幾秒讓一個請求再試主要引擎 (成功即切回)
+# ========================================
+
+class Failover:
+    """
+    跨引擎備援 (例如 Edge TTS ⇄ OpenAI)
+    主要引擎的片段重試用盡時，該片段改用備援引擎與對應的聲音重新合成；
+    連續失敗 FALLBACK_AFTER 次後直接改用備援引擎，並定期試探主要引擎是否恢復
+    備援引擎使用獨立的並發控制 (limiter) 與對沖統計 (hedger)，不受主要引擎降速影響
+    """
+
+    def __init__(self, backend, voices, limiter, hedger=None, after=FALLBACK_AFTER, probe=FALLBACK_PROBE):
+        self.backend = backend
+        self.voices = voices     # 主要引擎的聲音 -> 備援引擎的聲音 (沒有對應的聲音不備援)
+        self.limiter = limiter
+        self.hedger = hedger
+        self.after = after
+        self.probe = probe
+        self._streak = 0
+        self._tripped_at = None
+        self._last_probe = 0.0
+        self.switches = 0
+        self.segments = 0
+
+    @property
+    def tripped(self):
+        """是否已改用備援引擎"""
+        return self._tripped_at is not None
+
+    def voice(self, voice):
+        return self.voices.get(voice)
+
+    def use_primary(self):
+        """這次請求是否使用主要引擎 (已切換時，每 probe 秒放行一個試探請求)"""
+        if not self.tripped:
+            return True
+        now = time.monotonic()
+        if now - self._last_probe >= self.probe:
+            self._last_probe = now
+            return True
+        return False
+
+    def success(self):
+        self._streak = 0
+        if self.tripped:
+            print(f"   ✅ 主要引擎已恢復，停止使用 {self.backend.name}")
+            self._tripped_at = None
+
+    def failure(self):
+        self._streak += 1
+        if not self.tripped and self._streak >= self.after:
+            self._tripped_at = self._last_probe = time.monotonic()
+            self.switches += 1
+            print(f"   ↪️ 主要引擎連續失敗 {self._streak} 次，改用備援引擎 {self.backend.name}")
+
+    def summary(self):
+        state = "使用中" if self.tripped else "待命"
+        return f"備援引擎 {self.backend.name} ({state})：切換 {self.switches} 次，合成 {self.segments} 個片段"
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from collections import deque
+from metrics import percentile
+
+# =================設定區=================
+REQUEST_TIMEOUT = 60.0   # 單次請求 (含串流傳輸) 的期限秒數，超過視為逾時並交給重試
+HEDGE_PERCENTILE = 95    # 超過最近首位元組時間的這個百分位仍未收到音訊時，送出一個重複請求
+HEDGE_MIN_SAMPLES = 20   # 累積多少個樣本後才開始對沖
+HEDGE_MIN_DELAY = 0.2    # 對沖等待時間下限 (秒)
+HEDGE_MAX_RATIO = 0.05   # 對沖請求最多佔全部請求的比例 (服務整體變慢時不會讓負載加倍)
+HEDGE_WINDOW = 500       # 只參考最近幾個樣本
+# ========================================
+
+class Hedger:
+    """
+    對沖請求 (hedged request)：請求超過最近 p95 的首位元組時間仍沒有收到音訊時，
+    另外送出一個相同的請求，取先成功者並取消另一個，避免少數卡住的請求拖長整批的時間
+    每次嘗試另有期限 (REQUEST_TIMEOUT)，逾時的請求由 AdaptiveLimiter 退避重試
+    """
+
+    def __init__(self, timeout=REQUEST_TIMEOUT, pct=HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES,
+                 min_delay=HEDGE_MIN_DELAY, max_ratio=HEDGE_MAX_RATIO, window=HEDGE_WINDOW):
+        self.timeout = timeout
+        self.pct = pct
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self.samples = deque(maxlen=window)  # 最近的首位元組時間 (秒)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def delay(self):
+        """目前的對沖等待秒數；樣本不足或已用完對沖額度時回傳 None (不對沖)"""
+        if len(self.samples) < self.min_samples or self.hedged >= self.max_ratio * self.requests:
+            return None
+        return max(self.min_delay, percentile(self.samples, self.pct))
+
+    async def _attempt(self, attempt, first_byte):
+        start = time.monotonic()
+
+        def on_first_byte():
+            if not first_byte.is_set():
+                self.samples.append(time.monotonic() - start)
+                first_byte.set()
+
+        try:
+            return await asyncio.wait_for(attempt(on_first_byte), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    async def _hedge(self, attempt, limiter):
+        """對沖請求另外佔用一個並發名額 (原請求的名額由 limiter.call 持有)，名額已滿時排隊等待"""
+        if limiter is None:
+            return await self._attempt(attempt, asyncio.Event())
+        async with limiter.slot():
+            return await self._attempt(attempt, asyncio.Event())
+
+    async def run(self, attempt, discard=None, limiter=None):
+        """
+        執行一次請求 (必要時加上一個對沖請求)
+        attempt(first_byte): 回傳 coroutine 的函式，收到第一個音訊區塊時需呼叫 first_byte()
+        discard(result): 兩個請求都成功時，用來釋放未採用的結果
+        limiter: 原請求所屬的 AdaptiveLimiter；對沖請求也計入它的並發上限
+        回傳先成功的結果；全部失敗時拋出第一個錯誤
+        """
+        self.requests += 1
+        first_byte = asyncio.Event()
+        primary = asyncio.ensure_future(self._attempt(attempt, first_byte))
+        pending = {primary}
+        try:
+            delay = self.delay()
+            if delay is not None:
+                waiter = asyncio.ensure_future(first_byte.wait())
+                done, _ = await asyncio.wait({primary, waiter}, timeout=delay,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if not done:
+                    self.hedged += 1
+                    pending.add(asyncio.ensure_future(self._hedge(attempt, limiter)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        for other in done - {task}:
+                            if other.exception() is None and discard is not None:
+                                discard(other.result())
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # 取消較慢的請求；取消前剛好完成的結果也要釋放
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if not isinstance(result, BaseException) and discard is not None:
+                    discard(result)
+
+    def summary(self):
+        return f"對沖請求 {self.hedged} 次 (勝出 {self.hedge_wins} 次)，逾時 {self.timeouts} 次"
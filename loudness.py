@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import mp3_frames
+
+# =================設定區=================
+FFMPEG = "ffmpeg"          # ffmpeg 執行檔 (需在 PATH 中)，負責 MP3 與 PCM 之間的解碼 / 編碼
+TARGET_DB = -20.0          # 目標響度：語音區塊的平均 RMS (dBFS)
+PEAK_LIMIT_DB = -1.0       # 增益後的峰值上限 (dBFS)，避免破音
+MAX_GAIN_DB = 20.0         # 單一片段的最大增益 (dB)
+SILENCE_DB = -50.0         # RMS 低於此值的區塊視為靜音 (修剪頭尾、計算響度時略過)
+BLOCK_MS = 20              # 分析區塊長度 (毫秒)
+TRIM_PAD_MS = 40           # 修剪後頭尾保留的長度 (毫秒)
+NORMALIZE_WORKERS = None   # 處理程序數 (None = CPU 核心數)
+# ========================================
+
+# 處理參數納入快取鍵與列的內容雜湊，修改設定後會重新處理
+PARAMS = f"loudness:{TARGET_DB}:{PEAK_LIMIT_DB}:{MAX_GAIN_DB}:{SILENCE_DB}:{BLOCK_MS}:{TRIM_PAD_MS}"
+
+class NormalizeFailed(Exception):
+    """片段處理失敗 (該列不寫入音檔，下次執行或 --retry-failed 時重新處理)"""
+
+def available():
+    """是否找得到 ffmpeg"""
+    return shutil.which(FFMPEG) is not None
+
+def _db(value):
+    return 20 * np.log10(np.maximum(value, 1e-10))
+
+def analyze(samples, sample_rate):
+    """
+    以 NumPy 計算片段的增益與修剪範圍，回傳 (增益 dB, 開始取樣, 結束取樣)
+    samples: float32 陣列 (取樣數, 聲道數)，範圍 -1 ~ 1
+    響度為非靜音區塊的平均 RMS (不含 K 加權，語音片段間的差異已足夠接近主觀音量)
+    整段都是靜音時回傳 None
+    """
+    block = max(1, sample_rate * BLOCK_MS // 1000)
+    count = len(samples) // block
+    if count == 0:
+        return None
+    blocks = samples[:count * block].reshape(count, block, -1)
+    power = np.mean(np.square(blocks, dtype=np.float64), axis=(1, 2))
+    active = np.flatnonzero(_db(np.sqrt(power)) > SILENCE_DB)
+    if active.size == 0:
+        return None
+
+    loudness = _db(np.sqrt(np.mean(power[active])))
+    start, end = active[0] * block, (active[-1] + 1) * block
+    if active[-1] == count - 1:
+        end = len(samples)  # 最後不足一個區塊的尾端也保留
+    peak = _db(np.max(np.abs(samples[start:end])))
+    gain = min(TARGET_DB - loudness, PEAK_LIMIT_DB - peak, MAX_GAIN_DB)
+
+    pad = sample_rate * TRIM_PAD_MS // 1000
+    return float(gain), max(0, start - pad), min(len(samples), end + pad)
+
+def decode(path, sample_rate, channels):
+    """以 ffmpeg 把 MP3 解碼為 float32 PCM 陣列 (取樣數, 聲道數)"""
+    pcm = subprocess.run(
+        [FFMPEG, "-v", "error", "-i", path, "-f", "s16le", "-ac", str(channels), "-ar", str(sample_rate), "-"],
+        check=True, capture_output=True).stdout
+    return (np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768).reshape(-1, channels)
+
+def encode(samples, sample_rate, bitrate, out_path):
+    """以 ffmpeg (libmp3lame) 把 PCM 編碼回 MP3 (不寫入 ID3 與 Xing 標頭，合併時不需再去除)"""
+    channels = samples.shape[1]
+    pcm = (np.clip(samples, -1.0, 32767 / 32768) * 32768).astype("<i2").tobytes()
+    subprocess.run(
+        [FFMPEG, "-v", "error", "-y", "-f", "s16le", "-ac", str(channels), "-ar", str(sample_rate), "-i", "-",
+         "-c:a", "libmp3lame", "-b:a", str(bitrate), "-id3v2_version", "0", "-write_xing", "0", "-f", "mp3",
+         out_path],
+        input=pcm, check=True, capture_output=True)
+
+def process_batch(jobs):
+    """
+    (在處理程序中執行) 對一批片段做響度正規化與頭尾修剪
+    jobs: [(原始 MP3 路徑, 輸出路徑), ...]；輸出維持原本的取樣率、聲道數與位元率
+    回傳每個片段的 (增益 dB, 修剪秒數)，失敗的片段回傳錯誤訊息字串
+    """
+    outcomes = []
+    for src, dst in jobs:
+        try:
+            with open(src, "rb") as f:
+                _, headers, _ = mp3_frames.scan(f.read())
+            if not headers:
+                raise ValueError("無法辨識的 MP3")
+            first = headers[0]
+            samples = decode(src, first.sample_rate, first.channels)
+            result = analyze(samples, first.sample_rate)
+            if result is None:
+                shutil.copyfile(src, dst)  # 整段靜音：保留原始音訊，不重新編碼
+                outcomes.append((0.0, 0.0))
+                continue
+            gain, start, end = result
+            encode(samples[start:end] * np.float32(10 ** (gain / 20)), first.sample_rate, first.bitrate, dst)
+            outcomes.append((gain, float(len(samples) - (end - start)) / first.sample_rate))
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            detail = e.stderr.decode("utf-8", "replace").strip() if isinstance(e, subprocess.CalledProcessError) else e
+            outcomes.append(f"{type(e).__name__}: {detail}")
+    return outcomes
+
+class Normalizer:
+    """
+    片段的響度正規化與頭尾靜音修剪 (選用，需要 numpy 與 ffmpeg)
+    解碼、NumPy 分析與重新編碼都在 ProcessPoolExecutor 中執行，不會阻塞網路請求的事件迴圈；
+    結果以獨立的快取鍵存入片段快取，同一片段只處理一次
+    """
+
+    def __init__(self, cache, workers=NORMALIZE_WORKERS):
+        self.cache = cache
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.processed = 0
+        self.reused = 0
+        self.failed = 0
+        self.gain_total = 0.0
+        self.trimmed = 0.0
+
+    def key(self, key):
+        return hashlib.sha256(f"{key}\x1f{PARAMS}".encode("utf-8")).hexdigest()
+
+    async def process(self, keys):
+        """
+        把一批原始片段的快取鍵換成處理後的快取鍵 (原始片段的鎖定會釋放，處理後的片段已鎖定)
+        處理失敗的片段換成 NormalizeFailed：不沿用原始音訊，避免未處理的音檔以包含處理參數的雜湊被記錄為完成
+        """
+        result = list(keys)
+        todo = []
+        for i, key in enumerate(keys):
+            if self.cache.lookup(self.key(key), stats=False):
+                self.cache.release(key)
+                result[i] = self.key(key)
+                self.reused += 1
+            else:
+                todo.append(i)
+        if not todo:
+            return result
+
+        jobs = [(self.cache.path(keys[i]), self.cache.temp_path(self.key(keys[i]))) for i in todo]
+        try:
+            outcomes = await asyncio.get_running_loop().run_in_executor(self.pool, process_batch, jobs)
+        except (BrokenProcessPool, OSError) as e:
+            outcomes = [f"{type(e).__name__}: {e}"] * len(jobs)  # 處理程序異常結束
+        for i, (_, tmp_path), outcome in zip(todo, jobs, outcomes):
+            norm_key = None if isinstance(outcome, str) else self.cache.adopt(self.key(keys[i]), tmp_path)
+            if norm_key is None:
+                self.failed += 1
+                if isinstance(outcome, str):
+                    print(f"   ⚠️ 音量正規化失敗: {outcome}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                self.cache.release(keys[i])
+                result[i] = NormalizeFailed(outcome if isinstance(outcome, str) else "處理後的片段為空")
+                continue
+            self.cache.release(keys[i])
+            result[i] = norm_key
+            self.processed += 1
+            self.gain_total += outcome[0]
+            self.trimmed += outcome[1]
+        return result
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def summary(self):
+        average = self.gain_total / self.processed if self.processed else 0.0
+        return (f"音量正規化 {self.processed} 個片段 (平均增益 {average:+.1f} dB，修剪 {self.trimmed:.1f} 秒)，"
+                f"沿用 {self.reused} 個，失敗 {self.failed} 個")
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import shutil
+from collections import defaultdict
+from audio_formats import probe_file
+
+MANIFEST_NAME = "manifest.json"
+ROW_FIELDS = ("word", "meaning", "sentence", "sentence_trans")  # 寫入 manifest 供播放器使用的文字欄位
+
+def content_hash(*fields):
+    """以影響語音內容的欄位 (引擎、聲音、文字...) 計算列的內容雜湊"""
+    raw = "\x1f".join(str(f) for f in fields)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+class OutputManifest:
+    """
+    記錄輸出資料夾中每個音檔 (MP3 / Opus / AAC) 對應的內容雜湊 (檔名 -> 雜湊)
+    重新執行時依雜湊找回既有音檔並改名到新的序號，只有新增或修改過的列需要重新生成
+
+    另外依表格順序記錄已完成各列的資料 (rows：序號、檔名、雜湊、文字欄位、檔案大小、
+    長度與各段的時間範圍)，播放器直接讀取這份索引，不必掃描資料夾或重新解析 Markdown
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.files = {}
+        self.rows = []
+        self.tracks = {}  # 雜湊 -> 檔案大小、長度與段落 (內容相同的音檔結果相同，改名或連結後不必重新掃描)
+        self._table = None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.files = data.get("files", {})
+                self.rows = data.get("rows", [])
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 無法讀取 {self.path}，將重新建立: {e}")
+        for entry in self.rows:
+            if "duration" in entry:
+                self.tracks[entry["hash"]] = {key: entry[key] for key in ("size", "duration", "segments")}
+
+    def _full(self, filename):
+        return os.path.join(self.output_dir, filename)
+
+    def plan(self, rows, verbose=True):
+        """
+        比對目前的表格列與既有音檔，回傳需要重新生成的列
+        rows: 含 "filename" 與 "hash" 的 dict 列表 (依新順序)
+        verbose=False 時不顯示摘要 (例如合併分片時由呼叫端顯示自己的摘要)
+        內容相同但序號改變的音檔會被改名 (重複的列以硬連結/複製)，不再使用的舊音檔會被刪除
+        """
+        self._table = rows
+        tracked = {name: h for name, h in self.files.items() if os.path.exists(self._full(name))}
+        by_hash = defaultdict(list)
+        for name, h in tracked.items():
+            by_hash[h].append(name)
+
+        claimed = set()
+        done = set()
+        moves = []   # (舊檔名, 新檔名)
+        links = []   # (來源新檔名, 新檔名)
+        pending = []
+
+        # 1. 檔名與內容皆未變的列
+        for row in rows:
+            if tracked.get(row["filename"]) == row["hash"]:
+                claimed.add(row["filename"])
+                done.add(row["filename"])
+
+        # 2. 內容相同但位置改變的列：改名既有音檔，或從同內容的音檔建立連結
+        sources = {}
+        for row in rows:
+            name, h = row["filename"], row["hash"]
+            if name in done:
+                sources.setdefault(h, name)
+                continue
+            free = [n for n in by_hash.get(h, []) if n not in claimed]
+            if free:
+                claimed.add(free[0])
+                moves.append((free[0], name))
+                sources.setdefault(h, name)
+                done.add(name)
+            elif h in sources:
+                links.append((sources[h], name))
+                done.add(name)
+            else:
+                pending.append(row)
+
+        # 3. 刪除不再被任何列使用的音檔 (只處理 manifest 追蹤的檔案)
+        wanted = {row["filename"] for row in rows}
+        removed = 0
+        for name in tracked:
+            if name not in claimed:
+                os.remove(self._full(name))
+                self.files.pop(name, None)
+                removed += 1
+
+        # 4. 兩階段改名，避免新舊檔名互相覆蓋
+        staged = []
+        for old, new in moves:
+            tmp = old + ".moving"
+            os.replace(self._full(old), self._full(tmp))
+            self.files.pop(old, None)
+            staged.append((tmp, new))
+        for tmp, new in staged:
+            os.replace(self._full(tmp), self._full(new))
+        hash_of = {row["filename"]: row["hash"] for row in rows}
+        for _, new in moves:
+            self.files[new] = hash_of[new]
+
+        for src, new in links:
+            dst = self._full(new)
+            if os.path.exists(dst):
+                os.remove(dst)
+            try:
+                os.link(self._full(src), dst)
+            except OSError:
+                shutil.copyfile(self._full(src), dst)
+            self.files[new] = hash_of[new]
+
+        # 5. 尚未被追蹤但檔名相符的舊版輸出 (或上次中斷前已寫完的檔案)：掃描確認是完整音檔才沿用
+        #    (空檔案、截斷或無法辨識的檔案留在待生成列表，重新生成時覆寫)
+        still_pending = []
+        for row in pending:
+            name = row["filename"]
+            if name not in tracked and os.path.exists(self._full(name)) and self._adopt(name, row["hash"]):
+                self.files[name] = row["hash"]
+            else:
+                still_pending.append(row)
+
+        # 記錄中已不存在於資料夾、也不在新表格中的項目一併清除
+        for name in list(self.files):
+            if name not in wanted:
+                self.files.pop(name)
+
+        reused = len(rows) - len(still_pending)
+        if verbose:
+            print(f"⏩ 沿用既有音檔 {reused} 筆 (改名 {len(moves)}、連結 {len(links)}、刪除 {removed})，"
+                  f"需生成 {len(still_pending)} 筆")
+        return still_pending
+
+    def record(self, filename, row_hash):
+        """登記已完成的音檔 (重新生成的音檔需重新掃描長度)"""
+        self.files[filename] = row_hash
+        self.tracks.pop(row_hash, None)
+
+    def _adopt(self, filename, row_hash):
+        """未追蹤的既有音檔：能掃描到 frame / 頁面且長度大於 0 時記錄其長度並回傳 True"""
+        path = self._full(filename)
+        try:
+            duration, segments = probe_file(path)
+            size = os.path.getsize(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 無法讀取既有音檔 {filename}，不予沿用: {e}")
+            return False
+        if duration <= 0:
+            print(f"⚠️ 既有音檔 {filename} 不完整或無法辨識，不予沿用")
+            return False
+        self.tracks[row_hash] = {
+            "size": size,
+            "duration": round(duration, 3),
+            "segments": [[round(start, 3), round(end, 3)] for start, end in segments],
+        }
+        return True
+
+    def _track(self, filename, row_hash):
+        """音檔大小、長度與各段時間範圍 (以 mmap 讀取 frame / 頁面標頭，不解碼)"""
+        track = self.tracks.get(row_hash)
+        if track is None:
+            path = self._full(filename)
+            duration, segments = probe_file(path)
+            track = {
+                "size": os.path.getsize(path),
+                "duration": round(duration, 3),
+                "segments": [[round(start, 3), round(end, 3)] for start, end in segments],
+            }
+            self.tracks[row_hash] = track
+        return track
+
+    def _row_entries(self):
+        """依表格順序列出音檔已完成的列 (沒有 plan 過時沿用上次的記錄)"""
+        if self._table is None:
+            return [entry for entry in self.rows if self.files.get(entry["filename"]) == entry["hash"]]
+        entries = []
+        for row in self._table:
+            name, h = row["filename"], row["hash"]
+            if self.files.get(name) != h:
+                continue
+            entry = {"index": row["index"], "filename": name, "hash": h, **self._track(name, h)}
+            entry.update((field, row.get(field, "")) for field in ROW_FIELDS)
+            entries.append(entry)
+        return entries
+
+    def save(self):
+        """寫入 manifest (先寫暫存檔再改名)"""
+        self.rows = self._row_entries()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 2, "files": dict(sorted(self.files.items())), "rows": self.rows},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
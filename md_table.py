@@ -0,0 +1,206 @@
+"""
+Markdown 單字表解析 (生成程式與播放器共用)
+逐行串流解析 Markdown 表格：依表頭名稱對應欄位，支援同一檔案中的多個表格與多個輸入檔；
+解析結果依檔案路徑、修改時間與大小快取，檔案沒有變動時不必重新解析
+"""
+import glob
+import hashlib
+import os
+import pickle
+import re
+from tts_cache import CACHE_DIR
+
+# =================設定區=================
+TABLE_CACHE_DIR = os.path.join(CACHE_DIR, "tables")  # 解析結果快取資料夾 (None = 不快取；生成程式改用 cache_dir 下的 tables/)
+TABLE_CACHE_MAX_MB = 32      # 解析結果快取容量上限 (MB)，超過時刪除最久未使用的檔案
+# 表頭名稱 -> 欄位 (依序比對，第一個符合的關鍵字決定欄位；找不到單字欄時改為依位置對應)
+HEADER_ALIASES = (
+    ("sentence_trans", ("中譯", "翻譯", "translation")),
+    ("sentence", ("例句", "搭配", "sentence", "example")),
+    ("meaning", ("中文", "釋義", "意思", "meaning", "chinese")),
+    ("word", ("english", "單字", "英文", "word")),
+)
+# ========================================
+
+FIELDS = ("word", "meaning", "sentence", "sentence_trans")  # 沒有表頭時的欄位順序
+PARSER_VERSION = 1  # 解析規則改變時遞增，讓舊的快取失效
+
+_SEPARATOR = re.compile(r"^:?-+:?$")
+_PIPE = re.compile(r"(?<!\\)\|")
+_NUMBER = re.compile(r"^\d+\.\s*")
+
+class VocabRow:
+    """表格中的一列 (index 為所有輸入檔中資料行的流水號，無法解析的資料行也會佔用序號)"""
+
+    __slots__ = ("index",) + FIELDS
+
+    def __init__(self, index, word, meaning="", sentence="", sentence_trans=""):
+        self.index = index
+        self.word = word
+        self.meaning = meaning
+        self.sentence = sentence
+        self.sentence_trans = sentence_trans
+
+    def as_dict(self):
+        return {"word": self.word, "meaning": self.meaning, "sentence": self.sentence,
+                "sentence_trans": self.sentence_trans, "index": self.index}
+
+def split_cells(line):
+    """把表格行切成儲存格 (保留空白儲存格的位置，\\| 視為儲存格內的文字)"""
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    if "\\|" not in line:
+        return [cell.strip() for cell in line.split("|")]
+    return [cell.strip().replace("\\|", "|") for cell in _PIPE.split(line)]
+
+def map_columns(header):
+    """依表頭名稱決定每一欄對應的欄位；找不到單字欄時回傳 None (依位置對應)"""
+    columns, used = [], set()
+    for name in header:
+        lowered = name.lower()
+        field = next((field for field, aliases in HEADER_ALIASES
+                      if field not in used and any(alias in lowered for alias in aliases)), None)
+        if field is not None:
+            used.add(field)
+        columns.append(field)
+    return tuple(columns) if "word" in used else None
+
+def _row(cells, columns):
+    """儲存格 -> (word, meaning, sentence, sentence_trans)；沒有單字時回傳 None"""
+    values = dict.fromkeys(FIELDS, "")
+    for field, cell in zip(columns or FIELDS, cells):
+        if field is not None:
+            values[field] = cell
+    word = _NUMBER.sub("", values["word"])  # 去除序號 "1. ", "2. " 等
+    if not word:
+        return None
+    return word, values["meaning"], values["sentence"], values["sentence_trans"]
+
+def iter_data_lines(lines):
+    """
+    逐行解析 Markdown 表格，依序產生每個資料行的 (資料行序號, (word, meaning, sentence, sentence_trans) 或 None)
+    後面緊接分隔線 (| --- | :--- |) 的行是表頭；表格以非表格行結束，下一個表格重新對應欄位
+    資料行序號從 1 開始 (沒有單字的資料行回傳 None，但仍佔用序號，讓其他列的序號與檔名保持穩定)
+    """
+    columns = None   # 目前表格的欄位對應 (None = 依位置)
+    pending = None   # 尚未確定是表頭還是資料的前一行
+    count = 0
+    for line in lines:
+        line = line.strip()
+        cells = split_cells(line) if line.startswith("|") else None
+        if cells is not None and all(_SEPARATOR.match(cell) for cell in cells):
+            if pending is not None:
+                columns = map_columns(pending)
+                pending = None
+            continue
+        if pending is not None:
+            count += 1
+            yield count, _row(pending, columns)
+        pending = cells
+        if cells is None:
+            columns = None
+    if pending is not None:
+        count += 1
+        yield count, _row(pending, columns)
+
+def parse_lines(lines):
+    """逐行解析，只產生有單字的列 (資料行序號, word, meaning, sentence, sentence_trans)"""
+    for count, row in iter_data_lines(lines):
+        if row is not None:
+            yield (count, *row)
+
+def _cache_path(path, cache_dir):
+    name = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(cache_dir, name + ".pickle")
+
+def prune_cache(cache_dir, max_mb=TABLE_CACHE_MAX_MB, keep=None):
+    """快取超過容量上限時，依最後使用時間刪除最舊的解析結果 (keep 除外)"""
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    found = []
+    for name in names:
+        if not name.endswith(".pickle"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        found.append((st.st_mtime, path, st.st_size))
+    total = sum(size for _, _, size in found)
+    limit = max_mb * 1024 * 1024
+    for _, path, size in sorted(found):
+        if total <= limit:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+def read_table(path, cache_dir=TABLE_CACHE_DIR):
+    """
+    解析單一檔案，回傳 (資料行數, [(資料行序號, word, meaning, sentence, sentence_trans), ...])
+    檔案的修改時間與大小與快取相同時直接載入快取，不讀取也不解析 Markdown
+    cache_dir: 解析結果快取資料夾 (None = 不快取)；寫入後快取總量超過 TABLE_CACHE_MAX_MB 時淘汰最舊的檔案
+    """
+    st = os.stat(path)
+    stamp = (PARSER_VERSION, os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    cached = _cache_path(path, cache_dir) if cache_dir else None
+    if cached and os.path.exists(cached):
+        try:
+            with open(cached, "rb") as f:
+                data = pickle.load(f)
+            if data["stamp"] == stamp:
+                os.utime(cached)  # 更新最後使用時間 (淘汰順序)
+                return data["count"], data["rows"]
+        except (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError):
+            pass  # 快取損壞時重新解析
+
+    count, rows = 0, []
+    with open(path, "r", encoding="utf-8") as f:
+        for count, row in iter_data_lines(f):
+            if row is not None:
+                rows.append((count, *row))
+    if cached:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cached}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"stamp": stamp, "count": count, "rows": rows}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cached)
+        except OSError as e:
+            print(f"⚠️ 無法寫入表格快取 {cached}: {e}")
+        else:
+            prune_cache(cache_dir, keep=cached)
+    return count, rows
+
+def input_files(spec):
+    """
+    展開輸入設定為檔案列表：單一路徑、萬用字元 (例如 "vocab/*.md"，依檔名排序) 或兩者組成的列表
+    不存在的一般路徑原樣保留 (由呼叫端顯示錯誤)
+    """
+    specs = [spec] if isinstance(spec, str) else list(spec)
+    paths = []
+    for item in specs:
+        matches = sorted(glob.glob(item)) if any(c in item for c in "*?[") else [item]
+        paths += [path for path in matches if path not in paths]
+    return paths
+
+def iter_rows(paths, cache_dir=TABLE_CACHE_DIR):
+    """
+    依序產生所有輸入檔的 VocabRow；序號跨檔案連續 (第二個檔案接在第一個檔案的資料行數之後)
+    """
+    offset = 0
+    for path in paths:
+        count, rows = read_table(path, cache_dir)
+        for index, word, meaning, sentence, sentence_trans in rows:
+            yield VocabRow(offset + index, word, meaning, sentence, sentence_trans)
+        offset += count
@@ -0,0 +1,196 @@
+import json
+import os
+import time
+import unicodedata
+from collections import defaultdict
+
+# =================設定區=================
+METRICS_DIR_NAME = "metrics"   # 輸出資料夾下存放量測結果的子資料夾
+PROM_FILE = "tts_metrics.prom" # Prometheus textfile (每次執行覆寫，可給 node_exporter 的 textfile collector 讀取)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # 延遲直方圖的上界 (秒)
+# ========================================
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+def new_trace():
+    """
+    單一 TTS 請求的量測資料 (由 AdaptiveLimiter.call 與請求本身填入)
+    queue_wait: 等待並發名額 (含 Retry-After 暫停) 的總秒數；backoff: 重試前退避的總秒數
+    ttfb: 最後一次嘗試收到第一個音訊區塊的秒數；errors: 每次失敗的例外名稱
+    """
+    return {"queue_wait": 0.0, "backoff": 0.0, "ttfb": None, "attempts": 0, "throttled": 0, "errors": []}
+
+def _width(text):
+    return sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+
+def _table(header, rows):
+    """對齊文字表格 (中文字以兩格計算)"""
+    widths = [max(_width(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    lines = []
+    for row in [header] + rows:
+        cells = [str(cell) for cell in row]
+        lines.append("  ".join(cell + " " * (w - _width(cell)) if i == 0 else " " * (w - _width(cell)) + cell
+                               for i, (cell, w) in enumerate(zip(cells, widths))))
+    return lines
+
+def _round(seconds):
+    return None if seconds is None else round(seconds, 4)
+
+def _ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Metrics:
+    """
+    單次執行的量測：每個實際送出的 TTS 請求 (不含快取命中) 的排隊、首位元組與總時間、
+    字元數、位元組數、重試與錯誤，依 (引擎, 聲音) 彙總；以及各階段 (合成、寫檔) 的耗時
+    每個請求立即附加到 JSONL 明細 (不保留在記憶體，中斷時已寫入的紀錄仍然有效)；
+    執行結束時附加彙總行並寫出 Prometheus textfile，並回傳摘要表格
+    """
+
+    def __init__(self, metrics_dir):
+        self.dir = metrics_dir
+        now = time.time()
+        self.run_id = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+        self.started = now
+        self._start = time.monotonic()
+        self.jsonl_path = os.path.join(self.dir, f"run-{self.run_id}.jsonl")
+        self._f = None
+        self.groups = defaultdict(lambda: {
+            "requests": 0, "failed": 0, "retries": 0, "throttled": 0, "segments": 0,
+            "chars": 0, "bytes": 0, "queue_wait": [], "ttfb": [], "total": []})
+        self.stages = defaultdict(list)  # 階段名稱 -> [秒數, ...]
+
+    def request(self, backend, voice, chars, size, total, trace, items=1, error=None):
+        """記錄一個實際送出的請求 (含所有重試)；items 為合併請求包含的片段數"""
+        group = self.groups[(backend, voice)]
+        group["requests"] += 1
+        group["failed"] += error is not None
+        group["retries"] += max(0, trace["attempts"] - 1)
+        group["throttled"] += trace["throttled"]
+        group["segments"] += items
+        group["chars"] += chars
+        group["bytes"] += size
+        group["queue_wait"].append(trace["queue_wait"])
+        group["total"].append(total)
+        if trace["ttfb"] is not None:
+            group["ttfb"].append(trace["ttfb"])
+        self._write({
+            "event": "request", "time": round(time.time(), 3), "backend": backend, "voice": voice,
+            "items": items, "chars": chars, "bytes": size, "attempts": trace["attempts"],
+            "queue_wait": round(trace["queue_wait"], 4), "backoff": round(trace["backoff"], 4),
+            "ttfb": None if trace["ttfb"] is None else round(trace["ttfb"], 4), "total": round(total, 4),
+            "status": "failed" if error else "ok", "error": error, "errors": trace["errors"]})
+
+    def _write(self, event):
+        """附加一筆事件到 JSONL 明細 (第一次寫入時才建立檔案)，寫入後立即 flush"""
+        if self._f is None:
+            os.makedirs(self.dir, exist_ok=True)
+            self._f = open(self.jsonl_path, "a", encoding="utf-8")
+        self._f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def stage(self, name, seconds):
+        """記錄流程階段的耗時 (例如每一列的合成與寫檔)"""
+        self.stages[name].append(seconds)
+
+    def save(self, cache, limiter, journals):
+        """在 JSONL 明細最後附加彙總行並寫出 Prometheus textfile，回傳兩個檔案路徑"""
+        elapsed = time.monotonic() - self._start
+        summary = {
+            "event": "summary", "run": self.run_id, "time": round(time.time(), 3), "elapsed": round(elapsed, 3),
+            "cache_hits": cache.hits, "cache_misses": cache.misses,
+            "concurrency_limit": round(limiter.limit, 2), "concurrency_peak": round(limiter.peak_limit, 2),
+            "outputs": {journal_dir: {"done": journal.done, "failed": journal.failed}
+                        for journal_dir, journal in journals.items()},
+            "stages": {name: {"count": len(values), "sum": round(sum(values), 3),
+                              "p50": _round(percentile(values, 50)), "p95": _round(percentile(values, 95))}
+                       for name, values in self.stages.items()},
+            "groups": [{"backend": backend, "voice": voice,
+                        **{k: v for k, v in group.items() if not isinstance(v, list)},
+                        **{f"{k}_p50": _round(percentile(group[k], 50)) for k in ("queue_wait", "ttfb", "total")},
+                        "total_p95": _round(percentile(group["total"], 95))}
+                       for (backend, voice), group in sorted(self.groups.items())],
+        }
+        self._write(summary)
+        self._f.close()
+        self._f = None
+
+        # textfile collector 可能隨時讀取，先寫暫存檔再改名
+        prom_path = os.path.join(self.dir, PROM_FILE)
+        with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self._prometheus(cache, elapsed, journals))
+        os.replace(prom_path + ".tmp", prom_path)
+        return self.jsonl_path, prom_path
+
+    def _prometheus(self, cache, elapsed, journals):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{text}}} {value}" if text else f"{name} {value}")
+
+        groups = sorted(self.groups.items())
+        by_voice = lambda key: [({"backend": b, "voice": v}, g[key]) for (b, v), g in groups]
+        metric("tts_run_timestamp_seconds", "gauge", "Start time of the last run.", [({}, round(self.started, 3))])
+        metric("tts_run_duration_seconds", "gauge", "Wall time of the last run.", [({}, round(elapsed, 3))])
+        metric("tts_rows", "gauge", "Rows finished or failed in the last run.",
+               [({"output": d, "status": s}, getattr(j, s)) for d, j in journals.items() for s in ("done", "failed")])
+        metric("tts_cache_lookups", "gauge", "Segment cache lookups in the last run.",
+               [({"result": "hit"}, cache.hits), ({"result": "miss"}, cache.misses)])
+        metric("tts_requests", "gauge", "TTS requests sent (after cache) in the last run.",
+               [({"backend": b, "voice": v, "status": "ok"}, g["requests"] - g["failed"]) for (b, v), g in groups] +
+               [({"backend": b, "voice": v, "status": "failed"}, g["failed"]) for (b, v), g in groups])
+        metric("tts_request_retries", "gauge", "Retried attempts in the last run.", by_voice("retries"))
+        metric("tts_request_throttled", "gauge", "Throttled (429 / 5xx / timeout) attempts.", by_voice("throttled"))
+        metric("tts_synthesized_chars", "gauge", "Characters sent to the TTS backend.", by_voice("chars"))
+        metric("tts_synthesized_bytes", "gauge", "Audio bytes received from the TTS backend.", by_voice("bytes"))
+        for key, help_text in (("queue_wait", "Time waiting for a concurrency slot."),
+                               ("ttfb", "Time to first audio byte."),
+                               ("total", "Total request time including retries.")):
+            name = f"tts_request_{key}_seconds"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (backend, voice), group in groups:
+                values = group[key]
+                labels = f'backend="{_label(backend)}",voice="{_label(voice)}"'
+                for bound in LATENCY_BUCKETS:
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {sum(1 for v in values if v <= bound)}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {len(values)}')
+                lines.append(f"{name}_sum{{{labels}}} {round(sum(values), 4)}")
+                lines.append(f"{name}_count{{{labels}}} {len(values)}")
+        metric("tts_stage_seconds", "gauge", "Summed time per pipeline stage.",
+               [({"stage": name}, round(sum(values), 3)) for name, values in sorted(self.stages.items())])
+        return "\n".join(lines) + "\n"
+
+    def table(self, cache):
+        """摘要表格 (文字行列表)：每個 (引擎, 聲音) 的請求統計與延遲，以及各階段耗時"""
+        rows = []
+        for (backend, voice), group in sorted(self.groups.items()):
+            rows.append([f"{backend}/{voice}", group["requests"], group["segments"], group["failed"],
+                         group["retries"], group["throttled"], group["chars"], f"{group['bytes'] / 1024:.0f}",
+                         _ms(percentile(group["queue_wait"], 50)), _ms(percentile(group["ttfb"], 50)),
+                         _ms(percentile(group["total"], 50)), _ms(percentile(group["total"], 95))])
+        lookups = cache.hits + cache.misses
+        lines = [f"📊 量測 (快取命中率 {cache.hits / lookups:.0%}，共 {lookups} 次查詢)" if lookups
+                 else "📊 量測"]
+        if rows:
+            lines += ["   " + line for line in _table(
+                ["引擎/聲音", "請求", "片段", "失敗", "重試", "限流", "字元", "KB",
+                 "排隊p50", "首位元組p50", "總計p50", "總計p95"], rows)]
+        if self.stages:
+            lines += ["   " + line for line in _table(
+                ["階段", "次數", "總秒數", "p50 ms", "p95 ms"],
+                [[name, len(values), f"{sum(values):.1f}", _ms(percentile(values, 50)), _ms(percentile(values, 95))]
+                 for name, values in self.stages.items()])]
+        return lines
@@ -0,0 +1,318 @@
+"""MP3 frame 解析與串接工具 (只讀取 frame 標頭，不解碼也不重新編碼音訊)"""
+import bisect
+from itertools import accumulate
+
+# 位元率表 (kbps)，依 (MPEG 版本, Layer) 區分；MPEG-2 / 2.5 共用同一組
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+_VERSIONS = {0b00: 2.5, 0b10: 2, 0b11: 1}
+_LAYERS = {0b01: 3, 0b10: 2, 0b11: 1}
+XING_FLAGS = 0x07  # frames + bytes + TOC
+GAP_MARKER = b"GAP0"  # concat 插入的靜音 frame 標記 (位於不影響解碼的附加資料區)
+
+class Mp3FormatError(ValueError):
+    """MP3 資料無法辨識，或多個片段的格式 (取樣率、聲道) 不一致"""
+
+class FrameHeader:
+    """單一 MP3 frame 的標頭資訊"""
+
+    __slots__ = ("version", "layer", "bitrate", "sample_rate", "padding", "channels", "size", "samples")
+
+    def __init__(self, version, layer, bitrate, sample_rate, padding, channels, size, samples):
+        self.version = version
+        self.layer = layer
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.padding = padding
+        self.channels = channels
+        self.size = size
+        self.samples = samples
+
+    @property
+    def seconds(self):
+        return self.samples / self.sample_rate
+
+def parse_header(data, offset=0):
+    """解析 offset 位置的 frame 標頭；不是合法標頭時回傳 None"""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = _VERSIONS.get((b1 >> 3) & 0b11)
+    layer = _LAYERS.get((b1 >> 1) & 0b11)
+    bitrate_index = (b2 >> 4) & 0x0F
+    rate_index = (b2 >> 2) & 0b11
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    channels = 1 if (b3 >> 6) == 0b11 else 2
+    if layer == 1:
+        samples = 384
+        size = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if (layer == 3 and version != 1) else 1152
+        size = samples // 8 * bitrate // sample_rate + padding
+    return FrameHeader(version, layer, bitrate, sample_rate, padding, channels, size, samples)
+
+def id3v2_size(data, offset=0):
+    """開頭若為 ID3v2 標籤，回傳標籤總長度；否則回傳 0"""
+    if bytes(data[offset:offset + 3]) != b"ID3" or offset + 10 > len(data):
+        return 0
+    size = 0
+    for b in data[offset + 6:offset + 10]:
+        size = (size << 7) | (b & 0x7F)
+    footer = 10 if data[offset + 5] & 0x10 else 0
+    return 10 + size + footer
+
+def iter_frames(data, offset=0, end=None):
+    """
+    依序產生 (offset, FrameHeader)；略過 ID3v2 標籤與無法辨識的位元組
+    (連續兩個合法標頭才視為同步成功，避免把音訊資料中的 0xFF 誤判為 frame)
+    """
+    end = len(data) if end is None else end
+    while offset < end:
+        tag = id3v2_size(data, offset)
+        if tag:
+            offset += tag
+            continue
+        header = parse_header(data, offset)
+        if header is not None and header.size > 0 and offset + header.size <= end:
+            following = offset + header.size
+            if following == end or parse_header(data, following) is not None or id3v2_size(data, following):
+                yield offset, header
+                offset = following
+                continue
+        offset += 1
+
+def split_at_times(data, cut_seconds):
+    """
+    依時間點把 MP3 資料切成多段 (切在最接近的 frame 邊界)，回傳 memoryview 列表 (不複製資料)
+    cut_seconds 需由小到大排列；n 個切點產生 n + 1 段
+    """
+    view = memoryview(data)
+    boundaries = [0]
+    elapsed = 0.0
+    cuts = list(cut_seconds)
+    for offset, header in iter_frames(data):
+        # 切點落在這個 frame 的前半段就切在 frame 開頭，否則交給下一個 frame
+        while cuts and cuts[0] <= elapsed + header.seconds / 2:
+            boundaries.append(offset)
+            cuts.pop(0)
+        elapsed += header.seconds
+    boundaries += [len(data)] * len(cuts)
+    boundaries.append(len(data))
+    return [view[start:stop] for start, stop in zip(boundaries, boundaries[1:])]
+
+def _side_info_size(header):
+    if header.layer != 3:
+        return 0
+    if header.version == 1:
+        return 17 if header.channels == 1 else 32
+    return 9 if header.channels == 1 else 17
+
+def is_info_frame(data, offset, header):
+    """是否為 Xing / Info / VBRI 標頭 frame (只有描述資訊，沒有音訊)"""
+    crc = 0 if data[offset + 1] & 0x01 else 2
+    tag = offset + 4 + crc + _side_info_size(header)
+    return bytes(data[tag:tag + 4]) in (b"Xing", b"Info") or bytes(data[offset + 36:offset + 40]) == b"VBRI"
+
+def scan(data):
+    """
+    找出 MP3 資料中的音訊 frame，回傳 (連續 frame 區段 [(start, stop)], frame 標頭列表, 第一個 frame 的標頭 bytes)
+    ID3v1 / ID3v2 標籤、Xing / Info / VBRI frame 與無法辨識的位元組都會被略過
+    """
+    end = len(data)
+    if end >= 128 and bytes(data[end - 128:end - 125]) == b"TAG":
+        end -= 128  # ID3v1 標籤固定位於檔尾 128 bytes
+    ranges, headers, raw = [], [], None
+    for offset, header in iter_frames(data, 0, end):
+        if is_info_frame(data, offset, header):
+            continue
+        if raw is None:
+            raw = bytes(data[offset:offset + 4])
+        if ranges and ranges[-1][1] == offset:
+            ranges[-1][1] = offset + header.size
+        else:
+            ranges.append([offset, offset + header.size])
+        headers.append(header)
+    return ranges, headers, raw
+
+def _with_header(raw, bitrate_index=None):
+    """以既有標頭為樣板產生新標頭：不含 CRC、不補位元組 (可指定位元率)"""
+    b1 = raw[1] | 0x01
+    b2 = raw[2] & ~0x02
+    if bitrate_index is not None:
+        b2 = (b2 & 0x0F) | (bitrate_index << 4)
+    return bytes([raw[0], b1, b2, raw[3]])
+
+def silence_frame(raw):
+    """
+    與樣板相同格式的靜音 frame：side info 全為 0 即解碼為靜音
+    (main_data_begin = 0 不引用前一個 frame 的 bit reservoir；part2_3_length = 0，主資料區只是附加資料)
+    Layer III 在主資料區開頭放入 GAP_MARKER，讓 probe 能分辨片段間隔與音訊本身的靜音
+    """
+    header = _with_header(raw)
+    template = parse_header(header)
+    body = bytearray(template.size - 4)
+    if template.layer == 3:
+        offset = _side_info_size(template)
+        body[offset:offset + len(GAP_MARKER)] = GAP_MARKER
+    return header + bytes(body)
+
+def info_frame(raw, frame_count, audio_bytes, toc_points, cbr):
+    """
+    產生 Xing (VBR) / Info (CBR) 標頭 frame：記錄 frame 數、總位元組數與 100 點的搜尋表 (TOC)，
+    讓播放器顯示正確長度並能準確跳轉；frame 不夠大時改用較高的位元率
+    toc_points: 0%, 1%, ... 99% 時間點對應的位元組位置 (相對於第一個音訊 frame)
+    """
+    template = parse_header(raw)
+    offset = 4 + _side_info_size(template)
+    needed = offset + 16 + 100
+    index = (raw[2] >> 4) & 0x0F
+    header = _with_header(raw, index)
+    while parse_header(header).size < needed and index < 14:
+        index += 1
+        header = _with_header(raw, index)
+    size = parse_header(header).size
+    total = size + audio_bytes
+    toc = bytes(min(255, (size + point) * 256 // total) for point in toc_points)
+    body = bytearray(size)
+    body[:4] = header
+    body[offset:offset + 16] = (b"Info" if cbr else b"Xing") + XING_FLAGS.to_bytes(4, "big") \
+        + frame_count.to_bytes(4, "big") + total.to_bytes(4, "big")
+    body[offset + 16:offset + 116] = toc
+    return bytes(body)
+
+def concat(segments, out, gap_seconds=0.0):
+    """
+    把多段 MP3 串接寫入 out (檔案物件)，回傳寫入的位元組數
+    只保留音訊 frame (去除各段的 ID3 / Xing 標頭)，段與段之間插入靜音 frame，
+    開頭寫入一個涵蓋整個檔案的 Xing / Info 標頭；全程以 memoryview 切片寫出，不複製、不重新編碼
+    各段的取樣率、聲道與 MPEG 版本必須一致，否則拋出 Mp3FormatError
+    """
+    scanned = [scan(data) for data in segments]
+    found = [item for item in scanned if item[1]]
+    if not found:
+        raise Mp3FormatError("找不到 MP3 frame")
+    first = found[0][1][0]
+    raw = found[0][2]
+    for _, headers, _ in found:
+        for header in headers:
+            if (header.version, header.layer, header.sample_rate, header.channels) != \
+                    (first.version, first.layer, first.sample_rate, first.channels):
+                raise Mp3FormatError(
+                    f"片段格式不一致: {first.sample_rate} Hz / {first.channels} ch 與 "
+                    f"{header.sample_rate} Hz / {header.channels} ch")
+
+    silence = silence_frame(raw)
+    gap = round(gap_seconds / first.seconds) if gap_seconds > 0 else 0
+    frame_sizes = []
+    for n, (_, headers, _) in enumerate(found):
+        if n:
+            frame_sizes += [len(silence)] * gap
+        frame_sizes += [header.size for header in headers]
+    # 位元率全部相同才標示為 CBR (Info)，否則為 VBR (Xing)
+    cbr = all(header.bitrate == first.bitrate for _, headers, _ in found for header in headers)
+
+    positions = [0, *accumulate(frame_sizes)]
+    count = len(frame_sizes)
+    toc_points = [positions[i * count // 100] for i in range(100)]
+    written = out.write(info_frame(raw, count, positions[-1], toc_points, cbr))
+    gap_bytes = silence * gap
+    first_segment = True
+    for data, (ranges, headers, _) in zip(segments, scanned):
+        if not headers:
+            continue
+        if not first_segment:
+            written += out.write(gap_bytes)
+        first_segment = False
+        with memoryview(data) as view:
+            for start, stop in ranges:
+                written += out.write(view[start:stop])
+    return written
+
+def _silence_runs(data, pattern, start, end, min_frames):
+    """
+    搜尋連續的靜音 frame (concat 插入的片段間隔)，回傳 [(開始, 結束)] 位元組範圍
+    只以 find 搜尋 GAP_MARKER，找到後再逐 frame 比對整個 frame
+    """
+    marker = pattern.find(GAP_MARKER)
+    if marker == -1:
+        return []  # 只有 Layer III 的靜音 frame 帶有標記
+    size = len(pattern)
+    runs = []
+    found = data.find(GAP_MARKER, start + marker, end)
+    while found != -1:
+        pos = stop = found - marker
+        while stop + size <= end and data[stop:stop + size] == pattern:
+            stop += size
+        if stop - pos >= min_frames * size:
+            runs.append((pos, stop))
+        found = data.find(GAP_MARKER, max(stop, pos + 1) + marker, end)
+    return runs
+
+def probe(data, min_gap_frames=2):
+    """
+    只讀標頭取得音檔長度與各段 (單字 / 中文 / 例句) 的時間範圍，不解碼音訊
+    - 開頭有 Info 標頭 (concat 產生的 CBR 檔案) 時直接讀取 frame 數，不逐一走訪 frame，
+      位元組位置依比例換算為時間
+    - 其他檔案逐一走訪 frame 標頭累加時間
+    段落以 concat 插入的靜音 frame (含 GAP_MARKER) 為界 (連續 min_gap_frames 個以上，頭尾的不算)
+    回傳 (秒數, [(開始秒數, 結束秒數), ...])；找不到 frame 時回傳 (0.0, [])
+    """
+    end = len(data)
+    if end >= 128 and bytes(data[end - 128:end - 125]) == b"TAG":
+        end -= 128
+    start = id3v2_size(data, 0)
+    header = parse_header(data, start)
+    duration = None
+    if header is not None and start + header.size < end and is_info_frame(data, start, header):
+        crc = 0 if data[start + 1] & 0x01 else 2
+        tag = start + 4 + crc + _side_info_size(header)
+        flags = int.from_bytes(data[tag + 4:tag + 8], "big")
+        first = parse_header(data, start + header.size)
+        if bytes(data[tag:tag + 4]) == b"Info" and flags & 0x01 and first is not None:
+            frames = int.from_bytes(data[tag + 8:tag + 12], "big")
+            duration = frames * first.samples / first.sample_rate
+            audio = start + header.size
+
+    if duration is not None:
+        def to_time(pos):
+            return duration * (pos - audio) / (end - audio)
+    else:
+        offsets, times = [], []
+        elapsed = 0.0
+        for offset, header in iter_frames(data, start, end):
+            if is_info_frame(data, offset, header):
+                continue
+            offsets.append(offset)
+            times.append(elapsed)
+            elapsed += header.seconds
+        if not offsets:
+            return 0.0, []
+        duration, audio = elapsed, offsets[0]
+
+        def to_time(pos):
+            i = bisect.bisect_left(offsets, pos)
+            return times[i] if i < len(times) else duration
+
+    pattern = silence_frame(bytes(data[audio:audio + 4]))
+    segments = []
+    cursor = audio
+    for gap_start, gap_stop in _silence_runs(data, pattern, audio, end, min_gap_frames):
+        if gap_start > cursor:
+            segments.append((to_time(cursor), to_time(gap_start)))
+        cursor = gap_stop
+    if cursor < end:
+        segments.append((to_time(cursor), duration))
+    return duration, segments
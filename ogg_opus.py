@@ -0,0 +1,197 @@
+"""Ogg Opus 頁面解析與串接工具 (只重組 Ogg 頁面，不解碼也不重新編碼 Opus 封包)"""
+import struct
+
+OPUS_RATE = 48000   # Opus 的時間戳 (granule position) 一律以 48 kHz 取樣數計算
+PAGE_PACKETS = 50   # 串接時每個 Ogg 頁面最多放幾個音訊封包 (約 1 秒)
+# 片段間隔使用的靜音封包：CELT 20 ms 單一 frame (code 3 + 4 bytes 填充)，解碼為靜音
+# 編碼器不會產生這種帶填充的靜音封包，整個封包本身即為間隔標記
+GAP_PACKET = bytes([0xFB, 0x41, 0x04, 0xFF, 0xFE, 0x00, 0x00, 0x00, 0x00])
+_FRAME_SAMPLES = [480, 960, 1920, 2880] * 3 + [480, 960] * 2 + [120, 240, 480, 960] * 4  # 依 TOC config (48 kHz)
+
+class OggFormatError(ValueError):
+    """Ogg Opus 資料無法辨識，或多個片段的聲道數不一致"""
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+_CRC_TABLE = _crc_table()
+
+def crc32(data):
+    """Ogg 頁面使用的 CRC-32 (多項式 0x04C11DB7，不反轉位元，初始值 0)"""
+    crc = 0
+    for b in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[(crc >> 24) ^ b]
+    return crc
+
+def iter_pages(data):
+    """依序產生 (頁面開頭位置, header_type, granule, serial, lacing 值, 資料開頭位置)；略過無法辨識的位元組"""
+    offset, end = 0, len(data)
+    while offset + 27 <= end:
+        if bytes(data[offset:offset + 4]) != b"OggS":
+            found = bytes(data[offset + 1:]).find(b"OggS")
+            if found == -1:
+                return
+            offset += 1 + found
+            continue
+        header_type, granule, serial = struct.unpack_from("<BqI", data, offset + 5)
+        count = data[offset + 26]
+        lacing = bytes(data[offset + 27:offset + 27 + count])
+        body = offset + 27 + count
+        stop = body + sum(lacing)
+        if stop > end:
+            return
+        yield offset, header_type, granule, serial, lacing, body
+        offset = stop
+
+def packets(data):
+    """取出 Ogg 串流中的封包 (跨頁的封包會合併)，回傳 bytes 列表"""
+    result, partial = [], b""
+    for _, _, _, _, lacing, body in iter_pages(data):
+        pos = body
+        for value in lacing:
+            partial += bytes(data[pos:pos + value])
+            pos += value
+            if value < 255:
+                result.append(partial)
+                partial = b""
+    return result
+
+def packet_samples(packet):
+    """依 TOC byte 計算封包長度 (48 kHz 取樣數)"""
+    if not packet:
+        return 0
+    toc = packet[0]
+    samples = _FRAME_SAMPLES[toc >> 3]
+    code = toc & 0x03
+    if code == 0:
+        return samples
+    if code in (1, 2):
+        return samples * 2
+    return samples * (packet[1] & 0x3F) if len(packet) > 1 else 0
+
+def opus_head(channels=1, pre_skip=312, input_rate=OPUS_RATE):
+    """OpusHead 識別標頭 (channel mapping family 0)"""
+    return b"OpusHead" + struct.pack("<BBHIhB", 1, channels, pre_skip, input_rate, 0, 0)
+
+def opus_tags(vendor, comments=()):
+    """OpusTags 註解標頭"""
+    vendor = vendor.encode("utf-8")
+    body = b"OpusTags" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", len(comments))
+    for comment in comments:
+        comment = comment.encode("utf-8")
+        body += struct.pack("<I", len(comment)) + comment
+    return body
+
+def _page(out, serial, sequence, header_type, granule, chunk):
+    """寫出一個 Ogg 頁面；chunk 為 [封包, ...]，回傳寫入的位元組數"""
+    lacing = bytearray()
+    for packet in chunk:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    header = bytearray(b"OggS" + struct.pack("<BBqIII", 0, header_type, granule, serial, sequence, 0))
+    header += bytes([len(lacing)]) + lacing
+    body = b"".join(chunk)
+    struct.pack_into("<I", header, 22, crc32(header + body))
+    return out.write(header) + out.write(body)
+
+def write_stream(out, head, tags, audio, serial=0x5454534F):
+    """
+    把 OpusHead、OpusTags 與音訊封包寫成 Ogg 串流，回傳寫入的位元組數
+    每頁最多 PAGE_PACKETS 個封包 (lacing 值不超過 255 個)，granule 依封包長度累加
+    """
+    pre_skip = struct.unpack_from("<H", head, 10)[0]
+    written = _page(out, serial, 0, 0x02, 0, [head])
+    written += _page(out, serial, 1, 0x00, 0, [tags])
+    sequence, granule = 2, pre_skip
+    chunk, laced = [], 0
+    for packet in audio:
+        need = len(packet) // 255 + 1
+        if chunk and (len(chunk) >= PAGE_PACKETS or laced + need > 255):
+            written += _page(out, serial, sequence, 0x00, granule, chunk)
+            sequence += 1
+            chunk, laced = [], 0
+        chunk.append(packet)
+        laced += need
+        granule += packet_samples(packet)
+    written += _page(out, serial, sequence, 0x04, granule, chunk)
+    return written
+
+def _split(data):
+    """回傳 (OpusHead, OpusTags, 音訊封包列表, serial)；不是 Ogg Opus 時拋出 OggFormatError"""
+    found = packets(data)
+    if len(found) < 2 or not found[0].startswith(b"OpusHead") or not found[1].startswith(b"OpusTags"):
+        raise OggFormatError("找不到 Ogg Opus 標頭")
+    serial = next(iter_pages(data))[3]
+    return found[0], found[1], found[2:], serial
+
+def concat(segments, out, gap_seconds=0.0):
+    """
+    把多段 Ogg Opus 串接為單一串流寫入 out (檔案物件)，回傳寫入的位元組數
+    沿用第一段的 OpusHead / OpusTags，之後各段只取音訊封包重新分頁 (不重新編碼)，
+    段與段之間插入 20 ms 的靜音封包 (GAP_PACKET)；
+    後續各段的 pre-skip (編碼器暖機的數毫秒) 與結尾補齊會保留在音訊中
+    各段的聲道數必須一致，否則拋出 OggFormatError
+    """
+    parsed = [_split(data) for data in segments]
+    if not parsed:
+        raise OggFormatError("沒有 Ogg Opus 片段")
+    head, tags, _, serial = parsed[0]
+    channels = head[9]
+    for other, _, _, _ in parsed:
+        if other[9] != channels:
+            raise OggFormatError(f"片段聲道數不一致: {channels} ch 與 {other[9]} ch")
+    gap = round(gap_seconds * OPUS_RATE / packet_samples(GAP_PACKET)) if gap_seconds > 0 else 0
+    audio = []
+    for n, (_, _, found, _) in enumerate(parsed):
+        if n:
+            audio += [GAP_PACKET] * gap
+        audio += found
+    return write_stream(out, head, tags, audio, serial)
+
+def probe(data, min_gap_packets=2):
+    """
+    只讀頁面與封包標頭取得長度與各段 (單字 / 中文 / 例句) 的時間範圍，不解碼音訊
+    長度為最後一頁的 granule 減去 pre-skip；段落以連續 min_gap_packets 個以上的 GAP_PACKET 為界
+    回傳 (秒數, [(開始秒數, 結束秒數), ...])；不是 Ogg Opus 時回傳 (0.0, [])
+    """
+    try:
+        head, _, audio, _ = _split(data)
+    except OggFormatError:
+        return 0.0, []
+    pre_skip = struct.unpack_from("<H", head, 10)[0]
+    last = 0
+    for _, _, granule, _, _, _ in iter_pages(data):
+        last = max(last, granule)
+    duration = max(0, last - pre_skip) / OPUS_RATE
+
+    # 連續的間隔封包 -> (開始, 結束) 取樣位置
+    runs, elapsed, run_start, run = [], 0, 0, 0
+    for packet in audio:
+        if packet == GAP_PACKET:
+            if not run:
+                run_start = elapsed
+            run += 1
+        else:
+            if run >= min_gap_packets:
+                runs.append((run_start, elapsed))
+            run = 0
+        elapsed += packet_samples(packet)
+    if run >= min_gap_packets:
+        runs.append((run_start, elapsed))
+
+    def to_time(samples):
+        return min(duration, max(0, samples - pre_skip) / OPUS_RATE)
+
+    segments, cursor = [], 0
+    for gap_start, gap_stop in runs:
+        if gap_start > cursor:
+            segments.append((to_time(cursor), to_time(gap_start)))
+        cursor = gap_stop
+    if cursor < elapsed:
+        segments.append((to_time(cursor), duration))
+    return duration, segments
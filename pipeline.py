@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+# =================設定區=================
+PROGRESS_INTERVAL = 2.0  # 進度列印間隔 (秒)
+# ========================================
+
+class Progress:
+    """列印處理進度、速度與預估剩餘時間"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self._start = time.monotonic()
+        self._last_print = self._start
+        self._reported = -1
+
+    def update(self, ok):
+        if ok:
+            self.done += 1
+        else:
+            self.failed += 1
+        now = time.monotonic()
+        if now - self._last_print >= PROGRESS_INTERVAL:
+            self._last_print = now
+            self.report()
+
+    def finish(self):
+        """結束時補印最後一次進度 (已印過則略過)"""
+        if self.done + self.failed != self._reported:
+            self.report()
+
+    def report(self):
+        finished = self.done + self.failed
+        self._reported = finished
+        elapsed = time.monotonic() - self._start
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        line = f"📊 進度 {finished}/{self.total}"
+        if self.total:
+            line += f" ({finished / self.total * 100:.1f}%)"
+        line += f"，{rate:.1f} 列/秒"
+        if rate > 0 and self.total:
+            line += f"，預估剩餘 {(self.total - finished) / rate / 60:.1f} 分鐘"
+        if self.failed:
+            line += f"，失敗 {self.failed}"
+        print(line)
+
+async def run_pipeline(rows, process, write, workers=8, queue_size=None):
+    """
+    有界的生產者 / 消費者流程
+    生產者依序把列放入有界佇列 -> 固定數量的 worker 執行 process(row) 合成語音
+    -> 單一 writer 依完成順序執行 write(row, result) 寫入檔案 (回傳是否成功)
+
+    同時存在的工作數量固定 (worker 數 + 佇列長度)，與表格大小無關。
+    Ctrl-C 時停止派送新的列，已合成完成的結果仍會寫入後才結束。
+    """
+    queue_size = queue_size or workers * 2
+    jobs = asyncio.Queue(maxsize=queue_size)
+    results = asyncio.Queue(maxsize=queue_size)
+    progress = Progress(len(rows) if hasattr(rows, "__len__") else None)
+
+    async def producer():
+        for row in rows:
+            await jobs.put(row)
+        for _ in range(workers):
+            await jobs.put(None)
+
+    async def worker():
+        while True:
+            row = await jobs.get()
+            if row is None:
+                return
+            result = await process(row)
+            await results.put((row, result))
+
+    async def writer():
+        while True:
+            item = await results.get()
+            if item is None:
+                return
+            progress.update(write(*item))
+
+    writer_task = asyncio.create_task(writer())
+    stage_tasks = [asyncio.create_task(producer())]
+    stage_tasks += [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*stage_tasks)
+    except BaseException:
+        # 中斷 (Ctrl-C) 或 worker 發生未預期錯誤：停止派送與合成，只把已完成的結果寫完
+        print("\n⏹️ 停止派送新的列，正在寫入已完成的結果 ...")
+        for task in stage_tasks:
+            task.cancel()
+        await asyncio.gather(*stage_tasks, return_exceptions=True)
+        await results.put(None)
+        await writer_task
+        progress.finish()
+        raise
+    await results.put(None)
+    await writer_task
+    progress.finish()
+    return progress.done, progress.failed
@@ -0,0 +1,245 @@
+import asyncio
+import email.utils
+import gzip
+import os
+import socket
+import urllib.parse
+import audio_formats
+
+# =================設定區=================
+HOST = "127.0.0.1"     # 改為 "0.0.0.0" 可讓同一網路的其他裝置連線
+PORT = 8000
+# ========================================
+
+AUDIO_EXTENSIONS = tuple(fmt.ext for fmt in audio_formats.FORMATS.values())
+DATA_EXTENSIONS = (".json", ".js")   # 播放清單資料夾只提供這些檔案 (播放清單區塊與搜尋索引)
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    **{fmt.ext: fmt.mime for fmt in audio_formats.FORMATS.values()},  # 音檔 (mp3 / opus / aac)
+}
+COMPRESSIBLE = (".html", ".json", ".js")
+IMMUTABLE = "public, max-age=31536000, immutable"   # 網址帶內容雜湊 (?v=) 的音檔
+REVALIDATE = "no-cache"                             # 其他檔案每次以 ETag 確認是否更新
+MAX_HEADER_BYTES = 16 * 1024
+
+def precompress(paths):
+    """為 HTML / JSON / JS 預先產生 .gz (內容未變時略過)，伺服器直接送出壓縮檔，不必每次壓縮"""
+    count = 0
+    for path in paths:
+        if not path.endswith(COMPRESSIBLE):
+            continue
+        gz_path = path + ".gz"
+        if os.path.exists(gz_path) and os.path.getmtime(gz_path) >= os.path.getmtime(path):
+            continue
+        with open(path, "rb") as f:
+            data = gzip.compress(f.read(), compresslevel=9, mtime=0)
+        with open(gz_path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(gz_path + ".tmp", gz_path)
+        count += 1
+    return count
+
+def parse_range(header, size):
+    """
+    解析單一 Range (bytes=a-b / a- / -n)，回傳 (start, end) (含 end)
+    不支援的格式或多段範圍回傳 None (改為回傳整個檔案)；超出檔案範圍時拋出 ValueError
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            start, end = size - length, size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if first == "":
+        if length <= 0 or size == 0:
+            raise ValueError(header)  # bytes=-0 或空檔案：範圍無法滿足
+        return max(0, start), end
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+def etag_for(st, suffix=""):
+    """強 ETag：以檔案修改時間 (奈秒) 與大小組成；壓縮版本另加後綴"""
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}{suffix}"'
+
+class PlayerServer:
+    """
+    播放器專用的本機 HTTP/1.1 伺服器 (asyncio，單一執行緒可同時服務大量連線)
+    - 只提供播放器網頁、播放清單資料夾內的 JSON / JS 與音檔資料夾內的音檔
+      (manifest、執行紀錄與量測結果等其他檔案不對外提供)
+    - 支援 Range (拖曳進度條)、強 ETag / If-None-Match / If-Range
+    - 音檔網址帶 ?v=內容雜湊 時使用長期快取；HTML / JSON 送出預先壓縮的 .gz
+    - 檔案內容以 loop.sendfile 傳送 (支援的平台使用 os.sendfile，零複製)
+    """
+
+    def __init__(self, root, html_file, data_dirs, audio_dirs, hidden=()):
+        """hidden: 播放清單資料夾中不對外提供的檔名 (例如產生網頁時的內部狀態檔)"""
+        self.root = os.path.realpath(root)
+        self.html_file = html_file
+        self.allowed_files = {os.path.realpath(os.path.join(self.root, html_file))}
+        # (資料夾, 允許的副檔名)
+        self.allowed_dirs = ([(self._dir(d), DATA_EXTENSIONS) for d in data_dirs] +
+                             [(self._dir(d), AUDIO_EXTENSIONS) for d in audio_dirs])
+        self.hidden = set(hidden)
+        self.requests = 0
+
+    def _dir(self, directory):
+        return os.path.realpath(os.path.join(self.root, directory)) + os.sep
+
+    def resolve(self, url_path):
+        """把網址路徑轉為實際檔案路徑；不在允許範圍內回傳 None"""
+        path = urllib.parse.unquote(url_path)
+        if path in ("", "/"):
+            path = "/" + self.html_file
+        full = os.path.realpath(os.path.join(self.root, path.lstrip("/")))
+        allowed = full in self.allowed_files or any(
+            full.startswith(d) and full.lower().endswith(exts) and os.path.basename(full) not in self.hidden
+            for d, exts in self.allowed_dirs)
+        if allowed and os.path.isfile(full):
+            return full
+        return None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._send_empty(writer, 400, "Bad Request", close=True)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+                self.requests += 1
+                await self.respond(writer, method, target, headers, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, method, target, headers, keep_alive):
+        if method not in ("GET", "HEAD"):
+            await self._send_empty(writer, 405, "Method Not Allowed", keep_alive, {"Allow": "GET, HEAD"})
+            return
+        url = urllib.parse.urlsplit(target)
+        path = self.resolve(url.path)
+        if path is None:
+            await self._send_empty(writer, 404, "Not Found", keep_alive)
+            return
+
+        ext = os.path.splitext(path)[1].lower()
+        st = os.stat(path)
+        extra = {
+            "Content-Type": CONTENT_TYPES.get(ext, "application/octet-stream"),
+            "Last-Modified": email.utils.formatdate(st.st_mtime, usegmt=True),
+        }
+        versioned = "v" in urllib.parse.parse_qs(url.query)
+        extra["Cache-Control"] = IMMUTABLE if versioned and extra["Content-Type"].startswith("audio/") else REVALIDATE
+
+        # 預先壓縮的版本 (Range 請求一律使用原始檔案)
+        send_path = path
+        etag = etag_for(st)
+        if ext in COMPRESSIBLE:
+            extra["Vary"] = "Accept-Encoding"
+            gz_path = path + ".gz"
+            if "gzip" in headers.get("accept-encoding", "") and "range" not in headers \
+                    and os.path.exists(gz_path) and os.path.getmtime(gz_path) >= st.st_mtime:
+                send_path = gz_path
+                st = os.stat(gz_path)
+                etag = etag_for(os.stat(path), "-gz")
+                extra["Content-Encoding"] = "gzip"
+        extra["ETag"] = etag
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+            await self._send_empty(writer, 304, "Not Modified", keep_alive, extra, length=False)
+            return
+
+        size = st.st_size
+        status, reason, start, count = 200, "OK", 0, size
+        range_header = headers.get("range")
+        if range_header and "Content-Encoding" not in extra:
+            # If-Range 與目前 ETag 不符時，代表檔案已更新，改回傳整個檔案
+            if_range = headers.get("if-range")
+            if if_range is None or if_range.strip() == etag:
+                try:
+                    byte_range = parse_range(range_header, size)
+                except ValueError:
+                    extra["Content-Range"] = f"bytes */{size}"
+                    await self._send_empty(writer, 416, "Range Not Satisfiable", keep_alive, extra)
+                    return
+                if byte_range is not None:
+                    start, end = byte_range
+                    status, reason, count = 206, "Partial Content", end - start + 1
+                    extra["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        extra["Accept-Ranges"] = "bytes"
+        writer.write(self._head(status, reason, keep_alive, extra, count))
+        if method == "HEAD" or count == 0:
+            await writer.drain()
+            return
+        await writer.drain()
+        with open(send_path, "rb") as f:
+            await asyncio.get_running_loop().sendfile(writer.transport, f, start, count)
+
+    def _head(self, status, reason, keep_alive, extra, length):
+        lines = [f"HTTP/1.1 {status} {reason}",
+                 f"Date: {email.utils.formatdate(usegmt=True)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+        lines += [f"{name}: {value}" for name, value in extra.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_empty(self, writer, status, reason, keep_alive=False, extra=None, length=True, close=False):
+        writer.write(self._head(status, reason, keep_alive and not close, extra or {}, 0 if length else None))
+        await writer.drain()
+
+def lan_address():
+    """取得本機在區域網路中的 IP (僅用於顯示連線網址)"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("192.0.2.1", 80))  # 不會真的送出封包
+            return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+
+async def serve(root, html_file, data_dirs, audio_dirs, host=HOST, port=PORT, hidden=()):
+    """啟動伺服器並持續執行，直到按下 Ctrl-C"""
+    server_state = PlayerServer(root, html_file, data_dirs, audio_dirs, hidden)
+    paths = [os.path.join(root, html_file)]
+    for directory in data_dirs:
+        for dirpath, _, files in os.walk(os.path.join(root, directory)):
+            paths += [os.path.join(dirpath, name) for name in files]
+    compressed = precompress(paths)
+    if compressed:
+        print(f"🗜️ 已預先壓縮 {compressed} 個檔案")
+
+    server = await asyncio.start_server(server_state.handle, host, port, limit=MAX_HEADER_BYTES)
+    port = server.sockets[0].getsockname()[1]
+    print(f"🌐 播放器網址: http://127.0.0.1:{port}/")
+    if host in ("0.0.0.0", ""):
+        print(f"   同一網路的其他裝置: http://{lan_address()}:{port}/")
+    print("   按 Ctrl-C 結束")
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,165 @@
+import asyncio
+import contextlib
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+# =================設定區=================
+MAX_RETRIES = 5          # 單一請求最多重試次數
+BACKOFF_BASE = 0.5       # 指數退避基準秒數 (0.5, 1, 2, 4 ...)
+BACKOFF_MAX = 30.0       # 單次退避上限秒數
+DECREASE_COOLDOWN = 1.0  # 兩次降速之間至少間隔秒數 (避免同一波錯誤連續砍半)
+# ========================================
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class RequestFailed(Exception):
+    """重試用盡或遇到不可重試的錯誤"""
+
+def parse_retry_after(value):
+    """解析 Retry-After 標頭 (秒數或 HTTP 日期)，無法解析時回傳 None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def classify_error(exc):
+    """
+    判斷錯誤類型，回傳 (是否可重試, 是否代表被限流/伺服器過載, Retry-After 秒數)
+    OpenAI SDK 的例外帶有 status_code / response；edge-tts 底層 aiohttp 的例外帶有 status
+    """
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    response = getattr(exc, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+
+    retry_after = None
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None)
+    if headers:
+        retry_after = parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+
+    timed_out = isinstance(exc, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in type(exc).__name__
+    if timed_out:
+        return True, True, retry_after
+    if status is not None:
+        status = int(status)
+        return status in RETRYABLE_STATUS, status == 429 or status >= 500, retry_after
+    # 沒有狀態碼的錯誤 (連線中斷、websocket 關閉等) 視為暫時性錯誤，可重試但不降速
+    return True, False, retry_after
+
+class AdaptiveLimiter:
+    """
+    AIMD 自適應並發控制器
+    請求成功時逐步放寬並發上限 (加法增加)，遇到 429 / 5xx / 逾時時砍半 (乘法減少)，
+    並依 Retry-After 暫停所有新請求；失敗的請求以帶抖動的指數退避重試。
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=32, max_retries=MAX_RETRIES):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_retries = max_retries
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self.peak_limit = self.limit
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    async def _acquire(self):
+        async with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self._in_flight < int(self.limit):
+                    break
+                await self._cond.wait()
+            self._in_flight += 1
+
+    async def _release(self):
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """佔用一個並發名額 (不重試、不調整上限)；對沖請求以此與原請求分別計入並發數"""
+        await self._acquire()
+        try:
+            yield
+        finally:
+            await self._release()
+
+    def _on_success(self):
+        # 每成功約 limit 次請求，上限 +1
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self.peak_limit = max(self.peak_limit, self.limit)
+
+    def _on_throttle(self, retry_after):
+        self.throttled += 1
+        now = time.monotonic()
+        if now - self._last_decrease >= DECREASE_COOLDOWN:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self._last_decrease = now
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+    async def call(self, make_request, label="", trace=None, no_retry=()):
+        """
+        在並發限制下執行 make_request() (回傳 coroutine 的函式，每次重試重新呼叫)
+        重試用盡時拋出 RequestFailed
+        trace: (選用) metrics.new_trace() 的 dict，會累計排隊時間、嘗試次數、退避時間與錯誤
+        no_retry: 不重試的例外類型 (照常計入限流與失敗，直接拋出 RequestFailed，由呼叫端改用其他方式)
+        """
+        for attempt in range(self.max_retries + 1):
+            wait_start = time.monotonic()
+            await self._acquire()
+            if trace is not None:
+                trace["queue_wait"] += time.monotonic() - wait_start
+                trace["attempts"] += 1
+            try:
+                result = await make_request()
+            except asyncio.CancelledError:
+                await self._release()
+                raise
+            except Exception as e:
+                await self._release()
+                retryable, throttled, retry_after = classify_error(e)
+                if trace is not None:
+                    trace["errors"].append(type(e).__name__)
+                    trace["throttled"] += throttled
+                if throttled:
+                    self._on_throttle(retry_after)
+                if not retryable or attempt == self.max_retries or isinstance(e, no_retry):
+                    self.failures += 1
+                    raise RequestFailed(f"{type(e).__name__}: {e}") from e
+                # Full jitter：在 [0, 指數上限] 間隨機等待，避免所有請求同時重送
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                if retry_after:
+                    delay = max(delay, retry_after)
+                self.retries += 1
+                if trace is not None:
+                    trace["backoff"] += delay
+                print(f"   🔁 重試 {attempt + 1}/{self.max_retries} [{label}] {delay:.1f}s 後 ({type(e).__name__})")
+                await asyncio.sleep(delay)
+                continue
+            await self._release()
+            self._on_success()
+            return result
+
+    def summary(self):
+        return (f"並發上限 {self.limit:.1f} (最高 {self.peak_limit:.1f})，"
+                f"重試 {self.retries} 次，限流 {self.throttled} 次，失敗 {self.failures} 次")
@@ -0,0 +1,74 @@
+import glob
+import json
+import os
+import time
+
+JOURNAL_DIR_NAME = "journal"
+
+class RunJournal:
+    """
+    單次執行的流水帳 (append-only JSONL，每筆事件寫入後立即 flush)
+    記錄每一列與每個片段的狀態、位元組數與錯誤訊息；程式中斷時已寫入的紀錄仍然有效
+    """
+
+    def __init__(self, output_dir):
+        self.dir = os.path.join(output_dir, JOURNAL_DIR_NAME)
+        os.makedirs(self.dir, exist_ok=True)
+        now = time.time()
+        self.run_id = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+        self.path = os.path.join(self.dir, f"run-{self.run_id}.jsonl")
+        self._f = open(self.path, "a", encoding="utf-8")
+        self.done = 0
+        self.failed = 0
+
+    def _write(self, event, **fields):
+        fields = {"event": event, "time": round(time.time(), 3), **fields}
+        self._f.write(json.dumps(fields, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def queued(self, rows):
+        """登記本次預計處理的列 (用於判斷哪些列尚未完成)"""
+        self._write("run_start", run=self.run_id, rows=len(rows))
+        for row in rows:
+            self._write("queued", hash=row["hash"], filename=row["filename"])
+
+    def segment(self, row, part, voice, text, size, seconds=None, error=None):
+        self._write("segment", hash=row["hash"], part=part, voice=voice, chars=len(text),
+                    bytes=size, seconds=None if seconds is None else round(seconds, 4),
+                    status="failed" if error else "ok", error=error)
+
+    def row_done(self, row, size):
+        self.done += 1
+        self._write("row_done", hash=row["hash"], filename=row["filename"], bytes=size)
+
+    def row_failed(self, row, error):
+        self.failed += 1
+        self._write("row_failed", hash=row["hash"], filename=row["filename"], error=error)
+
+    def close(self):
+        self._write("run_end", done=self.done, failed=self.failed)
+        self._f.close()
+
+    def summary(self):
+        return f"完成 {self.done} 筆，失敗 {self.failed} 筆 (紀錄: {self.path})"
+
+def last_incomplete(output_dir):
+    """
+    讀取最近一次執行的紀錄，回傳排入佇列但沒有 row_done 的列雜湊集合
+    (包含失敗與中斷時尚未處理完的列)；沒有任何紀錄時回傳 None
+    """
+    paths = sorted(glob.glob(os.path.join(output_dir, JOURNAL_DIR_NAME, "run-*.jsonl")))
+    if not paths:
+        return None
+    queued, done = set(), set()
+    with open(paths[-1], "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 中斷時可能留下寫到一半的最後一行
+            if record["event"] == "queued":
+                queued.add(record["hash"])
+            elif record["event"] == "row_done":
+                done.add(record["hash"])
+    return queued - done
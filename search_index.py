@@ -0,0 +1,63 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+# 播放器搜尋用的倒排索引 (產生網頁時預先建立，播放器端只需查表)
+# 斷詞規則必須與播放器中的 JavaScript 完全一致：
+#   1. NFKC 正規化 (全形轉半形) 後轉小寫
+#   2. 英數字：連續的 [a-z0-9] 為一個詞，查詢的最後一個詞以前綴比對 (邊打字邊搜尋)
+#   3. 中日文：每個字 (單字查詢用) 與相鄰兩字 (bigram)，查詢時所有 bigram 都必須出現
+
+FIELDS = ("word", "meaning", "sentence", "sentence_trans")
+_LATIN = re.compile(r"[a-z0-9]+")
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+")  # 假名、中日韓漢字 (含擴充 A、相容字)
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def normalize(text):
+    return unicodedata.normalize("NFKC", text).lower()
+
+def tokenize(text):
+    """回傳文字中的所有索引詞 (集合)"""
+    text = normalize(text)
+    tokens = set(_LATIN.findall(text))
+    for run in _CJK.findall(text):
+        tokens.update(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+def _base36(n):
+    digits = ""
+    while True:
+        n, r = divmod(n, 36)
+        digits = _DIGITS[r] + digits
+        if not n:
+            return digits
+
+def build_index(playlist):
+    """
+    建立倒排索引 (為了縮小檔案，詞彙與列編號都存成單一字串)：
+    - vocab: 依字碼排序並以換行相接 (播放器以二分搜尋找詞與前綴範圍)
+    - postings: 與 vocab 同順序，每個詞的列編號以差值編碼 (36 進位，逗號分隔)，詞與詞之間以分號分隔
+    - titles: 各列的英文單字，用於直接顯示搜尋結果
+    """
+    postings = defaultdict(list)
+    for index, item in enumerate(playlist):
+        tokens = set()
+        for field in FIELDS:
+            tokens |= tokenize(item.get(field) or "")
+        for token in tokens:
+            postings[token].append(index)
+
+    vocab = sorted(postings)
+    base36 = [_base36(n) for n in range(len(playlist))]  # 差值必定小於列數，先建表再查表
+    encoded = []
+    for token in vocab:
+        rows = postings[token]
+        encoded.append(",".join([base36[rows[0]]] + [base36[b - a] for a, b in zip(rows, rows[1:])]))
+    return {
+        "version": 1,
+        "count": len(playlist),
+        "vocab": "\n".join(vocab),
+        "postings": ";".join(encoded),
+        "titles": [item["word"] for item in playlist],
+    }
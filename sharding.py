@@ -0,0 +1,76 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+from manifest import OutputManifest, MANIFEST_NAME
+
+SHARD_DIR_NAME = "shards"  # 各分片的輸出位於 輸出資料夾/shards/i-of-N/
+
+def parse_shard(text):
+    """解析 "i/N" (1 <= i <= N)，回傳 (i, N)；格式錯誤時拋出 ValueError"""
+    index, sep, count = text.partition("/")
+    if not sep:
+        raise ValueError(f"分片格式應為 i/N: {text}")
+    index, count = int(index), int(count)
+    if not 1 <= index <= count:
+        raise ValueError(f"分片編號需介於 1 ~ {count}: {text}")
+    return index, count
+
+def row_key(row):
+    """
+    列的穩定鍵：只由會被朗讀的文字決定，與列的位置無關
+    (插入或刪除其他列不會讓既有的列換到別的分片；內容相同的重複列也會在同一分片)
+    """
+    raw = "\x1f".join([row["word"], row["meaning"], row["sentence"]])
+    return hashlib.sha256(raw.encode("utf-8")).digest()
+
+def shard_of(row, count):
+    """列所屬的分片編號 (1 ~ count)"""
+    return int.from_bytes(row_key(row)[:8], "big") % count + 1
+
+def shard_dir(output_dir, index, count):
+    return os.path.join(output_dir, SHARD_DIR_NAME, f"{index}-of-{count}")
+
+def merge_shards(output_dir, rows):
+    """
+    把各分片的音檔依表格順序合併到輸出資料夾 (以內容雜湊對應，硬連結或複製，分片本身保留)
+    rows: 目前表格的所有列 (含 filename / hash)
+    回傳 (OutputManifest, 合併筆數, 缺少的列)；呼叫端需 save() manifest
+    """
+    sources = {}  # 雜湊 -> (音檔路徑, 長度與段落)
+    for path in sorted(glob.glob(os.path.join(output_dir, SHARD_DIR_NAME, "*", MANIFEST_NAME))):
+        directory = os.path.dirname(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 略過無法讀取的分片 {path}: {e}")
+            continue
+        tracks = {entry["hash"]: {key: entry[key] for key in ("size", "duration", "segments")}
+                  for entry in data.get("rows", []) if "duration" in entry}
+        for name, h in data.get("files", {}).items():
+            full = os.path.join(directory, name)
+            if h not in sources and os.path.exists(full):
+                sources[h] = (full, tracks.get(h))
+
+    manifest = OutputManifest(output_dir)
+    merged, missing = 0, []
+    for row in manifest.plan(rows, verbose=False):  # 合併時不生成，摘要由呼叫端顯示
+        source = sources.get(row["hash"])
+        if source is None:
+            missing.append(row)
+            continue
+        src, track = source
+        dst = os.path.join(output_dir, row["filename"])
+        if os.path.exists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+        manifest.record(row["filename"], row["hash"])
+        if track is not None:
+            manifest.tracks[row["hash"]] = track  # 沿用分片掃描過的長度與段落
+        merged += 1
+    return manifest, merged, missing
@@ -0,0 +1,218 @@
+import asyncio
+import getpass
+import hashlib
+import io
+import os
+import random
+import re
+import adts
+import ogg_opus
+
+# 各語音引擎的 SDK 只在被選用時才 import (沒有安裝 openai 也能使用 edge-tts 或 fake)
+
+class TTSBackend:
+    """
+    語音引擎介面
+    stream(text, voice, fmt) 以 async generator 逐塊回傳音訊資料 (fmt 為 formats 之一，預設 MP3)；
+    name / model 會納入快取鍵與內容雜湊，不同引擎的結果不會混用
+    word_boundaries 為 True 的引擎另外提供 stream_words()，可合併多個短片段為一次請求
+    """
+
+    name = ""
+    model = ""
+    formats = ("mp3",)   # 引擎能直接輸出的格式 (audio_formats 的名稱)
+    word_boundaries = False
+
+    async def open(self):
+        """建立連線或 client (需要時)"""
+
+    async def close(self):
+        """釋放資源"""
+
+    async def stream(self, text, voice, fmt="mp3"):
+        raise NotImplementedError
+        yield b""
+
+    async def stream_words(self, text, voice):
+        """逐塊回傳 (音訊 bytes, None) 或 (None, (offset 秒, duration 秒, 文字)) 的 WordBoundary"""
+        raise NotImplementedError
+        yield None, None
+
+class EdgeTTSBackend(TTSBackend):
+    """微軟 Edge TTS (免費，websocket 串流；edge-tts 套件固定輸出 24 kHz 48 kbps 單聲道 MP3)"""
+
+    name = "edge-tts"
+    word_boundaries = True
+
+    def __init__(self, **_):
+        import edge_tts
+        self._edge_tts = edge_tts
+
+    async def stream(self, text, voice, fmt="mp3"):
+        communicate = self._edge_tts.Communicate(text, voice)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+    async def stream_words(self, text, voice):
+        try:
+            communicate = self._edge_tts.Communicate(text, voice, boundary="WordBoundary")
+        except TypeError:
+            # edge-tts 7 之前沒有 boundary 參數，預設就會回傳 WordBoundary
+            communicate = self._edge_tts.Communicate(text, voice)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"], None
+            elif chunk["type"] == "WordBoundary":
+                # offset / duration 的單位是 100 奈秒
+                yield None, (chunk["offset"] / 1e7, chunk["duration"] / 1e7, chunk["text"])
+
+class OpenAIBackend(TTSBackend):
+    """OpenAI TTS API (需 API Key，依字數計費)"""
+
+    name = "openai"
+    formats = ("mp3", "opus", "aac")  # response_format：opus 為 Ogg Opus，aac 為 ADTS
+
+    def __init__(self, model="tts-1", api_key=None, base_url=None, **_):
+        from openai import AsyncOpenAI
+        self._client_class = AsyncOpenAI
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url  # 可指向相容的本機服務 (例如 benchmark_tts.py 的模擬伺服器)
+        self.client = None
+
+    async def open(self):
+        api_key = self.api_key or os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            print("="*40)
+            api_key = getpass.getpass("🔑 請輸入您的 OpenAI API Key (輸入時不會顯示): ")
+            if not api_key:
+                api_key = input("   (或是直接在此輸入): ") # 作為備用，有些環境 getpass 可能有問題
+            print("="*40)
+        if not api_key:
+            raise RuntimeError("未輸入 API Key")
+        # 關閉 SDK 內建重試，改由 AdaptiveLimiter 統一處理退避與降速
+        self.client = self._client_class(api_key=api_key, base_url=self.base_url, max_retries=0)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+
+    async def stream(self, text, voice, fmt="mp3"):
+        async with self.client.audio.speech.with_streaming_response.create(
+            model=self.model,
+            voice=voice,
+            input=text,
+            response_format=fmt
+        ) as response:
+            async for chunk in response.iter_bytes():
+                yield chunk
+
+class FakeTTSError(Exception):
+    """模擬的服務端錯誤 (帶 status_code，讓 AdaptiveLimiter 依狀態碼處理)"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+# MPEG-2 Layer III, 24 kHz, 48 kbps, mono (與 edge-tts 預設輸出格式相同)
+# 每個 frame 144 bytes、576 個取樣 (24 ms)；frame 內容全為 0 即為可正常解碼的靜音
+FAKE_FRAME_HEADER = bytes([0xFF, 0xF3, 0x64, 0xC4])
+FAKE_FRAME = FAKE_FRAME_HEADER + bytes(144 - len(FAKE_FRAME_HEADER))
+FAKE_FRAME_SECONDS = 576 / 24000
+FAKE_SECONDS_PER_CHAR = 0.06
+
+def fake_mp3_chunks(text, voice, frames_per_chunk=16):
+    """產生假音訊 (合法的靜音 MP3 frame，長度與文字長度成正比)，以區塊列表回傳"""
+    # 以文字雜湊在第一個 frame 的填充區留下標記，不同文字的音訊內容也不同
+    frames = max(4, int(len(text) * FAKE_SECONDS_PER_CHAR / FAKE_FRAME_SECONDS))
+    tag = hashlib.sha256(f"{voice}\x1f{text}".encode("utf-8")).digest()[:8]
+    chunks = [FAKE_FRAME[:-len(tag)] + tag]
+    for start in range(1, frames, frames_per_chunk):
+        chunks.append(FAKE_FRAME * min(frames_per_chunk, frames - start))
+    return chunks
+
+def fake_audio(text, voice, fmt):
+    """
+    Opus / AAC 的假音訊 (合法的靜音封包，長度與文字長度成正比)，以 bytes 回傳
+    文字雜湊記錄在 OpusTags 註解或第一個 AAC frame 的 FIL 元素中
+    """
+    seconds = max(4 * FAKE_FRAME_SECONDS, len(text) * FAKE_SECONDS_PER_CHAR)
+    tag = hashlib.sha256(f"{voice}\x1f{text}".encode("utf-8")).digest()[:8]
+    if fmt == "opus":
+        # CELT 20 ms 靜音封包 (單一 frame)
+        packets = [bytes([0xF8, 0xFF, 0xFE])] * max(1, round(seconds / 0.02))
+        out = io.BytesIO()
+        ogg_opus.write_stream(out, ogg_opus.opus_head(1), ogg_opus.opus_tags("fake", [f"tag={tag.hex()}"]), packets)
+        return out.getvalue()
+    if fmt == "aac":
+        # AAC-LC, 24 kHz, mono；每個 frame 1024 個取樣
+        raw = bytes([0xFF, 0xF1, 0x58, 0x40, 0x00, 0x00, 0x00])
+        count = max(1, round(seconds * 24000 / 1024))
+        return adts.frame(raw, adts.fill_block(1, tag)) + adts.frame(raw, adts.SILENT_BLOCKS[1]) * (count - 1)
+    raise ValueError(f"fake 引擎不支援的格式: {fmt}")
+
+def fake_audio_chunks(text, voice, fmt="mp3", chunk_size=2048):
+    """依格式產生假音訊區塊列表 (MP3 與 fake_mp3_chunks 相同)"""
+    if fmt == "mp3":
+        return fake_mp3_chunks(text, voice)
+    data = fake_audio(text, voice, fmt)
+    return [data[start:start + chunk_size] for start in range(0, len(data), chunk_size)]
+
+def fake_word_boundaries(text):
+    """假音訊對應的 WordBoundary 列表 [(offset 秒, duration 秒, 文字)]，與 fake_mp3_chunks 的長度一致"""
+    return [(m.start() * FAKE_SECONDS_PER_CHAR, len(m.group()) * FAKE_SECONDS_PER_CHAR, m.group())
+            for m in re.finditer(r"\w+(?:['’-]\w+)*", text)]
+
+class FakeBackend(TTSBackend):
+    """
+    離線假引擎：不連網，輸出合法的 MP3 frame / Opus / AAC 靜音 (長度與文字長度成正比)
+    可設定延遲、抖動與失敗率，用來離線調整並發、快取與重試策略；
+    相同文字永遠產生相同音訊，失敗與延遲由固定的亂數種子決定
+    """
+
+    name = "fake"
+    formats = ("mp3", "opus", "aac")
+    word_boundaries = True
+
+    def __init__(self, latency=0.2, jitter=0.05, failure_rate=0.0, seed=0, **_):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self.requests = 0
+
+    async def _respond(self):
+        """模擬請求延遲與失敗"""
+        self.requests += 1
+        delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        await asyncio.sleep(delay)
+        if self._rng.random() < self.failure_rate:
+            status = self._rng.choice([429, 500, 503])
+            raise FakeTTSError(status, f"fake backend error {status}")
+
+    async def stream(self, text, voice, fmt="mp3"):
+        await self._respond()
+        for chunk in fake_audio_chunks(text, voice, fmt):
+            yield chunk
+            await asyncio.sleep(0)
+
+    async def stream_words(self, text, voice):
+        await self._respond()
+        for boundary in fake_word_boundaries(text):
+            yield None, boundary
+        for chunk in fake_mp3_chunks(text, voice):
+            yield chunk, None
+            await asyncio.sleep(0)
+
+BACKENDS = {
+    "edge-tts": EdgeTTSBackend,
+    "openai": OpenAIBackend,
+    "fake": FakeBackend,
+}
+
+def create_backend(name, **options):
+    """依名稱建立語音引擎 (只有被選用的引擎才會 import 對應的 SDK)"""
+    if name not in BACKENDS:
+        raise ValueError(f"未知的語音引擎: {name} (可用: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
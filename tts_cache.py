@@ -0,0 +1,189 @@
+import hashlib
+import os
+import uuid
+from collections import OrderedDict
+
+# =================設定區=================
+CACHE_DIR = ".tts_cache"     # 語音片段快取資料夾 (兩個生成程式共用)
+CACHE_MAX_MB = 512           # 快取容量上限 (MB)，超過時淘汰最久未使用的片段
+# ========================================
+
+class SegmentCache:
+    """
+    以內容雜湊為鍵的語音片段磁碟快取
+    鍵 = sha256(backend + model + voice + text [+ 格式])，超過容量上限時依 LRU 淘汰
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_mb=CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries = OrderedDict()  # key -> 檔案大小，依最後使用時間排序 (舊 -> 新)
+        self._total = 0
+        self._pinned = {}  # key -> 使用中的次數，鎖定中的片段不會被淘汰
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        """掃描既有快取檔，以檔案修改時間重建 LRU 順序"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".seg"):
+                    continue
+                st = os.stat(os.path.join(root, name))
+                found.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+
+    @staticmethod
+    def make_key(backend, model, voice, text, fmt="mp3"):
+        """產生快取鍵 (欄位間以不可見分隔字元區隔，避免拼接碰撞；MP3 以外的格式另外納入格式名稱)"""
+        fields = [backend, model or "", voice, text]
+        if fmt != "mp3":
+            fields.append(fmt)  # MP3 不加入，既有快取仍然有效
+        raw = "\x1f".join(fields)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".seg")
+
+    def lookup(self, key, stats=True):
+        """
+        查詢快取片段，命中時回傳檔案路徑；未命中回傳 None
+        回傳的片段會被鎖定 (不會被淘汰)，使用完畢後需呼叫 release(key)
+        stats=False 時不計入命中率 (例如查詢後製處理過的片段)
+        """
+        if key not in self._entries:
+            self.misses += stats
+            return None
+        path = self.path(key)
+        try:
+            os.utime(path)  # 更新修改時間，下次啟動時仍保有 LRU 順序
+        except OSError:
+            # 檔案被外部刪除，視為未命中
+            self._total -= self._entries.pop(key)
+            self.misses += stats
+            return None
+        self._entries.move_to_end(key)
+        self._pin(key)
+        self.hits += stats
+        return path
+
+    def open_writer(self, key):
+        """開啟串流寫入器：資料邊收邊寫入暫存檔，commit() 後才成為有效快取"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SegmentWriter(self, key, path)
+
+    def put(self, key, data):
+        """一次寫入整段資料 (已在記憶體中的片段使用)"""
+        if not data:
+            return
+        writer = self.open_writer(key)
+        writer.write(data)
+        self.release(writer.commit())
+
+    def temp_path(self, key):
+        """給其他處理程序寫入的暫存檔路徑 (寫完後以 adopt() 加入快取)"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+
+    def adopt(self, key, tmp_path):
+        """把已寫好的暫存檔加入快取，回傳快取鍵 (已鎖定，使用完畢需 release)；檔案不存在或為空時回傳 None"""
+        try:
+            size = os.path.getsize(tmp_path)
+        except OSError:
+            return None
+        if not size:
+            os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, self.path(key))
+        self._register(key, size)
+        return key
+
+    def _register(self, key, size):
+        if key in self._entries:
+            self._total -= self._entries.pop(key)
+        self._entries[key] = size
+        self._total += size
+        self._pin(key)
+        self._evict()
+
+    def _pin(self, key):
+        self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def retain(self, key):
+        """再鎖定一次已鎖定的片段 (同一片段寫入多個輸出時，每次使用各自 release)"""
+        self._pin(key)
+
+    def release(self, key):
+        """解除片段鎖定，讓它可以被 LRU 淘汰"""
+        if key is None:
+            return
+        count = self._pinned.get(key, 0) - 1
+        if count > 0:
+            self._pinned[key] = count
+        else:
+            self._pinned.pop(key, None)
+            self._evict()
+
+    def _evict(self):
+        """淘汰最久未使用的片段，直到總大小低於上限 (鎖定中的片段略過)"""
+        if self._total <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if self._total <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            self._total -= self._entries.pop(key)
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def size(self, key):
+        """片段大小 (bytes)"""
+        return self._entries.get(key, 0)
+
+    def summary(self):
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0.0
+        return f"快取命中 {self.hits}/{total} ({ratio:.0f}%)，快取大小 {self._total / 1024 / 1024:.1f} MB"
+
+class SegmentWriter:
+    """串流寫入單一片段；每個寫入器使用獨立暫存檔，重試或並發時不會互相覆蓋"""
+
+    def __init__(self, cache, key, path):
+        self.cache = cache
+        self.key = key
+        self.path = path
+        self.size = 0
+        self._tmp_path = f"{path}.{os.getpid()}.{id(self):x}.tmp"
+        self._f = open(self._tmp_path, "wb")
+
+    def write(self, data):
+        self._f.write(data)
+        self.size += len(data)
+
+    def commit(self):
+        """完成寫入並加入快取，回傳快取鍵 (已鎖定，使用完畢需 release)；空資料回傳 None"""
+        self._f.close()
+        if not self.size:
+            self.discard()
+            return None
+        os.replace(self._tmp_path, self.path)
+        self.cache._register(self.key, self.size)
+        return self.key
+
+    def discard(self):
+        """放棄寫入 (請求失敗時呼叫)"""
+        self._f.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
@@ -0,0 +1,660 @@
+import argparse
+import asyncio
+import contextlib
+import copy
+import mmap
+import os
+import re
+import time
+import md_table
+from tts_cache import SegmentCache, CACHE_DIR, CACHE_MAX_MB
+from rate_limiter import AdaptiveLimiter, RequestFailed
+from manifest import OutputManifest, content_hash
+from run_journal import RunJournal, last_incomplete
+from pipeline import run_pipeline
+from tts_backends import create_backend
+from word_batch import WordBatcher
+from album import Album
+from metrics import Metrics, new_trace, METRICS_DIR_NAME
+from hedging import Hedger, REQUEST_TIMEOUT, HEDGE_MAX_RATIO
+from failover import Failover
+from sharding import parse_shard, shard_of, shard_dir, merge_shards
+import audio_formats
+
+# 多重輸出時每組可覆寫的設定
+PROFILE_FIELDS = ("output_dir", "audio_mode", "voice_en_word", "voice_en_sent", "voice_zh", "segment_gap_ms", "album",
+                  "audio_format")
+
+class Settings:
+    """
+    生成設定 (預設值與 Edge TTS 版本相同)
+    vocab_audio_md.py / vocab_audio_openai.py 以各自設定區的常數建立 Settings 後呼叫 run()
+    """
+
+    def __init__(self, **overrides):
+        self.backend = "edge-tts"          # 語音引擎: edge-tts / openai / fake
+        self.model = ""                    # 模型 (OpenAI: tts-1 / tts-1-hd)
+        self.base_url = None               # OpenAI 相容端點 (None = 官方 API)
+        self.input_file = "mp3.md"         # 輸入檔：單一檔案、萬用字元 (例如 "vocab/*.md") 或檔案列表 (序號跨檔案連續)
+        self.output_dir = "MP3_Output"
+        self.voice_en_word = "en-US-AndrewNeural"
+        self.voice_en_sent = "en-US-AriaNeural"
+        self.voice_zh = "zh-TW-HsiaoChenNeural"
+        self.audio_mode = 2
+        self.segment_gap_ms = 300          # 單字、中文、例句之間插入的靜音長度 (毫秒)
+        self.album = False                 # 另外輸出整合音檔 (單一 MP3 + 章節索引)
+        self.audio_format = "mp3"          # 輸出格式: mp3 / opus / aac (由引擎直接輸出，不轉檔；見 audio_formats)
+        self.concurrency_start = 5
+        self.concurrency_max = 32
+        self.workers = 16
+        self.word_batch_size = 0           # 單字片段合併請求的數量 (0 = 關閉；引擎需支援 WordBoundary)
+        self.cache_dir = CACHE_DIR
+        self.cache_max_mb = CACHE_MAX_MB
+        self.table_cache = True            # 快取 Markdown 表格的解析結果 (存放於 cache_dir/tables/)
+        self.fake_latency = 0.2            # fake 引擎：每個請求的延遲 (秒)
+        self.fake_failure_rate = 0.0       # fake 引擎：失敗機率 (0~1)
+        self.script = "vocab_audio_md.py"  # 提示訊息中顯示的執行檔名
+        self.metrics_dir = None            # 量測結果資料夾 (None = 第一組輸出資料夾下的 metrics/)
+        self.request_timeout = REQUEST_TIMEOUT  # 單次請求期限 (秒)
+        self.hedge = True                  # 回應慢於最近 p95 時送出對沖請求 (取先完成者)
+        self.fallback_backend = None       # 備援語音引擎 (None = 不備援)
+        self.fallback_model = ""
+        self.fallback_voices = {}          # 主要引擎聲音 -> 備援引擎聲音
+        self.normalize = False             # 片段音量正規化與頭尾靜音修剪 (需要 numpy 與 ffmpeg)
+        self.shard = None                  # (i, N)：只處理第 i 個分片 (共 N 個)，輸出到 輸出資料夾/shards/i-of-N/
+        self.profiles = []                 # 多重輸出：每組為覆寫 PROFILE_FIELDS 的 dict (空列表 = 只輸出本身的設定)
+        for name, value in overrides.items():
+            if not hasattr(self, name):
+                raise TypeError(f"未知的設定: {name}")
+            setattr(self, name, value)
+
+    def targets(self):
+        """展開多重輸出設定，回傳各組的 Settings (沒有設定 profiles 時只有自己)"""
+        if not self.profiles:
+            audio_formats.get(self.audio_format)
+            return [self]
+        targets = []
+        for overrides in self.profiles:
+            unknown = set(overrides) - set(PROFILE_FIELDS)
+            if unknown:
+                raise TypeError(f"輸出設定不支援: {', '.join(sorted(unknown))}")
+            target = copy.copy(self)
+            target.profiles = []
+            for name, value in overrides.items():
+                setattr(target, name, value)
+            audio_formats.get(target.audio_format)
+            targets.append(target)
+        dirs = [os.path.normcase(os.path.abspath(target.output_dir)) for target in targets]
+        if len(set(dirs)) != len(dirs):
+            raise ValueError("每組輸出設定需使用不同的 output_dir")
+        return targets
+
+class Output:
+    """一組輸出：設定、資料列 (雜湊依該組設定計算)、manifest 與執行紀錄"""
+
+    def __init__(self, settings, rows):
+        self.settings = settings
+        self.rows = rows
+        self.manifest = OutputManifest(settings.output_dir)
+        self.journal = None
+        self.pending = []
+
+async def get_audio_segment(backend, text, voice, limiter, cache, metrics=None, hedger=None, failover=None,
+                            fmt="mp3"):
+    """
+    取得片段的快取鍵 (先查詢快取，未命中時呼叫語音引擎)
+    回傳的快取鍵已鎖定，寫入音檔後需 release；失敗時拋出 RequestFailed
+    有 failover 時，主要引擎失敗 (或已切換) 的片段改用備援引擎與對應的聲音合成 (備援引擎需支援 fmt)
+    """
+    key = cache.make_key(backend.name, backend.model, voice, text, fmt)
+    if cache.lookup(key):
+        return key
+    if failover is None or failover.voice(voice) is None or fmt not in failover.backend.formats:
+        return await request_segment(backend, key, text, voice, limiter, cache, metrics, hedger, fmt)
+
+    if failover.use_primary():
+        try:
+            key = await request_segment(backend, key, text, voice, limiter, cache, metrics, hedger, fmt)
+        except RequestFailed:
+            failover.failure()
+        else:
+            failover.success()
+            return key
+    fallback, fallback_voice = failover.backend, failover.voice(voice)
+    key = cache.make_key(fallback.name, fallback.model, fallback_voice, text, fmt)
+    if cache.lookup(key):
+        return key
+    key = await request_segment(fallback, key, text, fallback_voice, failover.limiter, cache, metrics,
+                                failover.hedger, fmt)
+    failover.segments += 1
+    return key
+
+async def request_segment(backend, key, text, voice, limiter, cache, metrics=None, hedger=None, fmt="mp3"):
+    """
+    呼叫語音引擎生成語音，收到的音訊區塊直接串流寫入片段快取
+    有 hedger 時每次嘗試都有期限，回應過慢時另外送出對沖請求
+    有 metrics 時記錄實際送出的請求 (排隊、首位元組、總時間、重試)
+    """
+    trace = new_trace()
+
+    async def attempt(first_byte):
+        writer = cache.open_writer(key)
+        started = time.monotonic()
+        try:
+            async for chunk in backend.stream(text, voice, fmt):
+                if not writer.size:
+                    first_byte()
+                    if trace["ttfb"] is None:
+                        trace["ttfb"] = time.monotonic() - started
+                writer.write(chunk)
+        except BaseException:
+            writer.discard()
+            raise
+        committed = writer.commit()
+        if committed is None:
+            # 空的回應視為失敗 (交給重試、退避與執行紀錄)，不當成成功的 0 位元組片段
+            raise RequestFailed("空的音訊串流")
+        return committed
+
+    async def request():
+        trace["ttfb"] = None
+        if hedger is None:
+            return await attempt(lambda: None)
+        return await hedger.run(attempt, cache.release, limiter)
+
+    # 並發限制只計算實際送出的請求 (快取命中不佔名額)，失敗時自動退避重試
+    start = time.monotonic()
+    try:
+        result = await limiter.call(request, text, trace)
+    except RequestFailed as e:
+        print(f"   ⚠️ 語音生成錯誤 [{backend.name} {text}]: {e}")
+        if metrics is not None:
+            metrics.request(backend.name, voice, len(text), 0, time.monotonic() - start, trace, error=str(e))
+        raise
+    if metrics is not None:
+        metrics.request(backend.name, voice, len(text), cache.size(result) if result else 0,
+                        time.monotonic() - start, trace)
+    return result
+
+def iter_rows(paths, settings, backend):
+    """依序產生所有輸入檔的資料列 (含序號、檔名與內容雜湊)；表格解析與快取由 md_table 負責"""
+    table_cache = os.path.join(settings.cache_dir, "tables") if settings.table_cache else None
+    for record in md_table.iter_rows(paths, table_cache):
+        row = record.as_dict()
+        row["filename"] = row_filename(record.index, record.word, settings.audio_format)
+        row["hash"] = row_hash(row, settings, backend)
+        yield row
+
+def row_filename(index, en_word, fmt="mp3"):
+    """決定檔名 (4位數序號，副檔名依輸出格式)"""
+    safe_filename_text = re.sub(r'[\\/*?:"<>|]', "", en_word)
+    return f"{index:04d}_{safe_filename_text}{audio_formats.get(fmt).ext}"
+
+def row_hash(row, settings, backend):
+    """計算列的內容雜湊 (只納入實際會被朗讀的欄位與聲音設定)"""
+    sentence = row["sentence"] if settings.audio_mode == 2 else ""
+    extra = []
+    if settings.normalize and settings.audio_format == "mp3":
+        from loudness import PARAMS
+        extra.append(PARAMS)  # 未啟用時不加入，既有音檔的雜湊維持不變
+    if settings.audio_format != "mp3":
+        extra.append(f"format={settings.audio_format}")
+    return content_hash(backend.name, backend.model, settings.voice_en_word, row["word"],
+                        settings.voice_zh, row["meaning"], settings.voice_en_sent, sentence,
+                        f"gap={settings.segment_gap_ms}", *extra)
+
+def target_row(row, target, backend):
+    """依某組輸出的設定重新計算資料列的檔名與內容雜湊"""
+    return dict(row, filename=row_filename(row["index"], row["word"], target.audio_format),
+                hash=row_hash(row, target, backend))
+
+def check_formats(targets, backend):
+    """引擎不支援的輸出格式改用 MP3；整合音檔只支援 MP3"""
+    for target in targets:
+        if target.audio_format not in backend.formats:
+            print(f"⚠️ {backend.name} 無法輸出 {target.audio_format}，{target.output_dir} 改用 mp3")
+            target.audio_format = "mp3"
+        if target.album and target.audio_format != "mp3":
+            print(f"⚠️ 整合音檔只支援 mp3，{target.output_dir} 不輸出整合音檔")
+            target.album = False
+
+def row_segments(row, settings):
+    """依模式列出此列要朗讀的片段 [(部分, 文字, 聲音)]"""
+    # 片段 A: 單字
+    segments = [("word", row["word"], settings.voice_en_word)]
+
+    # 片段 B: 中文釋義
+    if row["meaning"]:
+        segments.append(("meaning", row["meaning"], settings.voice_zh))
+
+    # 片段 C: 英文例句 (僅模式 2 且有例句時)
+    if settings.audio_mode == 2 and row["sentence"]:
+        segments.append(("sentence", row["sentence"], settings.voice_en_sent))
+    return segments
+
+async def process_line(job, backend, limiter, cache, batcher=None, metrics=None, hedger=None, failover=None,
+                       normalizer=None):
+    """
+    合成同一列在各組輸出需要的所有語音片段 (相同的文字、聲音與格式只合成一次)
+    job: [(Output, 該組的資料列), ...]；依序回傳各組的 (片段快取鍵列表, 失敗片段列表)
+    有 batcher 時，MP3 的單字片段會與其他列的單字合併成一次請求；有 normalizer 時 MP3 片段會先經過音量正規化
+    """
+    job_start = time.monotonic()
+    first = job[0][1]
+    print(f"處理中 [{first['index']:04d}]: {first['word']}")
+
+    wanted = [[(part, text, voice, output.settings.audio_format)
+               for part, text, voice in row_segments(row, output.settings)] for output, row in job]
+    unique = {}
+    for segments in wanted:
+        for part, text, voice, fmt in segments:
+            unique.setdefault((text, voice, fmt), part)
+
+    async def timed(part, text, voice, fmt):
+        start = time.monotonic()
+        if batcher is not None and part == "word" and fmt == "mp3" and not (failover and failover.tripped):
+            try:
+                key = await batcher.get(text, voice)
+            except RequestFailed:
+                if failover is None:
+                    raise
+                # 合併請求失敗時改為逐一請求 (主要引擎持續失敗時會轉往備援引擎)
+                failover.failure()
+                key = await get_audio_segment(backend, text, voice, limiter, cache, metrics, hedger, failover)
+        else:
+            key = await get_audio_segment(backend, text, voice, limiter, cache, metrics, hedger, failover, fmt)
+        return key, time.monotonic() - start
+
+    # 所有片段同時請求，gather 會依原順序回傳
+    results = await asyncio.gather(
+        *(timed(part, *segment) for segment, part in unique.items()),
+        return_exceptions=True)
+    results = dict(zip(unique, results))
+
+    # 音量正規化與修剪在處理程序中執行 (同一列的片段一次送出)，等待期間其他列的網路請求照常進行
+    if normalizer is not None:
+        done = [segment for segment, result in results.items()
+                if segment[2] == "mp3" and not isinstance(result, BaseException)]
+        if done:
+            start = time.monotonic()
+            keys = await normalizer.process([results[pair][0] for pair in done])
+            for segment, key in zip(done, keys):
+                # 正規化失敗的片段視為失敗 (該列不寫入，可重試)
+                results[segment] = key if isinstance(key, BaseException) else (key, results[segment][1])
+            if metrics is not None:
+                metrics.stage("正規化", time.monotonic() - start)
+
+    outcome = []
+    used = set()
+    for (output, row), segments in zip(job, wanted):
+        segment_keys = []
+        errors = []
+        for part, text, voice, fmt in segments:
+            result = results[(text, voice, fmt)]
+            if isinstance(result, BaseException):
+                output.journal.segment(row, part, voice, text, 0, error=str(result) or type(result).__name__)
+                errors.append(part)
+                continue
+            key, seconds = result
+            # 合成時已鎖定一次；同一片段再次使用時另外鎖定 (每組寫入後各自 release)
+            if (text, voice, fmt) in used:
+                cache.retain(key)
+            used.add((text, voice, fmt))
+            output.journal.segment(row, part, voice, text, cache.size(key), seconds=seconds)
+            segment_keys.append(key)
+        outcome.append((segment_keys, errors))
+    if metrics is not None:
+        metrics.stage("合成", time.monotonic() - job_start)
+    return outcome
+
+def write_row(row, result, settings, cache, manifest, journal):
+    """writer 階段：把片段合併寫成音檔；所有片段都成功才寫入檔案，回傳是否完成"""
+    segment_keys, errors = result
+    index, en_word = row["index"], row["word"]
+    filepath = os.path.join(settings.output_dir, row["filename"])
+    try:
+        # 有任何片段失敗就不寫入，避免留下缺段的音檔被當成已完成
+        if errors:
+            journal.row_failed(row, "片段失敗: " + ", ".join(errors))
+            print(f"❌ 未完成 [{index:04d}]: {en_word} (失敗片段: {', '.join(errors)})")
+            return False
+
+        # 8. 寫入檔案 (合併所有片段)
+        # 先寫入 .part 暫存檔，完成後再改名，中斷時不會留下不完整的音檔
+        tmp_path = filepath + ".part"
+        try:
+            with open(tmp_path, "wb") as out_f:
+                size = write_segments([cache.path(key) for key in segment_keys], out_f,
+                                      settings.segment_gap_ms / 1000, settings.audio_format)
+            os.replace(tmp_path, filepath)
+        except Exception as e:
+            print(f"❌ 寫入失敗: {e}")
+            journal.row_failed(row, f"寫入失敗: {e}")
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            return False
+        manifest.record(row["filename"], row["hash"])
+        journal.row_done(row, size)
+        return True
+    finally:
+        for key in segment_keys:
+            cache.release(key)
+
+def write_segments(paths, out_f, gap_seconds, fmt="mp3"):
+    """
+    以 frame (Opus 為封包) 為單位串接片段檔 (mmap 讀取，不複製、不重新編碼)，片段之間插入靜音，回傳寫入的位元組數
+    片段格式不一致或無法辨識時，改為直接依序複製原始檔案
+    """
+    fmt = audio_formats.get(fmt)
+    with contextlib.ExitStack() as stack:
+        segments = []
+        for path in paths:
+            f = stack.enter_context(open(path, "rb"))
+            segments.append(stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)))
+        try:
+            return fmt.concat(segments, out_f, gap_seconds)
+        except fmt.error as e:
+            print(f"   ⚠️ {e}，改為直接串接片段")
+        for segment in segments:
+            out_f.write(segment)
+        return out_f.tell()
+
+async def main(settings, retry_failed=False, merge=False):
+    # 0. 建立語音引擎 (OpenAI 會在此詢問 API Key)
+    try:
+        backend = create_backend(settings.backend, model=settings.model, base_url=settings.base_url,
+                                 latency=settings.fake_latency, failure_rate=settings.fake_failure_rate)
+    except ImportError as e:
+        package = {"edge_tts": "edge-tts"}.get(e.name, e.name)
+        print(f"❌ 缺少套件 {package}，請先執行: pip install {package}")
+        return
+    if merge:
+        # 合併只需計算內容雜湊 (引擎名稱與模型)，不需要連線
+        merge_outputs(settings, backend)
+        return
+    try:
+        await backend.open()
+    except RuntimeError as e:
+        print(f"❌ {e}，程式結束。")
+        return
+    # 備援引擎 (選用)：無法建立時只顯示警告，仍以主要引擎執行
+    fallback = None
+    if settings.fallback_backend:
+        try:
+            fallback = create_backend(settings.fallback_backend, model=settings.fallback_model,
+                                      latency=settings.fake_latency)
+            await fallback.open()
+        except ImportError as e:
+            package = {"edge_tts": "edge-tts"}.get(e.name, e.name)
+            print(f"⚠️ 缺少套件 {package}，不使用備援引擎。")
+            fallback = None
+        except RuntimeError as e:
+            print(f"⚠️ {e}，不使用備援引擎。")
+            fallback = None
+    try:
+        await generate(settings, backend, retry_failed, fallback)
+    finally:
+        await backend.close()
+        if fallback is not None:
+            await fallback.close()
+
+async def generate(settings, backend, retry_failed=False, fallback=None):
+    """
+    依設定把 Markdown 表格轉為 MP3 (不論使用哪個語音引擎，流程都相同)
+    設定了多組輸出 (profiles) 時，各組需要的片段合併後只合成一次，再分別組成各組的 MP3
+    fallback: (選用) 備援語音引擎，主要引擎持續失敗時依 fallback_voices 改用
+    """
+    input_files = md_table.input_files(settings.input_file)
+    # 音量正規化 (選用)：缺少 numpy 或 ffmpeg 時略過此步驟 (需在計算內容雜湊前決定)
+    if settings.normalize:
+        try:
+            import loudness
+        except ImportError as e:
+            print(f"⚠️ 缺少套件 {e.name}，不進行音量正規化 (pip install {e.name})")
+            settings.normalize = False
+        else:
+            if not loudness.available():
+                print(f"⚠️ 找不到 {loudness.FFMPEG}，不進行音量正規化")
+                settings.normalize = False
+    try:
+        targets = settings.targets()
+    except (TypeError, ValueError) as e:
+        print(f"❌ {e}")
+        return
+    check_formats(targets, backend)
+
+    # 分片：各組輸出改寫到 輸出資料夾/shards/i-of-N/ (整合音檔在合併後才建立)
+    if settings.shard:
+        for target in targets:
+            target.output_dir = shard_dir(target.output_dir, *settings.shard)
+            target.album = False
+
+    # 建立輸出目錄
+    for target in targets:
+        if not os.path.exists(target.output_dir):
+            os.makedirs(target.output_dir)
+            print(f"已建立目錄: {target.output_dir}")
+    
+    # 檢查輸入檔案
+    if not check_inputs(input_files, settings.input_file):
+        return
+
+    print(f"正在讀取 {', '.join(input_files)} ...")
+
+    # 全域自適應並發控制 (計算同時進行中的 TTS 請求數，非每列)，避免請求過快被封鎖
+    limiter = AdaptiveLimiter(settings.concurrency_start, max_limit=settings.concurrency_max)
+    # 片段快取：相同 (引擎, 聲音, 文字) 不重複呼叫 TTS，所有引擎共用同一個資料夾
+    cache = SegmentCache(settings.cache_dir, settings.cache_max_mb)
+    # 每次請求的期限與對沖 (hedge=False 時只保留期限)
+    hedge_ratio = HEDGE_MAX_RATIO if settings.hedge else 0.0
+    hedger = Hedger(settings.request_timeout, max_ratio=hedge_ratio)
+    failover = None
+    if fallback is not None:
+        # 備援引擎使用獨立的並發控制與延遲統計
+        failover = Failover(fallback, settings.fallback_voices,
+                            AdaptiveLimiter(settings.concurrency_start, max_limit=settings.concurrency_max),
+                            Hedger(settings.request_timeout, max_ratio=hedge_ratio))
+    # 量測：每個請求的排隊 / 首位元組 / 總時間與各階段耗時，結束時寫出 JSONL 與 Prometheus textfile
+    metrics = Metrics(settings.metrics_dir or os.path.join(targets[0].output_dir, METRICS_DIR_NAME))
+    # 逐行解析 (檔案沒有變動時直接載入解析快取)；manifest 比對需要所有列的雜湊，故保留解析後的列
+    rows = list(iter_rows(input_files, settings, backend))
+    if settings.shard:
+        index, count = settings.shard
+        total = len(rows)
+        rows = [row for row in rows if shard_of(row, count) == index]
+        print(f"🔀 分片 {index}/{count}：處理 {len(rows)} 筆 (全部 {total} 筆)")
+
+    if not rows:
+        print("沒有偵測到有效的表格資料。")
+        return
+
+    outputs = []
+    for target in targets:
+        if len(targets) > 1:
+            print(f"📁 {target.output_dir} (模式 {target.audio_mode}，間隔 {target.segment_gap_ms} ms，"
+                  f"格式 {target.audio_format})")
+        # 檔名與內容雜湊依各組的格式、模式、聲音與間隔計算
+        target_rows = rows if target is settings else [target_row(row, target, backend) for row in rows]
+        output = Output(target, target_rows)
+
+        # 依內容雜湊比對既有音檔：插入/刪除列時只改名，不重新生成 (也節省 API 費用)
+        pending = output.manifest.plan(target_rows)
+
+        # --retry-failed：只重做上次執行中失敗或中斷的列
+        if retry_failed:
+            incomplete = last_incomplete(target.output_dir)
+            if incomplete is None:
+                print("⚠️ 找不到先前的執行紀錄，改為處理所有未完成的列。")
+            else:
+                pending = [row for row in pending if row["hash"] in incomplete]
+                print(f"🔁 重試模式：上次未完成 {len(incomplete)} 筆，本次處理 {len(pending)} 筆")
+        output.pending = pending
+        outputs.append(output)
+
+    # 同一列在各組的工作合併為一個 job (依表格順序)，片段只合成一次
+    by_index = {}
+    for output in outputs:
+        for row in output.pending:
+            by_index.setdefault(row["index"], []).append((output, row))
+    jobs = [by_index[index] for index in sorted(by_index)]
+
+    # 單字多為一兩個字，合併成一次請求再依 WordBoundary 切開，可大幅減少請求往返
+    batcher = None
+    if settings.word_batch_size > 1:
+        if backend.word_boundaries:
+            batcher = WordBatcher(backend, limiter, cache,
+                                  lambda text, voice: get_audio_segment(backend, text, voice, limiter, cache,
+                                                                        metrics, hedger, failover),
+                                  batch_size=settings.word_batch_size, metrics=metrics, hedger=hedger)
+        else:
+            print(f"⚠️ {backend.name} 不支援 WordBoundary，單字片段改為逐一請求。")
+
+    def write_job(job, results):
+        start = time.monotonic()
+        ok = True
+        for (output, row), result in zip(job, results):
+            ok = write_row(row, result, output.settings, cache, output.manifest, output.journal) and ok
+        metrics.stage("寫檔", time.monotonic() - start)
+        return ok
+
+    # 正規化在獨立的處理程序中執行 (預設使用所有 CPU 核心)
+    normalizer = loudness.Normalizer(cache) if settings.normalize else None
+    for output in outputs:
+        output.journal = RunJournal(output.settings.output_dir)
+        output.journal.queued(output.pending)
+    try:
+        if jobs:
+            modes = ", ".join(str(output.settings.audio_mode) for output in outputs)
+            print(f"開始處理 {len(jobs)} 筆資料，引擎: {backend.name}，模式: {modes} ...")
+            await run_pipeline(
+                jobs,
+                lambda job: process_line(job, backend, limiter, cache, batcher, metrics, hedger, failover,
+                                         normalizer),
+                write_job,
+                workers=settings.workers)
+    finally:
+        if normalizer is not None:
+            normalizer.close()
+        for output in outputs:
+            output.manifest.save()
+            output.journal.close()
+        metrics_paths = metrics.save(cache, limiter, {output.settings.output_dir: output.journal for output in outputs})
+
+    print()
+    for output in outputs:
+        target, manifest, journal = output.settings, output.manifest, output.journal
+        if target.album:
+            update_album(target, output.rows, manifest)
+
+        if journal.failed:
+            print(f"⚠️ 有 {journal.failed} 筆未完成，可執行 `python {settings.script} --retry-failed` 重試。")
+        else:
+            print(f"✅ 全部完成！檔案已儲存於 {target.output_dir} 資料夾。")
+        print(f"   {journal.summary()}")
+    print(f"   {cache.summary()}")
+    print(f"   {limiter.summary()}")
+    print(f"   {hedger.summary()}")
+    if normalizer is not None:
+        print(f"   {normalizer.summary()}")
+    if failover is not None:
+        print(f"   {failover.summary()}")
+    if batcher is not None:
+        print(f"   {batcher.summary()}")
+    for line in metrics.table(cache):
+        print(line)
+    print(f"   量測紀錄: {metrics_paths[0]}，Prometheus: {metrics_paths[1]}")
+
+def check_inputs(paths, spec):
+    """確認輸入檔都存在 (萬用字元沒有符合的檔案也視為找不到)"""
+    missing = [path for path in paths if not os.path.exists(path)]
+    if not paths or missing:
+        print(f"❌ 找不到 {', '.join(missing) or spec}，請確認檔案名稱是否正確。")
+        return False
+    return True
+
+def update_album(settings, rows, manifest):
+    """整合音檔：只包含音檔已完成的列 (依表格順序)"""
+    finished = [row for row in rows if manifest.files.get(row["filename"]) == row["hash"]]
+    paths = md_table.input_files(settings.input_file)
+    title = os.path.splitext(os.path.basename(paths[0]))[0] if paths else "album"
+    Album(settings.output_dir, title).update(finished)
+
+def merge_outputs(settings, backend):
+    """--merge：把各分片 (shards/i-of-N/) 的音檔依表格順序合併到各組的輸出資料夾並更新 manifest"""
+    input_files = md_table.input_files(settings.input_file)
+    if not check_inputs(input_files, settings.input_file):
+        return
+    try:
+        targets = settings.targets()
+        check_formats(targets, backend)
+        rows = list(iter_rows(input_files, settings, backend))
+    except (TypeError, ValueError, ImportError) as e:
+        print(f"❌ {e}")
+        return
+
+    incomplete = False
+    for target in targets:
+        target_rows = rows if target is settings else [target_row(row, target, backend) for row in rows]
+        os.makedirs(target.output_dir, exist_ok=True)
+        manifest, merged, missing = merge_shards(target.output_dir, target_rows)
+        manifest.save()
+        reused = len(target_rows) - merged - len(missing)
+        print(f"🧩 {target.output_dir}: 沿用既有音檔 {reused} 筆，自分片合併 {merged} 筆，"
+              f"完成 {len(manifest.rows)}/{len(target_rows)} 筆")
+        if missing:
+            incomplete = True
+            names = ", ".join(row["filename"] for row in missing[:5])
+            print(f"   ⚠️ 缺少 {len(missing)} 筆 (例如 {names})，請在對應的分片重新執行後再合併")
+        if target.album:
+            update_album(target, target_rows, manifest)
+    if not incomplete:
+        print("✅ 合併完成！可執行 `python create_player_mdV6fixed.py` 更新播放器。")
+
+def run(settings, description):
+    """命令列進入點：解析參數後執行生成流程"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="只重做上次執行中失敗或中斷的列")
+    parser.add_argument("--fake", action="store_true",
+                        help="改用離線假引擎 (不連網、不計費)，用來測試並發、快取與重試設定")
+    parser.add_argument("--fake-latency", type=float, default=settings.fake_latency,
+                        help="假引擎每個請求的延遲秒數")
+    parser.add_argument("--fake-failure-rate", type=float, default=settings.fake_failure_rate,
+                        help="假引擎的失敗機率 (0~1)")
+    parser.add_argument("--album", action="store_true", default=settings.album,
+                        help="另外輸出整合音檔 (所有列串成單一 MP3，含章節與索引)")
+    parser.add_argument("--format", choices=list(audio_formats.FORMATS), default=settings.audio_format,
+                        help="輸出格式 (opus / aac 檔案較小，需引擎支援；edge-tts 只能輸出 mp3)")
+    parser.add_argument("--normalize", action="store_true", default=settings.normalize,
+                        help="片段音量正規化與頭尾靜音修剪 (需要 numpy 與 ffmpeg)")
+    parser.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                        help="只處理第 i 個分片 (共 N 個，依列的內容分配)，可在多個程序或多台電腦同時執行")
+    parser.add_argument("--merge", action="store_true",
+                        help="把各分片的輸出依表格順序合併到輸出資料夾 (不呼叫語音引擎)")
+    parser.add_argument("--word-batch", type=int, default=settings.word_batch_size,
+                        help="每次合併請求的單字數 (0 = 關閉，需引擎支援 WordBoundary)")
+    args = parser.parse_args()
+    settings.word_batch_size = args.word_batch
+    settings.album = args.album
+    settings.normalize = args.normalize
+    settings.audio_format = args.format
+    settings.shard = args.shard
+
+    if args.fake:
+        # 假引擎輸出到獨立資料夾，避免覆蓋真正的音檔
+        settings.backend = "fake"
+        settings.output_dir = settings.output_dir + "_Fake"
+        settings.profiles = [dict(profile, output_dir=profile["output_dir"] + "_Fake") if "output_dir" in profile
+                             else profile for profile in settings.profiles]
+        if settings.fallback_backend:
+            settings.fallback_backend, settings.fallback_model = "fake", ""
+        settings.fake_latency = args.fake_latency
+        settings.fake_failure_rate = args.fake_failure_rate
+
+    # Windows 平台 asyncio bug 修正
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    try:
+        asyncio.run(main(settings, args.retry_failed, args.merge))
+    except KeyboardInterrupt:
+        print(f"\n使用者中斷執行。可執行 `python {settings.script} --retry-failed` 繼續未完成的部分。")
@@ -1,10 +1,7 @@
-import asyncio
-import edge_tts
-import os
-import re
+from tts_engine import Settings, run
 
 # =================設定區=================
-INPUT_FILE = "mp3.md"        # 輸入的 Markdown 檔案
+INPUT_FILE = "mp3.md"        # 輸入的 Markdown 檔案 (可用萬用字元如 "vocab/*.md" 或列表指定多個檔案)
 OUTPUT_DIR = "MP3_Output"    # 輸出的資料夾名稱
 
 # 語音設定
@@ -32,122 +29,57 @@ zh-TW-HsiaoYuNeural,女聲,較為年輕、輕快，適合輕鬆內容
 # 1 = 僅單字 + 中文 (Word + Chinese)
 # 2 = 單字 + 中文 + 英文例句 (Word + Chinese + Example Sentence)
 AUDIO_MODE = 2 
+SEGMENT_GAP_MS = 300         # 單字、中文、例句之間的停頓 (毫秒，0 = 不停頓)
+ALBUM_OUTPUT = False         # 另外輸出整合音檔 (所有列串成單一 MP3 + 章節，存放於輸出資料夾的 album/)
+NORMALIZE_AUDIO = False      # 各片段音量一致並修剪頭尾靜音 (需要 numpy 與 ffmpeg，重新編碼)
+
+# 多重輸出：一次執行產生多組音檔，各組共用的片段 (相同文字與聲音) 只合成一次
+# 每組可覆寫 output_dir / audio_mode / voice_en_word / voice_en_sent / voice_zh / segment_gap_ms / album / audio_format
+# (Edge TTS 只能輸出 mp3，audio_format 設為其他格式時會顯示警告並改用 mp3)
+# (未覆寫的沿用上面的設定；各組需使用不同的 output_dir)。空列表 = 只輸出上面這一組
+PROFILES = [
+    # {"output_dir": "MP3_Output_Mode1", "audio_mode": 1},
+    # {"output_dir": "MP3_Output_Guy", "voice_en_word": "en-US-GuyNeural", "segment_gap_ms": 500},
+]
+
+# 並發控制 (自動調整：成功時逐步加快，被限流時減半)
+CONCURRENCY_START = 5        # 起始同時請求數
+CONCURRENCY_MAX = 32         # 同時請求數上限
+WORKERS = 16                 # 同時處理的列數 (每列最多 3 個片段請求)
+WORD_BATCH_SIZE = 0          # 單字合併請求：每次合併幾個單字 (例如 12；0 = 每個單字各自請求)
+
+# 請求期限與備援 (改善少數卡住的請求拖長整批時間的問題)
+HEDGE_REQUESTS = True        # 請求慢於最近 p95 時另外送出一個相同請求，取先完成者 (最多多出約 5% 請求)
+FALLBACK_BACKEND = None      # Edge TTS 持續失敗時改用的備援引擎，例如 "openai" (需 API Key，會計費)；None = 不備援
+FALLBACK_MODEL = "tts-1"
+FALLBACK_VOICES = {          # Edge TTS 聲音 -> 備援引擎聲音 (沒有列出的聲音不備援)
+    "en-US-AndrewNeural": "onyx",
+    "en-US-AriaNeural": "nova",
+    "en-US-GuyNeural": "echo",
+    "zh-TW-HsiaoChenNeural": "shimmer",
+}
 # ========================================
 
-async def get_audio_bytes(text, voice):
-    """呼叫 edge-tts 生成語音並回傳二進位資料"""
-    content = b""
-    try:
-        communicate = edge_tts.Communicate(text, voice)
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                content += chunk["data"]
-    except Exception as e:
-        print(f"   ⚠️ 語音生成錯誤 [{text}]: {e}")
-    return content
-
-async def process_line(index, line, semaphore):
-    """處理單一行 Markdown 表格資料"""
-    async with semaphore:
-        # 1. 預處理：去除前後空白
-        line = line.strip()
-        
-        # 2. 過濾無效行 (空行、表頭、分隔線)
-        if not line.startswith("|"): return
-        if "English" in line and "中文" in line: return  # 過濾表頭
-        if "---" in line: return  # 過濾分隔線
-
-        # 3. 解析表格欄位
-        # Markdown 表格通常以 | 分隔，split後頭尾會產生空字串，故需過濾
-        parts = [p.strip() for p in line.split('|') if p.strip()]
-        
-        # 確保欄位數量足夠 (序號單字, 中文, 例句, 中譯) 至少要有前兩個
-        if len(parts) < 2:
-            return
-
-        # 4. 提取資料
-        raw_word_col = parts[0]  # 第一欄：(序號) English
-        zh_def = parts[1]        # 第二欄：中文
-        
-        # 提取例句 (如果有的話，且模式需要)
-        en_sentence = ""
-        if len(parts) >= 3:
-            en_sentence = parts[2] # 第三欄：常用搭配句
-
-        # 5. 清理單字 (去除序號 "1. ", "2. " 等)
-        # Regex: 抓取開頭的數字加點，並替換為空
-        en_word = re.sub(r'^\d+\.\s*', '', raw_word_col)
-
-        if not en_word: return
-
-        # 6. 決定檔名 (4位數序號)
-        safe_filename_text = re.sub(r'[\\/*?:"<>|]', "", en_word)
-        filename = f"{index:04d}_{safe_filename_text}.mp3"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-
-        if os.path.exists(filepath):
-            print(f"⏩ 跳過已存在 [{index:04d}]: {en_word}")
-            return
-
-        print(f"處理中 [{index:04d}]: {en_word}")
-
-        # 7. 依據模式生成語音片段
-        audio_segments = []
-        
-        # 片段 A: 單字
-        audio_segments.append(await get_audio_bytes(en_word, VOICE_EN_WORD))
-        
-        # 片段 B: 中文釋義
-        if zh_def:
-            audio_segments.append(await get_audio_bytes(zh_def, VOICE_ZH))
-
-        # 片段 C: 英文例句 (僅模式 2 且有例句時)
-        if AUDIO_MODE == 2 and en_sentence and en_sentence != "":
-            audio_segments.append(await get_audio_bytes(en_sentence, VOICE_EN_SENT))
-
-        # 8. 寫入檔案 (合併所有片段)
-        try:
-            with open(filepath, "wb") as out_f:
-                for segment in audio_segments:
-                    out_f.write(segment)
-        except Exception as e:
-            print(f"❌ 寫入失敗: {e}")
-
-async def main():
-    # 建立輸出目錄
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-        print(f"已建立目錄: {OUTPUT_DIR}")
-    
-    # 檢查輸入檔案
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ 找不到 {INPUT_FILE}，請確認檔案名稱是否正確。")
-        return
-
-    print(f"正在讀取 {INPUT_FILE} ...")
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    # 限制並發數，避免請求過快被封鎖
-    semaphore = asyncio.Semaphore(5)
-    tasks = []
-    
-    valid_count = 0
-    for line in lines:
-        # 簡單預判是否為資料行，用於計算序號
-        if not line.strip().startswith("|"): continue
-        if "(序號) English" in line or "---" in line: continue
-        
-        valid_count += 1
-        task = process_line(valid_count, line, semaphore)
-        tasks.append(task)
-
-    if tasks:
-        print(f"開始處理 {len(tasks)} 筆資料，模式: {AUDIO_MODE} ...")
-        await asyncio.gather(*tasks)
-        print(f"\n✅ 全部完成！檔案已儲存於 {OUTPUT_DIR} 資料夾。")
-    else:
-        print("沒有偵測到有效的表格資料。")
-
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(Settings(
+        backend="edge-tts",
+        input_file=INPUT_FILE,
+        output_dir=OUTPUT_DIR,
+        voice_en_word=VOICE_EN_WORD,
+        voice_en_sent=VOICE_EN_SENT,
+        voice_zh=VOICE_ZH,
+        audio_mode=AUDIO_MODE,
+        segment_gap_ms=SEGMENT_GAP_MS,
+        album=ALBUM_OUTPUT,
+        normalize=NORMALIZE_AUDIO,
+        profiles=PROFILES,
+        concurrency_start=CONCURRENCY_START,
+        concurrency_max=CONCURRENCY_MAX,
+        workers=WORKERS,
+        word_batch_size=WORD_BATCH_SIZE,
+        hedge=HEDGE_REQUESTS,
+        fallback_backend=FALLBACK_BACKEND,
+        fallback_model=FALLBACK_MODEL,
+        fallback_voices=FALLBACK_VOICES,
+        script="vocab_audio_md.py",
+    ), "將 Markdown 單字表轉為 MP3 (Edge TTS)")
@@ -1,11 +1,7 @@
-import asyncio
-import os
-import re
-import getpass
-from openai import AsyncOpenAI
+from tts_engine import Settings, run
 
 # =================設定區=================
-INPUT_FILE = "mp3.md"            # 輸入的 Markdown 檔案
+INPUT_FILE = "mp3.md"            # 輸入的 Markdown 檔案 (可用萬用字元如 "vocab/*.md" 或列表指定多個檔案)
 OUTPUT_DIR = "MP3_Output_OpenAI" # 輸出的資料夾名稱 (區分開原本的資料夾)
 
 # OpenAI 語音設定 (model: tts-1 or tts-1-hd)
@@ -27,142 +23,60 @@ VOICE_ZH = "shimmer"         # 唸中文 (女聲)
 # 1 = 僅單字 + 中文 (Word + Chinese)
 # 2 = 單字 + 中文 + 英文例句 (Word + Chinese + Example Sentence)
 AUDIO_MODE = 2 
+SEGMENT_GAP_MS = 300         # 單字、中文、例句之間的停頓 (毫秒，0 = 不停頓)
+ALBUM_OUTPUT = False         # 另外輸出整合音檔 (所有列串成單一 MP3 + 章節，存放於輸出資料夾的 album/)
+NORMALIZE_AUDIO = False      # 各片段音量一致並修剪頭尾靜音 (需要 numpy 與 ffmpeg，重新編碼；只處理 mp3)
+# 輸出格式 (由 OpenAI 直接輸出，不轉檔): "mp3" / "opus" (Ogg Opus，檔案最小) / "aac" (ADTS)
+# opus / aac 不支援整合音檔與音量正規化；檔名副檔名與播放器會自動跟著改變
+AUDIO_FORMAT = "mp3"
+
+# 多重輸出：一次執行產生多組音檔，各組共用的片段 (相同文字與聲音) 只合成一次
+# 每組可覆寫 output_dir / audio_mode / voice_en_word / voice_en_sent / voice_zh / segment_gap_ms / album / audio_format
+# (未覆寫的沿用上面的設定；各組需使用不同的 output_dir)。空列表 = 只輸出上面這一組
+PROFILES = [
+    # {"output_dir": "MP3_Output_OpenAI_Mode1", "audio_mode": 1},
+    # {"output_dir": "MP3_Output_OpenAI_Echo", "voice_en_word": "echo", "segment_gap_ms": 500},
+    # {"output_dir": "MP3_Output_OpenAI_Opus", "audio_format": "opus"},
+]
+
+# 並發控制 (自動調整：成功時逐步加快，遇到 429 / 5xx 時減半並遵守 Retry-After)
+CONCURRENCY_START = 3        # 起始同時請求數
+CONCURRENCY_MAX = 16         # 同時請求數上限
+WORKERS = 8                  # 同時處理的列數 (每列最多 3 個片段請求)
+
+# 請求期限與備援 (改善少數卡住的請求拖長整批時間的問題)
+HEDGE_REQUESTS = True        # 請求慢於最近 p95 時另外送出一個相同請求，取先完成者 (重複請求也會計費，最多多出約 5%)
+FALLBACK_BACKEND = None      # OpenAI 持續失敗時改用的備援引擎，例如 "edge-tts" (免費)；None = 不備援
+FALLBACK_MODEL = ""
+FALLBACK_VOICES = {          # OpenAI 聲音 -> 備援引擎聲音 (沒有列出的聲音不備援)
+    "onyx": "en-US-AndrewNeural",
+    "nova": "en-US-AriaNeural",
+    "echo": "en-US-GuyNeural",
+    "shimmer": "zh-TW-HsiaoChenNeural",
+}
 # ========================================
 
-async def get_audio_bytes(client, text, voice):
-    """呼叫 OpenAI API 生成語音並回傳二進位資料"""
-    try:
-        response = await client.audio.speech.create(
-            model=MODEL_NAME,
-            voice=voice,
-            input=text
-        )
-        return response.content
-    except Exception as e:
-        print(f"   ⚠️ 語音生成錯誤 [{text}]: {e}")
-        return b""
-
-async def process_line(index, line, client, semaphore):
-    """處理單一行 Markdown 表格資料"""
-    async with semaphore:
-        # 1. 預處理：去除前後空白
-        line = line.strip()
-        
-        # 2. 過濾無效行
-        if not line.startswith("|"): return
-        if "English" in line and "中文" in line: return
-        if "---" in line: return
-
-        # 3. 解析表格欄位
-        parts = [p.strip() for p in line.split('|') if p.strip()]
-        
-        if len(parts) < 2: return
-
-        # 4. 提取資料
-        raw_word_col = parts[0]
-        zh_def = parts[1]
-        
-        en_sentence = ""
-        if len(parts) >= 3:
-            en_sentence = parts[2]
-
-        # 5. 清理單字
-        en_word = re.sub(r'^\d+\.\s*', '', raw_word_col)
-
-        if not en_word: return
-
-        # 6. 決定檔名
-        safe_filename_text = re.sub(r'[\\/*?:"<>|]', "", en_word)
-        filename = f"{index:04d}_{safe_filename_text}.mp3"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-
-        # 檢查是否已存在 (跳過邏輯)
-        if os.path.exists(filepath):
-            print(f"⏩ 跳過已存在 [{index:04d}]: {en_word}")
-            return
-
-        print(f"處理中 [{index:04d}]: {en_word}")
-
-        # 7. 依據模式生成語音片段
-        audio_segments = []
-        
-        # 片段 A: 單字
-        seg_a = await get_audio_bytes(client, en_word, VOICE_EN_WORD)
-        if seg_a: audio_segments.append(seg_a)
-        
-        # 片段 B: 中文釋義
-        if zh_def:
-            seg_b = await get_audio_bytes(client, zh_def, VOICE_ZH)
-            if seg_b: audio_segments.append(seg_b)
-
-        # 片段 C: 英文例句
-        if AUDIO_MODE == 2 and en_sentence:
-            seg_c = await get_audio_bytes(client, en_sentence, VOICE_EN_SENT)
-            if seg_c: audio_segments.append(seg_c)
-
-        # 8. 寫入檔案
-        if audio_segments:
-            try:
-                with open(filepath, "wb") as out_f:
-                    for segment in audio_segments:
-                        out_f.write(segment)
-            except Exception as e:
-                print(f"❌ 寫入失敗: {e}")
-
-async def main():
-    # 0. 輸入 API Key
-    print("="*40)
-    api_key = getpass.getpass("🔑 請輸入您的 OpenAI API Key (輸入時不會顯示): ")
-    if not api_key:
-        api_key = input("   (或是直接在此輸入): ") # 作為備用，有些環境 getpass 可能有問題
-    
-    if not api_key:
-        print("❌ 未輸入 API Key，程式結束。")
-        return
-    print("="*40)
-
-    # 建立輸出目錄
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-        print(f"已建立目錄: {OUTPUT_DIR}")
-    
-    # 檢查輸入檔案
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ 找不到 {INPUT_FILE}，請確認檔案名稱是否正確。")
-        return
-
-    print(f"正在讀取 {INPUT_FILE} ...")
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    # 初始化 OpenAI Client (使用 context manager 確保關閉)
-    async with AsyncOpenAI(api_key=api_key) as client:
-        # 限制並發數 (OpenAI 有 Rate Limit，建議不要設太高)
-        semaphore = asyncio.Semaphore(3)
-        tasks = []
-        
-        valid_count = 0
-        for line in lines:
-            if not line.strip().startswith("|"): continue
-            if "(序號) English" in line or "---" in line: continue
-            
-            valid_count += 1
-            task = process_line(valid_count, line, client, semaphore)
-            tasks.append(task)
-
-        if tasks:
-            print(f"開始處理 {len(tasks)} 筆資料 (OpenAI Mode) ...")
-            await asyncio.gather(*tasks)
-            print(f"\n✅ 全部完成！檔案已儲存於 {OUTPUT_DIR} 資料夾。")
-        else:
-            print("沒有偵測到有效的表格資料。")
-
 if __name__ == "__main__":
-    # Windows 平台 asyncio bug 修正
-    if os.name == 'nt':
-        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        print("\n使用者中斷執行。")
+    run(Settings(
+        backend="openai",
+        model=MODEL_NAME,
+        input_file=INPUT_FILE,
+        output_dir=OUTPUT_DIR,
+        voice_en_word=VOICE_EN_WORD,
+        voice_en_sent=VOICE_EN_SENT,
+        voice_zh=VOICE_ZH,
+        audio_mode=AUDIO_MODE,
+        segment_gap_ms=SEGMENT_GAP_MS,
+        album=ALBUM_OUTPUT,
+        normalize=NORMALIZE_AUDIO,
+        audio_format=AUDIO_FORMAT,
+        profiles=PROFILES,
+        concurrency_start=CONCURRENCY_START,
+        concurrency_max=CONCURRENCY_MAX,
+        workers=WORKERS,
+        hedge=HEDGE_REQUESTS,
+        fallback_backend=FALLBACK_BACKEND,
+        fallback_model=FALLBACK_MODEL,
+        fallback_voices=FALLBACK_VOICES,
+        script="vocab_audio_openai.py",
+    ), "將 Markdown 單字表轉為 MP3 (OpenAI TTS)")
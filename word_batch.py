@@ -0,0 +1,233 @@
+import asyncio
+import re
+import time
+from rate_limiter import RequestFailed
+from mp3_frames import split_at_times
+from metrics import new_trace
+
+# =================設定區=================
+BATCH_SIZE = 12      # 每次合併請求的片段數上限
+BATCH_WAIT = 0.05    # 等待湊滿一批的最長時間 (秒)，時間到就先送出
+# ========================================
+
+def _letters(text):
+    """只保留文字與數字 (小寫)，用來比對 WordBoundary 與原始片段"""
+    return re.sub(r"[\W_]+", "", text).lower()
+
+def join_items(texts):
+    """把多個短片段串成一段文字；每段補上句點，讓語音在片段之間停頓"""
+    parts = []
+    for text in texts:
+        text = text.strip()
+        if text[-1] not in ".!?。！？":
+            text += "."
+        parts.append(text)
+    return " ".join(parts)
+
+def item_spans(texts, boundaries):
+    """
+    依 WordBoundary (offset 秒, duration 秒, 文字) 找出每個片段的 (開始, 結束) 時間
+    逐字累加直到與片段文字相符；對不上時拋出 ValueError
+    """
+    spans = []
+    i = 0
+    for text in texts:
+        target = _letters(text)
+        got, start, end = "", None, None
+        while len(got) < len(target) and i < len(boundaries):
+            offset, duration, word = boundaries[i]
+            i += 1
+            letters = _letters(word)
+            if not letters:
+                continue
+            if start is None:
+                start = offset
+            got += letters
+            end = offset + duration
+        if got != target or start is None:
+            raise ValueError(f"WordBoundary 與片段對不上: {text!r}")
+        spans.append((start, end))
+    return spans
+
+def split_items(audio, texts, boundaries):
+    """把合併請求的音訊切回各片段 (切點取前後兩段之間停頓的中點，對齊 MP3 frame)"""
+    spans = item_spans(texts, boundaries)
+    cuts = [(end + next_start) / 2 for (_, end), (next_start, _) in zip(spans, spans[1:])]
+    return split_at_times(audio, cuts)
+
+class WordBatcher:
+    """
+    把同一聲音的多個短片段 (單字) 合併成一次 TTS 請求，
+    再依 WordBoundary 的時間位置把音訊切回各片段，分別寫入片段快取
+    需要引擎支援 stream_words()；切分對不上或合併請求逾時時自動改回逐一請求
+    有 hedger 時合併請求與單一片段的請求一樣有期限與對沖
+    """
+
+    def __init__(self, backend, limiter, cache, fallback, batch_size=BATCH_SIZE, max_wait=BATCH_WAIT, metrics=None,
+                 hedger=None):
+        self.backend = backend
+        self.limiter = limiter
+        self.hedger = hedger
+        self.cache = cache
+        self.fallback = fallback  # async fallback(text, voice) -> 快取鍵，單獨請求一個片段
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.metrics = metrics
+        self._pending = {}   # voice -> [(text, key), ...] 等待送出的片段
+        self._waiters = {}   # key -> [future, ...] 等待同一片段的呼叫者
+        self._timers = {}    # voice -> 計時器
+        self._tasks = set()
+        self.batches = 0
+        self.fallbacks = 0
+
+    def key(self, text, voice):
+        # 切分出的片段與單獨合成的音訊不同 (語調、頭尾靜音)，使用獨立的快取鍵
+        return self.cache.make_key(self.backend.name, f"{self.backend.model}+batch", voice, text)
+
+    async def get(self, text, voice):
+        """取得片段的快取鍵 (已鎖定，使用完畢需 release)；失敗時拋出 RequestFailed"""
+        if not _letters(text):
+            return await self.fallback(text, voice)
+        key = self.key(text, voice)
+        if self.cache.lookup(key):
+            return key
+
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._waiters.setdefault(key, [])
+        waiters.append(future)
+        if len(waiters) == 1:
+            # 同一片段已在等待中時不重複加入批次
+            batch = self._pending.setdefault(voice, [])
+            batch.append((text, key))
+            if len(batch) >= self.batch_size:
+                self._flush(voice)
+            elif voice not in self._timers:
+                self._timers[voice] = asyncio.get_running_loop().call_later(self.max_wait, self._flush, voice)
+        return await future
+
+    def _flush(self, voice):
+        timer = self._timers.pop(voice, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(voice, None)
+        if items:
+            task = asyncio.create_task(self._run(voice, items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, voice, items):
+        """
+        (背景工作) 送出一批片段；發生預期外的錯誤 (寫入快取失敗等) 時，
+        尚未通知的呼叫者一律收到 RequestFailed，不會永遠等待
+        """
+        waiters = {key: self._waiters.get(key) for _, key in items}
+        try:
+            await self._run_batch(voice, items)
+        except BaseException as e:
+            error = e if isinstance(e, RequestFailed) else RequestFailed(f"{type(e).__name__}: {e}")
+            if isinstance(e, Exception):
+                print(f"   ⚠️ 合併請求發生錯誤: {error}")
+            for _, key in items:
+                # 只通知這一批的呼叫者 (同一片段之後重新加入的等待者屬於新的批次)
+                if waiters[key] is not None and self._waiters.get(key) is waiters[key]:
+                    self._resolve(key, error=error)
+            if not isinstance(e, Exception):
+                raise
+
+    async def _run_batch(self, voice, items):
+        texts = [text for text, _ in items]
+        if len(items) == 1:
+            await self._fallback(voice, items)
+            return
+
+        text = join_items(texts)
+        trace = new_trace()
+
+        async def attempt(first_byte):
+            audio = bytearray()
+            boundaries = []
+            started = time.monotonic()
+            async for chunk, boundary in self.backend.stream_words(text, voice):
+                if chunk:
+                    if not audio:
+                        first_byte()
+                        if trace["ttfb"] is None:
+                            trace["ttfb"] = time.monotonic() - started
+                    audio += chunk
+                elif boundary:
+                    boundaries.append(boundary)
+            return bytes(audio), boundaries
+
+        async def request():
+            trace["ttfb"] = None
+            if self.hedger is None:
+                return await attempt(lambda: None)
+            return await self.hedger.run(attempt, limiter=self.limiter)
+
+        start = time.monotonic()
+        try:
+            # 逾時照常計入限流 (降低並發上限)，但不整批重試 (會拖住所有等待的片段)，改為逐一請求
+            audio, boundaries = await self.limiter.call(request, f"{len(items)} 個片段", trace,
+                                                        no_retry=(asyncio.TimeoutError,))
+        except RequestFailed as e:
+            timed_out = isinstance(e.__cause__, asyncio.TimeoutError)
+            if timed_out:
+                print(f"   ⚠️ 合併請求逾時 [{', '.join(texts)}]，改為逐一請求")
+            else:
+                print(f"   ⚠️ 合併請求錯誤 [{', '.join(texts)}]: {e}")
+            if self.metrics is not None:
+                self.metrics.request(self.backend.name, voice, len(text), 0, time.monotonic() - start, trace,
+                                     items=len(items), error=str(e))
+            if timed_out:
+                await self._fallback(voice, items)
+                return
+            for _, key in items:
+                self._resolve(key, error=e)
+            return
+        if self.metrics is not None:
+            self.metrics.request(self.backend.name, voice, len(text), len(audio), time.monotonic() - start, trace,
+                                 items=len(items))
+        try:
+            segments = split_items(audio, texts, boundaries)
+        except ValueError as e:
+            print(f"   ⚠️ {e}，改為逐一請求")
+            await self._fallback(voice, items)
+            return
+
+        self.batches += 1
+        for (_, key), segment in zip(items, segments):
+            writer = self.cache.open_writer(key)
+            writer.write(segment)
+            committed = writer.commit()
+            if committed is None:
+                self._resolve(key, error=RequestFailed("切分後的片段為空"))
+            else:
+                self._resolve(key, committed)
+
+    async def _fallback(self, voice, items):
+        """逐一請求 (一般快取鍵)；只有一個片段、切分失敗或合併請求逾時時使用"""
+        self.fallbacks += len(items)
+        results = await asyncio.gather(*(self.fallback(text, voice) for text, _ in items),
+                                       return_exceptions=True)
+        for (_, key), result in zip(items, results):
+            if isinstance(result, BaseException):
+                self._resolve(key, error=result)
+            else:
+                self._resolve(key, result)
+
+    def _resolve(self, key, result=None, error=None):
+        """通知等待同一片段的所有呼叫者；第一位沿用寫入時的鎖定，其餘各自再鎖定一次"""
+        for n, future in enumerate(self._waiters.pop(key, [])):
+            if future.done():
+                if error is None and n == 0:
+                    self.cache.release(result)  # 呼叫者已取消，釋放鎖定
+                continue
+            if error is not None:
+                future.set_exception(error)
+            elif n == 0 or self.cache.lookup(result):
+                future.set_result(result)
+            else:
+                future.set_exception(RequestFailed("片段已被淘汰"))
+
+    def summary(self):
+        return f"合併請求 {self.batches} 次，逐一請求 {self.fallbacks} 個片段"